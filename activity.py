@@ -0,0 +1,75 @@
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from clock import SystemClock
+
+class RecentActivity:
+    """In-process ring buffer of the most recent sales.
+
+    PrintShopService appends every sale it commits, so the cashier screen
+    can show recent transactions and sales rates without querying SQLite.
+    The buffer is seeded once from the database at startup.
+    """
+
+    def __init__(self, capacity=500, clock=None):
+        self.capacity = capacity
+        self.clock = clock or SystemClock()
+        self.sales = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+
+    def seed(self, db_manager):
+        """Load the latest sales from the database"""
+        db_manager.cursor.execute('''
+            SELECT id, date, service, quantity, amount, papers_used, timestamp, created_by
+            FROM transactions
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (self.capacity,))
+
+        rows = db_manager.cursor.fetchall()
+        with self.lock:
+            self.sales.clear()
+            for row in reversed(rows):
+                sale = dict(zip(
+                    ('id', 'date', 'service', 'quantity', 'amount', 'papers_used', 'timestamp', 'created_by'),
+                    row
+                ))
+                sale['time'] = datetime.strptime(sale['timestamp'], '%Y-%m-%d %H:%M:%S') if sale['timestamp'] else None
+                self.sales.append(sale)
+
+    def record_sale(self, sale):
+        """Add a committed transaction row"""
+        sale = dict(sale)
+        sale['time'] = datetime.strptime(sale['timestamp'], '%Y-%m-%d %H:%M:%S')
+        with self.lock:
+            self.sales.append(sale)
+
+    def recent(self, limit=10, date=None):
+        """Return up to limit sales, newest first, optionally only for one date"""
+        result = []
+        with self.lock:
+            for sale in reversed(self.sales):
+                if date is not None and sale['date'] != date:
+                    continue
+                result.append(sale)
+                if len(result) == limit:
+                    break
+        return result
+
+    def sales_per_minute(self, minutes=30, now=None):
+        """Return sale counts for each of the last `minutes` minutes, oldest first"""
+        now = (now or self.clock.now()).replace(second=0, microsecond=0)
+        start = now - timedelta(minutes=minutes - 1)
+        counts = [0] * minutes
+
+        with self.lock:
+            for sale in reversed(self.sales):
+                if sale['time'] is None:
+                    continue
+                if sale['time'] < start:
+                    break
+                index = int((sale['time'] - start).total_seconds() // 60)
+                if 0 <= index < minutes:
+                    counts[index] += 1
+        return counts
@@ -1,19 +1,41 @@
 from calendar import calendar
 import os
 import sqlite3
+import tracemalloc
 import tkinter as tk
-from tkinter import ttk, messagebox
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
+from tkinter import ttk, messagebox, filedialog, simpledialog
+from datetime import timedelta
 from tkcalendar import DateEntry 
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from branches import BranchHub, combine_branches
+from charts import ActivityChart, StockLevelsChart
+from history import HistoryBrowser
+from models import UpdateConflictError
+from reports import ReportWriter
+from memmonitor import MEMORY_WARNINGS
+from profiler import PROFILER
+from sqlstats import QUERY_STATS
+from tracing import span, traced
+from uiwatchdog import RECENT_STALLS
+from timeseries import TimeSeriesProvider, downsample_lttb
+from widgets import TreeviewBinding
+
+DASHBOARD_REFRESH_MS = 30000
+LIVE_UPDATE_POLL_MS = 250
+LIVE_UPDATE_INTERVAL = 2.0
+BRANCH_POLL_MS = 100
+ACTIVITY_CHART_MAX_POINTS = 120
+TOP_QUERIES = 15
 
 class AdminDashboardUI:
     def __init__(self, root, auth_manager, service):
         self.root = root
         self.auth_manager = auth_manager
         self.service = service
-        
+        self.timeseries = TimeSeriesProvider(service.db)
+        self.report_writer = ReportWriter(service, auth_manager)
+        self.branch_hub = BranchHub(service.db)
+        self.branch_job = None
+        self.branch_poll_job = None
         
         self.root.title("Print Shop Admin Dashboard")
         self.root.state('zoomed')
@@ -21,6 +43,11 @@ class AdminDashboardUI:
         self.style = ttk.Style()
         self.current_theme = tk.StringVar(value="light")
         self.create_dashboard()
+        
+        self.live_updates = None
+        if getattr(service, 'event_bus', None):
+            self.live_updates = service.event_bus.subscribe(interval=LIVE_UPDATE_INTERVAL)
+            self.poll_live_updates()
 
     def create_dashboard(self):
         """Create the main admin dashboard interface"""
@@ -74,10 +101,19 @@ class AdminDashboardUI:
         notebook.add(stock_frame, text="Stock")
         self.create_stock_tab(stock_frame)
 
+        history_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(history_frame, text="History")
+        users = [user[0] for user in self.auth_manager.get_all_users()]
+        HistoryBrowser(history_frame, self.service, users).pack(fill='both', expand=True)
+
         reports_frame = ttk.Frame(notebook, padding="10")
         notebook.add(reports_frame, text="Reports")
         self.create_reports_tab(reports_frame)
 
+        branches_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(branches_frame, text="Branches")
+        self.create_branches_tab(branches_frame)
+
         settings_frame = ttk.Frame(notebook, padding="10")
         notebook.add(settings_frame, text="System Settings")
         self.create_settings_tab(settings_frame)
@@ -88,7 +124,52 @@ class AdminDashboardUI:
         metrics_frame = ttk.LabelFrame(parent, text="Key Metrics", padding="10")
         metrics_frame.pack(fill='x', pady=(0, 20))
         
-        today = datetime.now().strftime('%Y-%m-%d')
+        self.metric_labels = {
+            'active_users': self.create_metric_card(metrics_frame, "Active Users", "0", 0, 0),
+            'transactions_today': self.create_metric_card(metrics_frame, f"Today's Transactions", "0", 0, 1),
+            'low_stock': self.create_metric_card(metrics_frame, "Low Stock Items", "0", 0, 2),
+            'revenue_today': self.create_metric_card(metrics_frame, f"Today's Revenue", "M0.00", 0, 3)
+        }
+        
+        ttk.Button(
+            metrics_frame,
+            text="Refresh",
+            command=self.refresh_dashboard
+        ).grid(row=0, column=4, padx=5, pady=5)
+        
+        charts_frame = ttk.Frame(parent)
+        charts_frame.pack(fill='both', expand=True)
+        
+        self.create_activity_chart(charts_frame)
+        self.create_stock_levels_chart(charts_frame)
+        
+        self.refresh_dashboard()
+        self.schedule_dashboard_refresh()
+
+    def schedule_dashboard_refresh(self):
+        """Refresh the dashboard periodically while the window is open"""
+        self.dashboard_refresh_job = self.root.after(DASHBOARD_REFRESH_MS, self._auto_refresh_dashboard)
+
+    def poll_live_updates(self):
+        """Refresh the dashboard when committed changes arrive on the event bus"""
+        update = self.live_updates.poll()
+        if update:
+            self.refresh_dashboard()
+            self.update_status(
+                f"Live: {update['sales']} sales, M{update['revenue']:.2f} since the last update"
+            )
+        self.live_updates_job = self.root.after(LIVE_UPDATE_POLL_MS, self.poll_live_updates)
+
+    def _auto_refresh_dashboard(self):
+        try:
+            self.refresh_dashboard()
+        finally:
+            self.schedule_dashboard_refresh()
+
+    @traced('ui.refresh_dashboard', 'action')
+    def refresh_dashboard(self):
+        """Reload metrics and update the existing charts in place"""
+        today = self.service.clock.now().strftime('%Y-%m-%d')
         
         active_users = len([user for user in self.auth_manager.get_all_users() if user[1] == "user"])
         
@@ -111,56 +192,90 @@ class AdminDashboardUI:
         if 'envelope' in stock and stock['envelope']['quantity'] < self.service.stock_thresholds['envelope']:
             low_stock_count += 1
         
-        self.create_metric_card(metrics_frame, "Active Users", str(active_users), 0, 0)
-        self.create_metric_card(metrics_frame, f"Today's Transactions", str(transactions_today), 0, 1)
-        self.create_metric_card(metrics_frame, "Low Stock Items", str(low_stock_count), 0, 2)
-        self.create_metric_card(metrics_frame, f"Today's Revenue", f"M{revenue_today:.2f}", 0, 3)
-        
-        charts_frame = ttk.Frame(parent)
-        charts_frame.pack(fill='both', expand=True)
+        self.metric_labels['active_users'].config(text=str(active_users))
+        self.metric_labels['transactions_today'].config(text=str(transactions_today))
+        self.metric_labels['low_stock'].config(text=str(low_stock_count))
+        self.metric_labels['revenue_today'].config(text=f"M{revenue_today:.2f}")
         
-        self.create_activity_chart(charts_frame)
-        self.create_stock_levels_chart(charts_frame)
+        self.update_activity_chart()
+        self.update_stock_levels_chart(stock)
 
     def create_activity_chart(self, parent):
         """Create activity chart with actual transaction data"""
-        figure, ax = plt.subplots(figsize=(6, 4))
+        activity_frame = ttk.Frame(parent)
+        activity_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        controls = ttk.Frame(activity_frame)
+        controls.pack(fill='x')
+        
+        ttk.Label(controls, text="Range:").pack(side='left', padx=5)
+        self.activity_range = tk.StringVar(value='7d')
+        range_combo = ttk.Combobox(
+            controls,
+            textvariable=self.activity_range,
+            values=list(TimeSeriesProvider.RANGES.keys()),
+            state="readonly",
+            width=6
+        )
+        range_combo.pack(side='left', padx=5)
+        range_combo.bind('<<ComboboxSelected>>', lambda e: self.update_activity_chart())
+        
+        ttk.Label(controls, text="Show:").pack(side='left', padx=5)
+        self.activity_metric = tk.StringVar(value='Transactions')
+        metric_combo = ttk.Combobox(
+            controls,
+            textvariable=self.activity_metric,
+            values=['Transactions', 'Revenue'],
+            state="readonly",
+            width=12
+        )
+        metric_combo.pack(side='left', padx=5)
+        metric_combo.bind('<<ComboboxSelected>>', lambda e: self.update_activity_chart())
         
-        dates = []
-        activities = []
+        self.activity_chart = ActivityChart(activity_frame, figsize=(6, 4))
+        self.activity_chart.pack(fill=tk.BOTH, expand=True)
+
+    def update_activity_chart(self):
+        """Update the activity chart for the selected range and metric"""
+        range_key = self.activity_range.get()
+        metric = 'revenue' if self.activity_metric.get() == 'Revenue' else 'count'
+        series = self.timeseries.get_range_series(range_key, metric)
         
-        for i in range(6, -1, -1):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            display_date = (datetime.now() - timedelta(days=i)).strftime('%a')
-            dates.append(display_date)
-            
-            self.service.db.cursor.execute('''
-                SELECT COUNT(*) 
-                FROM transactions 
-                WHERE date = ?
-            ''', (date,))
-            
-            count = self.service.db.cursor.fetchone()[0]
-            activities.append(count)
+        points = downsample_lttb(
+            [(i, value) for i, (_, value) in enumerate(series)],
+            ACTIVITY_CHART_MAX_POINTS
+        )
         
-        ax.plot(dates, activities, marker='o')
-        ax.set_title('Weekly Transaction Activity')
-        ax.set_xlabel('Day')
-        ax.set_ylabel('Number of Transactions')
+        if len(series) <= 7:
+            date_format = '%a'
+        elif len(series) <= 90:
+            date_format = '%d %b'
+        else:
+            date_format = '%b %Y'
         
-        plt.xticks(rotation=45)
+        labels = [series[i][0].strftime(date_format) for i, _ in points]
         
-        plt.tight_layout()
+        range_titles = {'7d': 'Last 7 Days', '30d': 'Last 30 Days', '1y': 'Last Year', 'all': 'All Time'}
+        if metric == 'revenue':
+            self.activity_chart.set_labels(f'Revenue ({range_titles[range_key]})', 'Revenue (M)')
+        else:
+            self.activity_chart.set_labels(f'Transaction Activity ({range_titles[range_key]})', 'Number of Transactions')
         
-        canvas = FigureCanvasTkAgg(figure, parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.activity_chart.update(
+            labels,
+            [value for _, value in points],
+            [i for i, _ in points]
+        )
 
     def create_stock_levels_chart(self, parent):
         """Create stock levels chart with actual inventory data"""
-        figure, ax = plt.subplots(figsize=(6, 4))
-        
-        stock = self.service.inventory_model.get_stock()
+        self.stock_chart = StockLevelsChart(parent, figsize=(6, 4))
+        self.stock_chart.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+
+    def update_stock_levels_chart(self, stock=None):
+        """Update the stock levels chart with current inventory"""
+        if stock is None:
+            stock = self.service.inventory_model.get_stock()
         categories = []
         quantities = []
         
@@ -173,32 +288,19 @@ class AdminDashboardUI:
                 categories.append(item.capitalize())
                 quantities.append(stock[item]['quantity'])
         
-        bars = ax.bar(categories, quantities)
-        ax.set_title('Current Stock Levels')
-        ax.set_ylabel('Quantity')
-        
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{int(height):,}',
-                    ha='center', va='bottom')
-        
-        plt.xticks(rotation=45)
-        
-        plt.tight_layout()
-        
-        canvas = FigureCanvasTkAgg(figure, parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+        self.stock_chart.update(categories, quantities)
+
     def create_metric_card(self, parent, title, value, row, col):
-        """Create a metric card widget"""
+        """Create a metric card widget and return its value label"""
         card = ttk.Frame(parent, relief="solid", borderwidth=1)
         card.grid(row=row, column=col, padx=5, pady=5, sticky="nsew")
         
         ttk.Label(card, text=title, font=('Leelawadee', 10)).pack(pady=(5,0))
-        ttk.Label(card, text=value, font=('Leelawadee', 14, 'bold')).pack(pady=(0,5))
+        value_label = ttk.Label(card, text=value, font=('Leelawadee', 14, 'bold'))
+        value_label.pack(pady=(0,5))
         
         parent.grid_columnconfigure(col, weight=1)
+        return value_label
 
     def create_user_management_tab(self, parent):
         """Create user management interface"""
@@ -236,6 +338,7 @@ class AdminDashboardUI:
 
         scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.users_table.yview)
         self.users_table.configure(yscrollcommand=scrollbar.set)
+        self.users_rows = TreeviewBinding(self.users_table)
         
         self.users_table.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
@@ -271,6 +374,8 @@ class AdminDashboardUI:
             messagebox.showerror("Error", "User not found")
             return
         
+        version = self.auth_manager.get_user_version(username)
+        
         dialog = tk.Toplevel(self.root)
         dialog.title("Edit User")
         dialog.geometry("300x400")
@@ -313,13 +418,22 @@ class AdminDashboardUI:
                     username=username,
                     new_password=password_var.get() if password_var.get() else None,
                     role=fields['Role'].get(),
-                    full_name=fields['Full Name'].get()
+                    full_name=fields['Full Name'].get(),
+                    expected_version=version
                 ):
                     messagebox.showinfo("Success", "User updated successfully")
                     self.refresh_users_list()
                     dialog.destroy()
                 else:
                     messagebox.showerror("Error", "Failed to update user")
+            except UpdateConflictError:
+                messagebox.showerror(
+                    "Error",
+                    "This user was changed by someone else while you were editing. "
+                    "Please reopen the dialog and try again."
+                )
+                self.refresh_users_list()
+                dialog.destroy()
             except Exception as e:
                 messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
@@ -359,6 +473,7 @@ class AdminDashboardUI:
         date_controls = ttk.Frame(date_frame)
         date_controls.pack(pady=10)
         
+        today = self.service.clock.now()
         from_frame = ttk.Frame(date_controls)
         from_frame.pack(side='left', padx=20)
         ttk.Label(from_frame, text="From:", font=('Leelawadee', 10)).pack(pady=(0, 5))
@@ -369,7 +484,8 @@ class AdminDashboardUI:
             foreground='white',
             borderwidth=2,
             date_pattern='y-mm-dd',
-            font=('Leelawadee', 10)
+            font=('Leelawadee', 10),
+            year=today.year, month=today.month, day=today.day
         )
         self.start_date.pack()
         
@@ -383,7 +499,8 @@ class AdminDashboardUI:
             foreground='white',
             borderwidth=2,
             date_pattern='y-mm-dd',
-            font=('Leelawadee', 10)
+            font=('Leelawadee', 10),
+            year=today.year, month=today.month, day=today.day
         )
         self.end_date.pack()
         
@@ -394,7 +511,8 @@ class AdminDashboardUI:
             ("User Activity Report", "View detailed user activity and login statistics", self.generate_user_report),
             ("Print Jobs Report", "Track all printing activities and resource usage", self.generate_jobs_report),
             ("Stock Usage Report", "Monitor consumption of printer supplies", self.generate_stock_report),
-            ("System Performance Report", "Analyze system metrics and performance data", self.generate_performance_report)
+            ("System Performance Report", "Analyze system metrics and performance data", self.generate_performance_report),
+            ("Combined Branches Report", "Sales, services and expenses across all registered branches", self.generate_branches_report)
         ]
         
         for i, (report_name, description, command) in enumerate(reports):
@@ -555,6 +673,7 @@ class AdminDashboardUI:
                     for widget in stock_frame.winfo_children():
                         widget.destroy()
                     self.refresh_stock_display(stock_frame)
+                    self.update_stock_levels_chart()
                 else:
                     messagebox.showerror("Error", "Failed to add stock")
 
@@ -573,6 +692,116 @@ class AdminDashboardUI:
         )
         add_button.pack(pady=(10, 0))
 
+    def create_branches_tab(self, parent):
+        """Create the branch registry and combined summary view"""
+        button_frame = ttk.Frame(parent)
+        button_frame.pack(fill='x', pady=(0, 10))
+
+        ttk.Button(button_frame, text="Add Branch", command=self.add_branch).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Remove Branch", command=self.remove_selected_branch).pack(side='left', padx=5)
+
+        self.branch_period = tk.StringVar(value='Today')
+        ttk.Label(button_frame, text="Period:").pack(side='left', padx=(20, 5))
+        period_combo = ttk.Combobox(
+            button_frame,
+            textvariable=self.branch_period,
+            values=['Today', 'Last 7 days', 'Last 30 days'],
+            state='readonly',
+            width=12
+        )
+        period_combo.pack(side='left', padx=5)
+        period_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_branches())
+        ttk.Button(button_frame, text="Refresh", command=self.refresh_branches).pack(side='left', padx=5)
+
+        columns = ('Branch', 'Transactions', 'Revenue', 'Papers Used', 'Expenses', 'Balance', 'Database')
+        self.branches_table = ttk.Treeview(parent, columns=columns, show='headings')
+        for col in columns:
+            self.branches_table.heading(col, text=col)
+            self.branches_table.column(col, width=120)
+        self.branches_table.column('Database', width=300)
+        self.branches_table.pack(fill='both', expand=True)
+        self.branches_rows = TreeviewBinding(self.branches_table)
+
+        self.refresh_branches()
+
+    def branch_period_range(self):
+        days = {'Today': 0, 'Last 7 days': 6, 'Last 30 days': 29}[self.branch_period.get()]
+        end = self.service.clock.now().date()
+        return end - timedelta(days=days), end
+
+    def refresh_branches(self):
+        """Query every branch in parallel; the table updates when they have all answered"""
+        if self.branch_poll_job is not None:
+            self.root.after_cancel(self.branch_poll_job)
+            self.branch_job.cancel()
+        start, end = self.branch_period_range()
+        self.branch_job = self.branch_hub.submit_summaries(start, end)
+        self.poll_branches()
+
+    def poll_branches(self):
+        """Show the branch totals once the background queries finish, without blocking the UI"""
+        if not self.branch_job.done():
+            self.branch_poll_job = self.root.after(BRANCH_POLL_MS, self.poll_branches)
+            return
+        self.branch_poll_job = None
+        paths = {name: db_path for name, db_path, _ in self.branch_hub.get_branches()}
+        combined = combine_branches(self.branch_job.result())
+
+        rows = []
+        for name, summary in combined['branches'].items():
+            if 'error' in summary:
+                rows.append((name, (name, 'Unavailable', '', '', '', '', paths.get(name, ''))))
+                continue
+            rows.append((name, (
+                name,
+                summary['transactions'],
+                f"M{summary['revenue']:.2f}",
+                summary['papers_used'],
+                f"M{summary['total_expenses']:.2f}",
+                f"M{summary['revenue'] - summary['total_expenses']:.2f}",
+                paths.get(name, '')
+            )))
+        if rows:
+            rows.append(('__total__', (
+                'All branches',
+                combined['transactions'],
+                f"M{combined['revenue']:.2f}",
+                combined['papers_used'],
+                f"M{combined['total_expenses']:.2f}",
+                f"M{combined['balance']:.2f}",
+                ''
+            )))
+        self.branches_rows.update(rows)
+
+    def add_branch(self):
+        """Register another shop's database"""
+        db_path = filedialog.askopenfilename(
+            title="Select branch database",
+            filetypes=[("SQLite database", "*.db"), ("All files", "*.*")]
+        )
+        if not db_path:
+            return
+        name = simpledialog.askstring("Branch Name", "Name for this branch:", parent=self.root)
+        if not name or not name.strip():
+            return
+
+        if self.branch_hub.register_branch(name.strip(), db_path):
+            self.update_status(f"Branch {name.strip()} added")
+            self.refresh_branches()
+        else:
+            messagebox.showerror("Error", "A branch with that name already exists")
+
+    def remove_selected_branch(self):
+        selected_items = self.branches_table.selection()
+        if not selected_items or selected_items[0] == '__total__':
+            messagebox.showwarning("Warning", "Please select a branch to remove")
+            return
+
+        name = selected_items[0]
+        if messagebox.askyesno("Confirm Remove", f"Stop including branch {name} in reports?"):
+            self.branch_hub.remove_branch(name)
+            self.refresh_branches()
+
     def create_settings_tab(self, parent):
         """Create settings interface"""
         settings_frame = ttk.Frame(parent, padding="10")
@@ -584,6 +813,117 @@ class AdminDashboardUI:
         ttk.Button(backup_frame, text="Backup Now", command=self.backup_system).pack(pady=5)
         ttk.Button(backup_frame, text="Clear Cache", command=self.clear_cache).pack(pady=5)
         ttk.Button(backup_frame, text="System Check", command=self.system_check).pack(pady=5)
+        
+        profile_frame = ttk.LabelFrame(settings_frame, text="Profiling", padding="10")
+        profile_frame.pack(fill='x', pady=(0, 20))
+        
+        ttk.Label(profile_frame, text="Duration (s):").pack(side='left')
+        self.profile_seconds = tk.StringVar(value='30')
+        ttk.Combobox(
+            profile_frame,
+            textvariable=self.profile_seconds,
+            values=['10', '30', '60', '120', '300'],
+            state='readonly',
+            width=5
+        ).pack(side='left', padx=5)
+        self.profile_button = ttk.Button(profile_frame, text="Start Profiling", command=self.toggle_profiling)
+        self.profile_button.pack(side='left', padx=5)
+        self.profile_status = ttk.Label(profile_frame, text="Saves .prof and collapsed-stack files to diagnostics/")
+        self.profile_status.pack(side='left', padx=10)
+        self.profile_job = None
+        
+        queries_frame = ttk.LabelFrame(settings_frame, text="Query Statistics", padding="10")
+        queries_frame.pack(fill='both', expand=True)
+        
+        controls = ttk.Frame(queries_frame)
+        controls.pack(fill='x', pady=(0, 5))
+        ttk.Label(controls, text="Sort by:").pack(side='left')
+        self.queries_sort = tk.StringVar(value='Total ms')
+        sort_combo = ttk.Combobox(
+            controls,
+            textvariable=self.queries_sort,
+            values=['Total ms', 'p95 ms', 'Max ms', 'Calls', 'Rows'],
+            state='readonly',
+            width=10
+        )
+        sort_combo.pack(side='left', padx=5)
+        sort_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_query_stats())
+        ttk.Button(controls, text="Refresh", command=self.refresh_query_stats).pack(side='left', padx=5)
+        ttk.Button(controls, text="Reset", command=self.reset_query_stats).pack(side='left', padx=5)
+        
+        slow_log = QUERY_STATS.slow_log_path
+        ttk.Label(
+            controls,
+            text=f"Slow query log: {slow_log} (over {QUERY_STATS.slow_threshold_ms:g} ms)" if slow_log
+            else "Slow query log: off"
+        ).pack(side='right')
+        
+        columns = ('Query', 'Calls', 'Total ms', 'Mean ms', 'p95 ms', 'Max ms', 'Rows')
+        self.queries_table = ttk.Treeview(queries_frame, columns=columns, show='headings', height=12)
+        for col in columns:
+            self.queries_table.heading(col, text=col)
+            self.queries_table.column(col, width=80, anchor='e')
+        self.queries_table.column('Query', width=520, anchor='w')
+        self.queries_table.pack(fill='both', expand=True)
+        self.queries_rows = TreeviewBinding(self.queries_table)
+        self.refresh_query_stats()
+    
+    def refresh_query_stats(self):
+        """Show the most expensive queries run by this process"""
+        key = {
+            'Total ms': 'total_ms',
+            'p95 ms': 'p95_ms',
+            'Max ms': 'max_ms',
+            'Calls': 'calls',
+            'Rows': 'rows'
+        }[self.queries_sort.get()]
+        self.queries_rows.update(
+            (entry['query'], (
+                entry['query'],
+                entry['calls'],
+                f"{entry['total_ms']:.1f}",
+                f"{entry['mean_ms']:.2f}",
+                f"{entry['p95_ms']:.2f}",
+                f"{entry['max_ms']:.1f}",
+                entry['rows']
+            ))
+            for entry in QUERY_STATS.top(TOP_QUERIES, key)
+        )
+    
+    def reset_query_stats(self):
+        QUERY_STATS.reset()
+        self.refresh_query_stats()
+    
+    def toggle_profiling(self):
+        """Start a time-boxed profile of this window, or stop the one running"""
+        if PROFILER.active:
+            self.finish_profiling()
+            return
+        
+        seconds = int(self.profile_seconds.get())
+        try:
+            PROFILER.start(seconds, 'admin')
+        except RuntimeError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.profile_job = self.root.after(seconds * 1000, self.finish_profiling)
+        self.profile_button.config(text="Stop Profiling")
+        self.profile_status.config(text=f"Recording for up to {seconds} s...")
+        self.update_status("Profiling started")
+    
+    def finish_profiling(self):
+        if self.profile_job is not None:
+            self.root.after_cancel(self.profile_job)
+            self.profile_job = None
+        self.profile_button.config(text="Start Profiling")
+        
+        files = PROFILER.stop()
+        if not files:
+            return
+        prof_path, collapsed_path = files
+        self.profile_status.config(text=f"Saved {prof_path or 'no cProfile data'} and {collapsed_path}")
+        self.update_status("Profile saved")
+        messagebox.showinfo("Profiling", f"Profile saved:\n{prof_path}\n{collapsed_path}")
 
     def show_create_user_dialog(self):
         """Show dialog for creating a new user"""
@@ -638,11 +978,9 @@ class AdminDashboardUI:
 
     def refresh_users_list(self):
         """Refresh the users table"""
-        for item in self.users_table.get_children():
-            self.users_table.delete(item)
-        
-        for user in self.auth_manager.get_all_users():
-            self.users_table.insert('', 'end', values=user)
+        self.users_rows.update(
+            (user[0], user) for user in self.auth_manager.get_all_users()
+        )
 
     def refresh_stock_display(self, stock_frame):
         """Refresh the stock level display"""
@@ -692,13 +1030,16 @@ class AdminDashboardUI:
             if not os.path.exists(backup_dir):
                 os.makedirs(backup_dir)
             
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            timestamp = self.service.clock.now().strftime('%Y%m%d_%H%M%S')
             backup_path = os.path.join(backup_dir, f'backup_{timestamp}')
             
             self.service.export_data()
             
-            import shutil
-            shutil.copy2('printshop.db', f'{backup_path}_db.sqlite')
+            backup_conn = sqlite3.connect(f'{backup_path}_db.sqlite')
+            try:
+                self.service.db.conn.backup(backup_conn)
+            finally:
+                backup_conn.close()
             
             self.update_status("Backup completed successfully")
             messagebox.showinfo("Success", "System backup completed successfully")
@@ -826,6 +1167,31 @@ class AdminDashboardUI:
             except Exception as e:
                 checks['Directories'] = ('ERROR', f'Directory check failed: {str(e)}')
             
+            slowest = QUERY_STATS.top(3, 'p95_ms')
+            if slowest and slowest[0]['p95_ms'] >= QUERY_STATS.slow_threshold_ms:
+                checks['Slow Queries'] = ('WARNING', '; '.join(
+                    f"{entry['query'][:60]} (p95 {entry['p95_ms']:.0f} ms, {entry['calls']} calls)"
+                    for entry in slowest if entry['p95_ms'] >= QUERY_STATS.slow_threshold_ms
+                ))
+            else:
+                checks['Slow Queries'] = ('OK', f"No query has a p95 over {QUERY_STATS.slow_threshold_ms:g} ms")
+            
+            stalls = sorted(RECENT_STALLS, key=lambda stall: stall['seconds'], reverse=True)[:3]
+            if stalls:
+                checks['UI Responsiveness'] = ('WARNING', '; '.join(
+                    f"{stall['seconds']:.1f} s at {stall['time']} in {stall['blocked_in']}" for stall in stalls
+                ) + " (stacks in the diagnostics log)")
+            else:
+                checks['UI Responsiveness'] = ('OK', 'No UI stalls recorded this session')
+            
+            if MEMORY_WARNINGS:
+                latest = MEMORY_WARNINGS[-1]
+                checks['Memory'] = ('WARNING', f"{latest['time']}: {'; '.join(latest['problems'])}")
+            elif tracemalloc.is_tracing():
+                checks['Memory'] = ('OK', f"{tracemalloc.get_traced_memory()[0] / 1048576:.1f} MB traced, within budget")
+            else:
+                checks['Memory'] = ('OK', 'Memory monitor off (start with --memory-monitor)')
+            
             check_window = tk.Toplevel(self.root)
             check_window.title("System Health Check Results")
             check_window.geometry("600x400")
@@ -888,324 +1254,40 @@ class AdminDashboardUI:
     
     def generate_user_report(self):
         """Generate user activity report"""
-        try:
-            start = self.start_date.get_date()
-            end = self.end_date.get_date()
-            
-            report_dir = "reports"
-            if not os.path.exists(report_dir):
-                os.makedirs(report_dir)
-            
-            filename = os.path.join(report_dir, f"user_activity_{start}_{end}.txt")
-            
-            with open(filename, 'w') as f:
-                f.write(f"User Activity Report ({start} to {end})\n")
-                f.write("="*50 + "\n\n")
-                
-                users = self.auth_manager.get_all_users()
-                
-                for user in users:
-                    username = user[0]
-                    f.write(f"\nUser: {username}\n")
-                    f.write("-"*20 + "\n")
-                    
-                    self.service.db.cursor.execute('''
-                        SELECT COUNT(*), SUM(amount)
-                        FROM transactions
-                        WHERE date BETWEEN ? AND ?
-                        AND created_by = ?
-                    ''', (start, end, username))
-                    
-                    count, total = self.service.db.cursor.fetchone()
-                    count = count or 0
-                    total = total or 0
-                    
-                    f.write(f"Total Transactions: {count}\n")
-                    f.write(f"Total Amount: M{total:.2f}\n")
-                    
-                    self.service.db.cursor.execute('''
-                        SELECT service, COUNT(*)
-                        FROM transactions
-                        WHERE date BETWEEN ? AND ?
-                        AND created_by = ?
-                        GROUP BY service
-                    ''', (start, end, username))
-                    
-                    f.write("\nService Breakdown:\n")
-                    for service, service_count in self.service.db.cursor.fetchall():
-                        f.write(f"{service}: {service_count}\n")
-            
-            self.update_status("User report generated successfully")
-            messagebox.showinfo("Success", f"Report generated: {filename}")
-            
-        except Exception as e:
-            self.update_status("Report generation failed")
-            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+        self.write_report(self.report_writer.user_report, "User report generated successfully")
 
     def generate_jobs_report(self):
         """Generate print jobs report"""
-        try:
-            start = self.start_date.get_date()
-            end = self.end_date.get_date()
-            
-            report_dir = "reports"
-            if not os.path.exists(report_dir):
-                os.makedirs(report_dir)
-            
-            filename = os.path.join(report_dir, f"print_jobs_{start}_{end}.txt")
-            
-            with open(filename, 'w') as f:
-                f.write(f"Print Jobs Report ({start} to {end})\n")
-                f.write("="*50 + "\n\n")
-                
-                self.service.db.cursor.execute('''
-                    SELECT COUNT(*), SUM(amount), SUM(papers_used)
-                    FROM transactions
-                    WHERE date BETWEEN ? AND ?
-                ''', (start, end))
-                
-                count, total, papers = self.service.db.cursor.fetchone()
-                count = count or 0
-                total = total or 0
-                papers = papers or 0
-                
-                f.write("Overall Summary:\n")
-                f.write(f"Total Jobs: {count}\n")
-                f.write(f"Total Revenue: M{total:.2f}\n")
-                f.write(f"Total Papers Used: {papers}\n\n")
-                
-                f.write("Service Breakdown:\n")
-                f.write("-"*20 + "\n")
-                
-                self.service.db.cursor.execute('''
-                    SELECT service, 
-                           COUNT(*) as job_count,
-                           SUM(amount) as total_amount,
-                           SUM(papers_used) as total_papers
-                    FROM transactions
-                    WHERE date BETWEEN ? AND ?
-                    GROUP BY service
-                ''', (start, end))
-                
-                for service, job_count, service_total, service_papers in self.service.db.cursor.fetchall():
-                    f.write(f"\nService: {service}\n")
-                    f.write(f"Number of Jobs: {job_count}\n")
-                    f.write(f"Total Revenue: M{service_total:.2f}\n")
-                    f.write(f"Papers Used: {service_papers or 0}\n")
-            
-            self.update_status("Jobs report generated successfully")
-            messagebox.showinfo("Success", f"Report generated: {filename}")
-            
-        except Exception as e:
-            self.update_status("Report generation failed")
-            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+        self.write_report(self.report_writer.jobs_report, "Jobs report generated successfully")
 
     def generate_stock_report(self):
         """Generate stock usage report"""
-        try:
-            start = self.start_date.get_date()
-            end = self.end_date.get_date()
-            
-            report_dir = "reports"
-            if not os.path.exists(report_dir):
-                os.makedirs(report_dir)
-            
-            filename = os.path.join(report_dir, f"stock_usage_{start}_{end}.txt")
-            
-            with open(filename, 'w') as f:
-                f.write(f"Stock Usage Report ({start} to {end})\n")
-                f.write("="*50 + "\n\n")
-                
-                current_stock = self.service.inventory_model.get_stock()
-                
-                f.write("Current Stock Levels:\n")
-                f.write("-"*20 + "\n")
-                
-                if 'paper' in current_stock:
-                    paper = current_stock['paper']
-                    f.write(f"Paper: {paper['boxes']} boxes, {paper['rims']} rims, {paper['sheets']} sheets\n")
-                    f.write(f"Total Sheets: {paper['total_sheets']}\n")
-                
-                for item in ['file', 'envelope']:
-                    if item in current_stock:
-                        f.write(f"{item.capitalize()}: {current_stock[item]['quantity']} units\n")
-                
-                f.write("\nUsage Statistics:\n")
-                f.write("-"*20 + "\n")
-                
-                self.service.db.cursor.execute('''
-                    SELECT SUM(papers_used)
-                    FROM transactions
-                    WHERE date BETWEEN ? AND ?
-                ''', (start, end))
-                
-                total_papers = self.service.db.cursor.fetchone()[0] or 0
-                f.write(f"\nTotal Papers Used: {total_papers} sheets\n")
-                
-                for item in ['File', 'Envelope']:
-                    self.service.db.cursor.execute('''
-                        SELECT COUNT(*)
-                        FROM transactions
-                        WHERE date BETWEEN ? AND ?
-                        AND service = ?
-                    ''', (start, end, item))
-                    
-                    count = self.service.db.cursor.fetchone()[0] or 0
-                    f.write(f"{item}s Used: {count} units\n")
-                
-                f.write("\nStock Additions:\n")
-                f.write("-"*20 + "\n")
-                
-                self.service.db.cursor.execute('''
-                    SELECT date, quantity_added
-                    FROM paper_stock_log
-                    WHERE date BETWEEN ? AND ?
-                    ORDER BY date
-                ''', (start, end))
-                
-                for date, quantity in self.service.db.cursor.fetchall():
-                    f.write(f"{date}: Added {quantity} sheets\n")
-            
-            self.update_status("Stock report generated successfully")
-            messagebox.showinfo("Success", f"Report generated: {filename}")
-            
-        except Exception as e:
-            self.update_status("Report generation failed")
-            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+        self.write_report(self.report_writer.stock_report, "Stock report generated successfully")
 
     def generate_performance_report(self):
         """Generate system performance report"""
+        self.write_report(self.report_writer.performance_report, "Performance report generated successfully")
+    
+    def generate_branches_report(self):
+        """Generate a report combining every registered branch"""
+        if not self.branch_hub.get_branches():
+            messagebox.showwarning("Warning", "No branches registered. Add them in the Branches tab.")
+            return
+        
+        self.write_report(
+            lambda start, end: self.report_writer.branches_report(self.branch_hub, start, end),
+            "Branches report generated successfully"
+        )
+    
+    def write_report(self, write, success_message):
+        """Write one report for the selected date range and tell the user where it went"""
         try:
-            start = self.start_date.get_date()
-            end = self.end_date.get_date()
-            
-            report_dir = "reports"
-            if not os.path.exists(report_dir):
-                os.makedirs(report_dir)
-            
-            filename = os.path.join(report_dir, f"performance_{start}_{end}.txt")
+            with span('ui.report', 'action'):
+                filename = write(self.start_date.get_date(), self.end_date.get_date())
+                self.update_status(success_message)
+            with span('ui.messagebox', 'render'):
+                messagebox.showinfo("Success", f"Report generated: {filename}")
             
-            with open(filename, 'w') as f:
-                f.write(f"System Performance Report ({start} to {end})\n")
-                f.write("="*50 + "\n\n")
-                
-                f.write("Daily Transaction Statistics:\n")
-                f.write("-"*20 + "\n")
-                
-                self.service.db.cursor.execute('''
-                    SELECT date,
-                        COUNT(*) as transaction_count,
-                        SUM(amount) as daily_revenue,
-                        COUNT(DISTINCT created_by) as active_users
-                    FROM transactions
-                    WHERE date BETWEEN ? AND ?
-                    GROUP BY date
-                    ORDER BY date
-                ''', (start, end))
-                
-                total_days = 0
-                total_transactions = 0
-                total_revenue = 0
-            
-                
-                for date, count, revenue, users in self.service.db.cursor.fetchall():
-                    f.write(f"\nDate: {date}\n")
-                    f.write(f"Transactions: {count}\n")
-                    f.write(f"Revenue: M{revenue:.2f}\n")
-                   
-                    
-                    total_days += 1
-                    total_transactions += count
-                    total_revenue += revenue
-                   
-                
-                if total_days > 0:
-                    f.write("\nAverages:\n")
-                    f.write(f"Daily Transactions: {total_transactions/total_days:.1f}\n")
-                    f.write(f"Daily Revenue: M{total_revenue/total_days:.2f}\n")
-                   
-                
-                f.write("\nPeak Usage Hours:\n")
-                f.write("-"*20 + "\n")
-                
-                self.service.db.cursor.execute('''
-                    SELECT strftime('%H', timestamp) as hour,
-                        COUNT(*) as transaction_count
-                    FROM transactions
-                    WHERE date BETWEEN ? AND ?
-                    GROUP BY hour
-                    ORDER BY transaction_count DESC
-                    LIMIT 5
-                ''', (start, end))
-                
-                for hour, count in self.service.db.cursor.fetchall():
-                    f.write(f"{hour}:00 - {count} transactions\n")
-                
-                f.write("\nService Popularity:\n")
-                f.write("-"*20 + "\n")
-                
-                self.service.db.cursor.execute('''
-                    SELECT service,
-                        COUNT(*) as usage_count,
-                        SUM(amount) as total_revenue
-                    FROM transactions
-                    WHERE date BETWEEN ? AND ?
-                    GROUP BY service
-                    ORDER BY usage_count DESC
-                ''', (start, end))
-                
-                for service, count, revenue in self.service.db.cursor.fetchall():
-                    f.write(f"{service}:\n")
-                    f.write(f"Usage Count: {count}\n")
-                    f.write(f"Revenue: M{revenue:.2f}\n")
-                    
-                f.write("\nSystem Health:\n")
-                f.write("-"*20 + "\n")
-                
-                db_size = os.path.getsize('printshop.db') / (1024 * 1024)  
-                f.write(f"Database Size: {db_size:.2f} MB\n")
-                
-                try:
-                    if hasattr(os, 'statvfs'): 
-                        stat = os.statvfs('/')
-                        free = (stat.f_bavail * stat.f_frsize) / (1024 * 1024 * 1024)  
-                        total = (stat.f_blocks * stat.f_frsize) / (1024 * 1024 * 1024)  
-                        used_percent = ((total - free) / total) * 100
-                    else:  
-                        import ctypes
-                        free_bytes = ctypes.c_ulonglong(0)
-                        total_bytes = ctypes.c_ulonglong(0)
-                        ctypes.windll.kernel32.GetDiskFreeSpaceExW(
-                            ctypes.c_wchar_p('.'), None, ctypes.pointer(total_bytes), 
-                            ctypes.pointer(free_bytes)
-                        )
-                        total = total_bytes.value / (1024 * 1024 * 1024)  
-                        free = free_bytes.value / (1024 * 1024 * 1024)  
-                        used_percent = ((total - free) / total) * 100
-                    
-                    f.write(f"Disk Space Used: {used_percent:.1f}%\n")
-                    f.write(f"Free Space: {free:.1f} GB\n")
-                except Exception as disk_error:
-                    f.write(f"Disk Space Check Error: {str(disk_error)}\n")
-                
-                low_stock_items = []
-                stock = self.service.inventory_model.get_stock()
-                
-                if 'paper' in stock and stock['paper']['total_sheets'] < self.service.stock_thresholds['paper']:
-                    low_stock_items.append('Paper')
-                if 'file' in stock and stock['file']['quantity'] < self.service.stock_thresholds['file']:
-                    low_stock_items.append('Files')
-                if 'envelope' in stock and stock['envelope']['quantity'] < self.service.stock_thresholds['envelope']:
-                    low_stock_items.append('Envelopes')
-                
-                if low_stock_items:
-                    f.write("\nLow Stock Warnings:\n")
-                    for item in low_stock_items:
-                        f.write(f"- {item}\n")
-            
-            self.update_status("Performance report generated successfully")
-            messagebox.showinfo("Success", f"Report generated: {filename}")
-                    
         except Exception as e:
             self.update_status("Report generation failed")
             messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
@@ -1230,6 +1312,15 @@ class AdminDashboardUI:
         if messagebox.askyesno("Logout", "Are you sure you want to logout?"):
             try:
                 self.service.db.conn.commit()
+                self.root.after_cancel(self.dashboard_refresh_job)
+                if self.live_updates:
+                    self.root.after_cancel(self.live_updates_job)
+                    self.live_updates.close()
+                self.activity_chart.destroy()
+                self.stock_chart.destroy()
+                if self.branch_poll_job is not None:
+                    self.root.after_cancel(self.branch_poll_job)
+                self.branch_hub.close()
                 self.root.withdraw()
                 self.root.quit()
                 from login_ui import LoginUI
@@ -0,0 +1,213 @@
+import http.client
+import json
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urlencode, urlparse
+
+from api_server import ApiError
+from auth import User
+from clock import SystemClock
+from services import PrintShopService, StockError
+
+class ApiClient:
+    """Minimal JSON client for the PrintShop API over one keep-alive connection.
+
+    An instance is not thread-safe; give each thread its own client.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        url = urlparse(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = timeout
+        self.token = None
+        self._conn = None
+
+    def request(self, method, path, body=None, query=None, headers=None, data=None):
+        """Send a request and return the decoded JSON, raising ApiError on errors
+
+        data: an already encoded body, sent as is with the caller's headers
+        """
+        if query:
+            query = {k: v for k, v in query.items() if v is not None}
+            path = f"{path}?{urlencode(query)}"
+        headers = dict(headers or {})
+        payload = data
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=payload, headers=headers)
+                response = self._conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+
+        result = json.loads(data) if data else None
+        if response.status >= 400:
+            message = result.pop('error', 'Request failed') if isinstance(result, dict) else 'Request failed'
+            raise ApiError(response.status, message, **(result or {}))
+        return result
+
+    def get(self, path, **query):
+        return self.request('GET', path, query=query)
+
+    def post(self, path, body=None, headers=None):
+        return self.request('POST', path, body=body or {}, headers=headers)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+class RemoteAuthManager:
+    """AuthManager stand-in that logs in against the API server"""
+
+    def __init__(self, client):
+        self.client = client
+        self.current_user = None
+
+    def authenticate(self, username, password):
+        try:
+            result = self.client.post('/api/login', {'username': username, 'password': password})
+        except ApiError as e:
+            if e.status == 401:
+                return False
+            raise
+        self.client.token = result['token']
+        self.current_user = User(result['username'], result['role'], result['full_name'])
+        return True
+
+    def get_all_users(self):
+        return [tuple(user) for user in self.client.get('/api/users')]
+
+    def is_admin(self):
+        return self.current_user and self.current_user.role == "admin"
+
+class RemoteInventory:
+    def __init__(self, client):
+        self.client = client
+
+    def get_quantities(self):
+        return self.client.get('/api/stock')['quantities']
+
+    def get_stock(self, item_type=None):
+        result = self.client.get('/api/stock')
+        if item_type:
+            return result['quantities'].get(item_type, 0)
+        return result['stock']
+
+    def add_stock(self, item_type, quantity, unit_type=None):
+        try:
+            self.client.post('/api/stock', {'item': item_type, 'quantity': quantity, 'unit_type': unit_type})
+            return True
+        except ApiError:
+            return False
+
+class RemoteActivity:
+    def __init__(self, client):
+        self.client = client
+
+    def recent(self, limit=10, date=None):
+        sales = self.client.get('/api/activity/recent', limit=limit, date=date)
+        for sale in sales:
+            sale['time'] = datetime.strptime(sale['timestamp'], '%Y-%m-%d %H:%M:%S')
+        return sales
+
+    def sales_per_minute(self, minutes=30, now=None):
+        return self.client.get('/api/activity/rate', minutes=minutes)
+
+class RemoteService:
+    """Thin-client replacement for PrintShopService used by PrintShopUI.
+
+    Sales are sent with an idempotency key and retried on connection
+    failures, so a sale is never recorded twice.
+    """
+    SALE_RETRIES = 3
+
+    stock_needed = PrintShopService.stock_needed
+
+    def __init__(self, client):
+        self.client = client
+        self.current_user = None
+        self.clock = SystemClock()
+        self.inventory_model = RemoteInventory(client)
+        self.recent_activity = RemoteActivity(client)
+        
+        config = client.get('/api/config')
+        self.prices = config['prices']
+        self.stock_thresholds = config['stock_thresholds']
+        self.stock_items = config['stock_items']
+        self.expense_categories = config['expense_categories']
+
+    def set_current_user(self, user):
+        self.current_user = user
+
+    def process_transaction(self, service, quantity, papers_per_item=0):
+        result = self.process_sale([(service, quantity, papers_per_item)])
+        result['sale'] = result['lines'][0]
+        return result
+
+    def process_sale(self, lines, request_key=None):
+        request_key = request_key or uuid.uuid4().hex
+        body = {'lines': [list(line) for line in lines]}
+        for attempt in range(self.SALE_RETRIES):
+            try:
+                return self.client.post('/api/sales', body, headers={'Idempotency-Key': request_key})
+            except ApiError as e:
+                if e.status == 409:
+                    raise StockError(e.details.get('item'))
+                if e.status == 400:
+                    raise ValueError(e.message)
+                raise
+            except (OSError, http.client.HTTPException):
+                if attempt == self.SALE_RETRIES - 1:
+                    raise
+                time.sleep(0.2 * (attempt + 1))
+
+    def record_expense(self, category, amount, description):
+        try:
+            self.client.post('/api/expenses', {'category': category, 'amount': amount, 'description': description})
+        except ApiError as e:
+            if e.status == 400:
+                raise ValueError(e.message)
+            raise
+
+    def get_daily_summary(self):
+        result = self.client.get('/api/summary/daily')
+        return result['amount'], result['papers_used']
+
+    def get_service_summary(self):
+        return self.client.get('/api/summary/services')
+
+    def get_period_summary(self, start, end):
+        return self.client.get('/api/summary/period', start=start, end=end)
+
+    def get_daily_records(self, limit=30):
+        return self.client.get('/api/daily-records', limit=limit)
+
+    def fetch_history_page(self, source, filters=None, after=None, before=None, limit=None):
+        query = dict(filters or {})
+        query.update(source=source, limit=limit)
+        if after:
+            query.update(after_date=after[0], after_key=after[1])
+        elif before:
+            query.update(before_date=before[0], before_key=before[1])
+        return self.client.get('/api/history', **query)
+
+    def end_day(self):
+        self.client.post('/api/end-day')
+
+    def export_data(self):
+        self.client.post('/api/export')
@@ -0,0 +1,571 @@
+import argparse
+import json
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from activity import RecentActivity
+from auth import AuthManager
+from changefeed import ChangeFeed, JournalWatcher
+from events import EventBus, coalesce
+from metrics import render as render_metrics
+from models import ConnectionPool
+from profiler import PROFILER
+from services import PrintShopService, StockError
+from sync import SyncHub
+from tracing import span
+from timeseries import TimeSeriesProvider
+from webdash import DASHBOARD_HTML, DashboardCache, make_etag
+
+class ApiError(Exception):
+    """Error returned to API clients as a JSON body with an HTTP status"""
+    def __init__(self, status, message, **details):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details
+
+class WaitForChanges(Exception):
+    """Raised by a handler to be re-run once the journal has moved past after_seq"""
+    def __init__(self, after_seq, timeout):
+        super().__init__(after_seq)
+        self.after_seq = after_seq
+        self.timeout = timeout
+
+class Response:
+    """Non-JSON response returned by a route handler"""
+    def __init__(self, body, content_type='text/plain; charset=utf-8', status=200, headers=None):
+        self.body = body if isinstance(body, bytes) else body.encode('utf-8')
+        self.content_type = content_type
+        self.status = status
+        self.headers = headers or {}
+
+class EventStream:
+    """Server-Sent Events response fed by an EventBus subscription"""
+    KEEPALIVE_SECONDS = 15
+
+    def __init__(self, subscription, backlog=None):
+        self.subscription = subscription
+        self.backlog = backlog
+
+    def updates(self):
+        """Yield updates, or None when a keepalive is due, until the subscription closes"""
+        if self.backlog:
+            yield self.backlog
+        while not self.subscription.closed:
+            yield self.subscription.get(self.KEEPALIVE_SECONDS)
+
+def valid_sale_line(line):
+    """True for [service, quantity] or [service, quantity, papers_per_item] with sensible types"""
+    if not isinstance(line, list) or len(line) not in (2, 3):
+        return False
+    quantity = line[1]
+    papers = line[2] if len(line) == 3 else 0
+    return (isinstance(line[0], str)
+            and isinstance(quantity, int) and not isinstance(quantity, bool) and quantity > 0
+            and isinstance(papers, int) and not isinstance(papers, bool) and papers >= 0)
+
+class Request:
+    def __init__(self, method, path, query, body, headers):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.body = body
+        self.headers = headers
+        self.user = None
+
+        auth_header = headers.get('Authorization', '')
+        self.token = auth_header[7:] if auth_header.startswith('Bearer ') else None
+
+    def param(self, name, default=None, type=str):
+        """Return a query parameter converted with type, or raise a 400"""
+        value = self.query.get(name)
+        if value is None or value == '':
+            return default
+        try:
+            return type(value)
+        except ValueError:
+            raise ApiError(400, f"Invalid value for {name}")
+
+    def limit(self, default=None, maximum=5000):
+        """Return the limit parameter clamped to 1..maximum, or default if absent"""
+        value = self.param('limit', None, int)
+        if value is None:
+            return default
+        return max(1, min(value, maximum))
+
+    def etag_matches(self, etag):
+        """True if the client's If-None-Match already names etag"""
+        header = self.headers.get('If-None-Match')
+        if not header:
+            return False
+        return header.strip() == '*' or etag in [value.strip() for value in header.split(',')]
+
+    def field(self, name, default=None):
+        return self.body.get(name, default) if isinstance(self.body, dict) else default
+
+class ApiContext:
+    """Per-connection objects, reused by every request on that connection"""
+    def __init__(self, db, recent_activity):
+        self.db = db
+        self.service = PrintShopService(db, recent_activity=recent_activity)
+        self.auth = AuthManager(db)
+        self.timeseries = TimeSeriesProvider(db)
+        self.sync_hub = SyncHub(db)
+        self.feed = ChangeFeed(db)
+
+class PrintShopAPI:
+    """JSON API over PrintShopService, Inventory and AuthManager.
+
+    Each request checks a connection out of a ConnectionPool and uses the
+    service objects bound to it, so concurrent requests never share a
+    cursor. Clients authenticate with a session token from POST /api/login.
+    """
+    MAX_CHANGES_WAIT = 25
+    DASHBOARD_ETAG = make_etag(DASHBOARD_HTML)
+
+    def __init__(self, db_name='printshop.db', pool_size=8, clock=None):
+        self.pool = ConnectionPool(db_name, pool_size, clock)
+        self.recent_activity = RecentActivity(clock=clock)
+        with self.pool.connection() as db:
+            self.recent_activity.seed(db)
+        self.dashboard_cache = DashboardCache()
+        self.event_bus = EventBus()
+        self.watcher = JournalWatcher(db_name, self.event_bus)
+
+        self._contexts = {}
+        self._contexts_lock = threading.Lock()
+        self.routes = {}
+        self.register_routes()
+
+    def route(self, method, path, handler, auth='user'):
+        """Register handler(request, ctx) for a path
+
+        auth: None for public routes, 'user' for any session, 'admin' for admins
+        """
+        self.routes[(method, path)] = (handler, auth)
+
+    def context(self, db):
+        with self._contexts_lock:
+            ctx = self._contexts.get(id(db))
+            if ctx is None:
+                ctx = ApiContext(db, self.recent_activity)
+                self._contexts[id(db)] = ctx
+            return ctx
+
+    def handle(self, request):
+        """Authenticate and dispatch a request, returning its payload
+
+        A handler that needs to wait for new journal events raises
+        WaitForChanges; the wait happens here, after its connection has
+        gone back to the pool, and the handler is then run again.
+        """
+        try:
+            with span(f"{request.method} {request.path}", 'api'):
+                return PROFILER.profile_call(self.dispatch, request)
+        except WaitForChanges as e:
+            self.watcher.wait(e.after_seq, e.timeout)
+            request.query['wait'] = '0'
+            return self.dispatch(request)
+
+    def dispatch(self, request):
+        entry = self.routes.get((request.method, request.path))
+        if entry is None:
+            raise ApiError(404, "Not found")
+        handler, auth = entry
+
+        with self.pool.connection() as db:
+            ctx = self.context(db)
+            if auth:
+                user = ctx.auth.get_session_user(request.token) if request.token else None
+                if user is None:
+                    raise ApiError(401, "Login required")
+                if auth == 'admin' and user.role != 'admin':
+                    raise ApiError(403, "Admin access required")
+                request.user = user
+            ctx.service.set_current_user(request.user)
+            return handler(request, ctx)
+
+    def register_routes(self):
+        self.route('GET', '/api/health', self.health, auth=None)
+        self.route('GET', '/metrics', self.metrics, auth=None)
+        self.route('POST', '/api/login', self.login, auth=None)
+        self.route('POST', '/api/logout', self.logout)
+        self.route('GET', '/api/config', self.config, auth=None)
+        self.route('GET', '/api/users', self.users)
+        self.route('GET', '/api/stock', self.stock)
+        self.route('POST', '/api/stock', self.add_stock, auth='admin')
+        self.route('POST', '/api/sales', self.sale)
+        self.route('POST', '/api/expenses', self.expense)
+        self.route('GET', '/api/summary/daily', self.daily_summary)
+        self.route('GET', '/api/summary/services', self.service_summary)
+        self.route('GET', '/api/summary/period', self.period_summary)
+        self.route('GET', '/api/activity/recent', self.recent_sales)
+        self.route('GET', '/api/activity/rate', self.sales_rate)
+        self.route('GET', '/api/daily-records', self.daily_records)
+        self.route('GET', '/api/history', self.history)
+        self.route('GET', '/api/timeseries', self.timeseries)
+        self.route('POST', '/api/end-day', self.end_day)
+        self.route('POST', '/api/export', self.export)
+        self.route('POST', '/api/sync/push', self.sync_push)
+        self.route('GET', '/api/changes', self.changes, auth='admin')
+        self.route('POST', '/api/changes/ack', self.ack_changes, auth='admin')
+        self.route('GET', '/api/changes/consumers', self.change_consumers, auth='admin')
+        self.route('GET', '/api/events', self.events, auth='admin')
+        self.route('GET', '/', self.dashboard_page, auth=None)
+        self.route('GET', '/dashboard', self.dashboard_page, auth=None)
+        self.route('GET', '/api/dashboard', self.dashboard, auth='admin')
+        self.route('POST', '/api/profile', self.start_profile, auth='admin')
+        self.route('GET', '/api/profile', self.profile_status, auth='admin')
+
+    def close(self):
+        self.event_bus.close()
+        self.watcher.stop()
+        self.pool.close()
+
+    def health(self, request, ctx):
+        ctx.db.cursor.execute('SELECT 1')
+        return {'status': 'ok'}
+
+    def metrics(self, request, ctx):
+        return Response(render_metrics(), 'text/plain; version=0.0.4; charset=utf-8')
+
+    def login(self, request, ctx):
+        username = request.field('username')
+        password = request.field('password')
+        if not username or not password or not ctx.auth.authenticate(username, password):
+            raise ApiError(401, "Invalid username or password")
+        user = ctx.auth.current_user
+        ctx.auth.current_user = None
+        return {
+            'token': ctx.auth.create_session(user.username),
+            'username': user.username,
+            'role': user.role,
+            'full_name': user.full_name
+        }
+
+    def logout(self, request, ctx):
+        ctx.auth.end_session(request.token)
+        return {'status': 'ok'}
+
+    def config(self, request, ctx):
+        return {
+            'prices': ctx.service.prices,
+            'stock_thresholds': ctx.service.stock_thresholds,
+            'stock_items': ctx.service.stock_items,
+            'expense_categories': ctx.service.expense_categories
+        }
+
+    def users(self, request, ctx):
+        return ctx.auth.get_all_users()
+
+    def stock(self, request, ctx):
+        return {
+            'quantities': ctx.service.inventory_model.get_quantities(),
+            'stock': ctx.service.inventory_model.get_stock()
+        }
+
+    def add_stock(self, request, ctx):
+        item = request.field('item')
+        quantity = request.field('quantity')
+        if item not in ('paper', 'file', 'envelope') or not isinstance(quantity, int) or quantity <= 0:
+            raise ApiError(400, "item must be paper, file or envelope and quantity a positive integer")
+        if not ctx.service.inventory_model.add_stock(item, quantity, request.field('unit_type')):
+            raise ApiError(500, "Failed to add stock")
+        return {'quantities': ctx.service.inventory_model.get_quantities()}
+
+    def sale(self, request, ctx):
+        lines = request.field('lines')
+        if not isinstance(lines, list) or not all(valid_sale_line(line) for line in lines):
+            raise ApiError(400, "lines must be a list of [service, quantity, papers_per_item] "
+                                "with a positive integer quantity")
+        key = request.headers.get('Idempotency-Key') or request.field('request_key')
+        try:
+            return ctx.service.process_sale(lines, request_key=key)
+        except StockError as e:
+            raise ApiError(409, str(e), item=e.item)
+        except (ValueError, TypeError) as e:
+            raise ApiError(400, str(e))
+
+    def expense(self, request, ctx):
+        try:
+            amount = float(request.field('amount'))
+            ctx.service.record_expense(request.field('category'), amount, request.field('description', ''))
+        except (ValueError, TypeError) as e:
+            raise ApiError(400, str(e))
+        return {'status': 'ok'}
+
+    def daily_summary(self, request, ctx):
+        amount, papers = ctx.service.get_daily_summary()
+        return {'amount': amount, 'papers_used': papers}
+
+    def service_summary(self, request, ctx):
+        return ctx.service.get_service_summary()
+
+    def period_summary(self, request, ctx):
+        start = request.param('start')
+        end = request.param('end')
+        if not start or not end:
+            raise ApiError(400, "start and end are required")
+        return ctx.service.get_period_summary(start, end)
+
+    def recent_sales(self, request, ctx):
+        sales = self.recent_activity.recent(request.limit(10), request.param('date'))
+        return [{k: v for k, v in sale.items() if k != 'time'} for sale in sales]
+
+    def sales_rate(self, request, ctx):
+        return self.recent_activity.sales_per_minute(request.param('minutes', 30, int))
+
+    def daily_records(self, request, ctx):
+        return ctx.service.get_daily_records(request.limit(30))
+
+    def history(self, request, ctx):
+        source = request.param('source', 'transactions')
+        if source not in ('transactions', 'expenses', 'daily_records'):
+            raise ApiError(400, "Unknown history source")
+        filters = {name: request.param(name) for name in ('start', 'end', 'service', 'user', 'category')}
+        after = before = None
+        if request.param('after_date'):
+            after = (request.param('after_date'), request.param('after_key', type=int))
+        elif request.param('before_date'):
+            before = (request.param('before_date'), request.param('before_key', type=int))
+        return ctx.service.fetch_history_page(source, filters, after, before, request.limit())
+
+    def timeseries(self, request, ctx):
+        range_key = request.param('range', '7d')
+        metric = request.param('metric', 'count')
+        if range_key not in TimeSeriesProvider.RANGES or metric not in TimeSeriesProvider.METRICS:
+            raise ApiError(400, "Unknown range or metric")
+        series = ctx.timeseries.get_range_series(range_key, metric)
+        return [[day.strftime('%Y-%m-%d'), value] for day, value in series]
+
+    def end_day(self, request, ctx):
+        ctx.service.end_day()
+        return {'status': 'ok'}
+
+    def export(self, request, ctx):
+        ctx.service.export_data()
+        return {'status': 'ok'}
+
+    def sync_push(self, request, ctx):
+        terminal_id = request.field('terminal_id')
+        events = request.field('events')
+        if not terminal_id or not isinstance(events, list):
+            raise ApiError(400, "terminal_id and events are required")
+        try:
+            return ctx.sync_hub.apply(terminal_id, events)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ApiError(400, f"Invalid sync event: {e}")
+
+    def changes(self, request, ctx):
+        """Return journal events after a consumer's offset or an explicit seq
+
+        wait: seconds to long-poll when there are no new events yet
+        """
+        consumer = request.param('consumer')
+        after = ctx.feed.get_offset(consumer) if consumer else request.param('after', 0, int)
+        kinds = request.param('kinds')
+        events = ctx.feed.fetch(after, request.limit(500), kinds.split(',') if kinds else None)
+
+        wait = min(request.param('wait', 0, float), self.MAX_CHANGES_WAIT)
+        if not events and wait > 0:
+            raise WaitForChanges(after, wait)
+        return {'after': after, 'events': events}
+
+    def ack_changes(self, request, ctx):
+        consumer = request.field('consumer')
+        seq = request.field('seq')
+        if not consumer or not isinstance(seq, int):
+            raise ApiError(400, "consumer and an integer seq are required")
+        ctx.feed.commit_offset(consumer, seq)
+        return {'consumer': consumer, 'seq': seq}
+
+    def change_consumers(self, request, ctx):
+        return [
+            {'consumer': consumer, 'seq': seq, 'lag': lag, 'updated_at': updated_at}
+            for consumer, seq, lag, updated_at in ctx.feed.get_consumers()
+        ]
+
+    def events(self, request, ctx):
+        """Stream coalesced sale, expense, stock and end-of-day updates as SSE
+
+        A reconnecting client sends Last-Event-ID and first receives one
+        update covering everything it missed.
+        """
+        kinds = request.param('kinds')
+        kinds = kinds.split(',') if kinds else None
+        subscription = self.event_bus.subscribe(kinds, request.param('interval', type=float))
+
+        backlog = None
+        last_id = request.headers.get('Last-Event-ID')
+        if last_id and last_id.isdigit():
+            after = int(last_id)
+            while after < subscription.after_seq:
+                events = [e for e in ctx.feed.fetch(after, 1000, kinds) if e['seq'] <= subscription.after_seq]
+                if not events:
+                    break
+                backlog = coalesce(events, backlog)
+                after = events[-1]['seq']
+        return EventStream(subscription, backlog)
+
+    def start_profile(self, request, ctx):
+        """Profile the server's request handling for the next seconds (at most 600)"""
+        seconds = request.field('seconds', 30)
+        if not isinstance(seconds, (int, float)) or not 0 < seconds <= 600:
+            raise ApiError(400, "seconds must be a number from 1 to 600")
+        try:
+            PROFILER.start(seconds, 'api', profile_thread=False)
+        except RuntimeError as e:
+            raise ApiError(409, str(e))
+        timer = threading.Timer(seconds, PROFILER.stop)
+        timer.daemon = True
+        timer.start()
+        return {'status': 'recording', 'seconds': seconds}
+
+    def profile_status(self, request, ctx):
+        prof_path, collapsed_path = PROFILER.last_files or (None, None)
+        return {
+            'recording': PROFILER.active,
+            'prof': prof_path,
+            'collapsed': collapsed_path,
+            'top': PROFILER.summary(request.param('limit', 15, int))
+        }
+
+    def not_modified(self, etag):
+        return Response(b'', status=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+    def dashboard_page(self, request, ctx):
+        """Serve the read-only web dashboard"""
+        if request.etag_matches(self.DASHBOARD_ETAG):
+            return self.not_modified(self.DASHBOARD_ETAG)
+        return Response(
+            DASHBOARD_HTML,
+            'text/html; charset=utf-8',
+            headers={'ETag': self.DASHBOARD_ETAG, 'Cache-Control': 'no-cache'}
+        )
+
+    def dashboard(self, request, ctx):
+        """Return overview metrics, weekly activity and stock from the shared cache
+
+        A client that sends the ETag it already has gets a 304 after one
+        data version lookup.
+        """
+        etag, payload = self.dashboard_cache.get(ctx)
+        if request.etag_matches(etag):
+            return self.not_modified(etag)
+        return Response(
+            json.dumps(payload, default=str),
+            'application/json',
+            headers={'ETag': etag, 'Cache-Control': 'no-cache'}
+        )
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'PrintShopAPI/1.0'
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            data = self.rfile.read(length) if length else b''
+            if data and self.headers.get('Content-Encoding') == 'deflate':
+                data = zlib.decompress(data)
+            body = json.loads(data) if data else {}
+            request = Request(method, url.path, query, body, self.headers)
+            result = self.server.api.handle(request)
+        except ApiError as e:
+            result = Response(
+                json.dumps({'error': e.message, **e.details}),
+                'application/json',
+                e.status
+            )
+        except (json.JSONDecodeError, zlib.error):
+            result = Response(json.dumps({'error': "Invalid JSON body"}), 'application/json', 400)
+        except Exception as e:
+            self.log_error("Unhandled error: %s", e)
+            result = Response(json.dumps({'error': "Internal server error"}), 'application/json', 500)
+
+        if not isinstance(result, (Response, EventStream)):
+            result = Response(json.dumps(result, default=str), 'application/json')
+        self.send_result(result)
+
+    def send_result(self, result):
+        if isinstance(result, EventStream):
+            self.send_event_stream(result)
+            return
+        self.send_response(result.status)
+        self.send_header('Content-Type', result.content_type)
+        self.send_header('Content-Length', str(len(result.body)))
+        for name, value in result.headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(result.body)
+
+    def send_event_stream(self, stream):
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        try:
+            for update in stream.updates():
+                if update is None:
+                    self.wfile.write(b': keepalive\n\n')
+                else:
+                    data = json.dumps(update, default=str)
+                    self.wfile.write(f"id: {update['seq']}\nevent: update\ndata: {data}\n\n".encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            stream.subscription.close()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, api, verbose=False):
+        super().__init__(address, APIRequestHandler)
+        self.api = api
+        self.verbose = verbose
+
+def serve(db_name='printshop.db', host='127.0.0.1', port=8765, pool_size=8, verbose=True):
+    """Run the API server until interrupted"""
+    server = APIServer((host, port), PrintShopAPI(db_name, pool_size), verbose)
+    print(f"PrintShop API listening on http://{host}:{server.server_address[1]}")
+    print(f"Web dashboard at http://{host}:{server.server_address[1]}/dashboard")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.api.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the PrintShop HTTP JSON API")
+    parser.add_argument('--db', default='printshop.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--pool-size', type=int, default=8)
+    args = parser.parse_args()
+    serve(args.db, args.host, args.port, args.pool_size)
+
+if __name__ == "__main__":
+    main()
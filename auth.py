@@ -1,6 +1,9 @@
 import hashlib
+import secrets
 import sqlite3
-from datetime import datetime
+from datetime import timedelta
+
+from models import UpdateConflictError
 
 class User:
     def __init__(self, username, role, full_name):
@@ -9,6 +12,8 @@ class User:
         self.full_name = full_name
 
 class AuthManager:
+    SESSION_HOURS = 12
+
     def __init__(self, db_manager):
         self.db = db_manager
         self.init_auth_database()
@@ -27,6 +32,17 @@ class AuthManager:
                 created_by TEXT
             )
         ''')
+        
+        self.db.add_column_if_missing('users', 'version', 'INTEGER NOT NULL DEFAULT 0')
+        
+        self.db.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                token TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                expires_at TEXT NOT NULL
+            )
+        ''')
         self.db.conn.commit()
 
     def create_admin_if_not_exists(self):
@@ -48,7 +64,7 @@ class AuthManager:
     def register_user(self, username, password, role, full_name, created_by):
         """Register a new user"""
         try:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            timestamp = self.db.clock.now().strftime('%Y-%m-%d %H:%M:%S')
             password_hash = self.hash_password(password)
             
             self.db.cursor.execute('''
@@ -78,6 +94,37 @@ class AuthManager:
             return True
         return False
 
+    def create_session(self, username):
+        """Create a login session token for an authenticated user"""
+        token = secrets.token_hex(32)
+        now = self.db.clock.now()
+        
+        self.db.cursor.execute('''
+            INSERT INTO sessions (token, username, created_at, expires_at)
+            VALUES (?, ?, ?, ?)
+        ''', (token, username, now.strftime('%Y-%m-%d %H:%M:%S'),
+              (now + timedelta(hours=self.SESSION_HOURS)).strftime('%Y-%m-%d %H:%M:%S')))
+        
+        self.db.conn.commit()
+        return token
+
+    def get_session_user(self, token):
+        """Return the User for a valid, unexpired session token"""
+        self.db.cursor.execute('''
+            SELECT u.username, u.role, u.full_name
+            FROM sessions s
+            JOIN users u ON u.username = s.username
+            WHERE s.token = ? AND s.expires_at > ?
+        ''', (token, self.db.clock.now().strftime('%Y-%m-%d %H:%M:%S')))
+        
+        result = self.db.cursor.fetchone()
+        return User(result[0], result[1], result[2]) if result else None
+
+    def end_session(self, token):
+        """Invalidate a session token"""
+        self.db.cursor.execute('DELETE FROM sessions WHERE token = ?', (token,))
+        self.db.conn.commit()
+
     def get_all_users(self):
         """Get list of all users"""
         self.db.cursor.execute('''
@@ -86,8 +133,18 @@ class AuthManager:
         ''')
         return self.db.cursor.fetchall()
 
-    def update_user(self, username, new_password=None, role=None, full_name=None):
-        """Update user information"""
+    def get_user_version(self, username):
+        """Return the version of a user's row, or None if the user does not exist"""
+        self.db.cursor.execute('SELECT version FROM users WHERE username = ?', (username,))
+        result = self.db.cursor.fetchone()
+        return result[0] if result else None
+
+    def update_user(self, username, new_password=None, role=None, full_name=None, expected_version=None):
+        """Update user information
+
+        expected_version: version read when the edit started; if the user has
+        been changed since, UpdateConflictError is raised and nothing is saved
+        """
         try:
             update_fields = []
             values = []
@@ -107,14 +164,25 @@ class AuthManager:
             if not update_fields:
                 return True
                 
+            update_fields.append("version = version + 1")
             values.append(username)
+            where = "username = ?"
+            if expected_version is not None:
+                where += " AND version = ?"
+                values.append(expected_version)
             
             self.db.cursor.execute(f'''
                 UPDATE users 
                 SET {", ".join(update_fields)}
-                WHERE username = ?
+                WHERE {where}
             ''', values)
             
+            if self.db.cursor.rowcount == 0:
+                self.db.conn.rollback()
+                if expected_version is not None and self.get_user_version(username) is not None:
+                    raise UpdateConflictError(f"User {username} was changed by someone else")
+                return False
+            
             self.db.conn.commit()
             return True
         except sqlite3.Error:
@@ -0,0 +1,419 @@
+"""Benchmark suite for the PrintShop data paths.
+
+Generates a seeded, realistic multi-year shop history (transactions,
+expenses, users, daily records and paper restocks) at a chosen size, then
+times the service calls, admin reports and dashboard loads against it.
+Results are written as JSON so runs from different commits can be
+compared; the same --seed and --rows always produce the same dataset.
+
+    python benchmark.py --rows 100000 --output before.json
+    python benchmark.py --rows 100000 --compare before.json
+
+Sizes from 10k to 10M transaction rows are practical; larger datasets
+take a while to generate, so keep one with --db and reuse it across runs
+(the benchmarks add a few sales to it each time).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from activity import RecentActivity
+from auth import AuthManager, User
+from branches import BranchHub
+from models import DatabaseManager
+from reports import ReportWriter
+from services import PrintShopService
+from timeseries import TimeSeriesProvider, downsample_lttb
+from webdash import DashboardCache, dashboard_version
+
+SERVICES = [
+    # service, weight, max quantity, papers per item
+    ("Photocopy", 45, 40, 1),
+    ("Printing", 30, 25, 1),
+    ("Scanning", 10, 10, 0),
+    ("Lamination", 7, 4, 0),
+    ("File", 4, 3, 0),
+    ("Envelope", 4, 6, 0)
+]
+PRICES = {
+    "Photocopy": 2.00,
+    "Printing": 3.00,
+    "Scanning": 4.00,
+    "Lamination": 10.00,
+    "File": 15.00,
+    "Envelope": 3.00
+}
+EXPENSES = [
+    # category, weight, typical amount
+    ('Mottakase', 40, 60),
+    ('Pampiri', 25, 450),
+    ('INK/Cardrige', 15, 800),
+    ('Drawings', 20, 300)
+]
+HOURS = [8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18]
+HOUR_WEIGHTS = [3, 6, 9, 10, 8, 9, 10, 9, 7, 5, 2]
+EXPENSE_RATIO = 25
+INSERT_BATCH = 50000
+ACTIVITY_CHART_MAX_POINTS = 120
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def day_counts(rng, total, days):
+    """Spread total rows over days with growth, a weekly cycle and some noise"""
+    weights = []
+    for i, day in enumerate(days):
+        growth = 0.6 + 0.8 * i / max(1, len(days) - 1)
+        weekday = 0.3 if day.weekday() == 6 else 0.7 if day.weekday() == 5 else 1.0
+        season = 1.3 if day.month in (1, 2, 11) else 1.0
+        weights.append(growth * weekday * season * rng.uniform(0.7, 1.3))
+
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for i in rng.choices(range(len(days)), weights=weights, k=total - sum(counts)):
+        counts[i] += 1
+    return counts
+
+def timestamps(rng, day, count):
+    """Return count sorted timestamps within the shop's opening hours on day"""
+    seconds = sorted(
+        hour * 3600 + rng.randrange(3600)
+        for hour in rng.choices(HOURS, weights=HOUR_WEIGHTS, k=count)
+    )
+    base = day.strftime('%Y-%m-%d')
+    return [f"{base} {s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in seconds]
+
+def insert_batches(db, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == INSERT_BATCH:
+            db.cursor.executemany(sql, batch)
+            batch = []
+    if batch:
+        db.cursor.executemany(sql, batch)
+
+def generate_dataset(path, rows, years, seed, users):
+    """Create a database at path holding a synthetic shop history ending today
+
+    Returns the dataset description stored in the results.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    db = DatabaseManager(path)
+    auth = AuthManager(db)
+    db.cursor.execute('PRAGMA synchronous=OFF')
+
+    today = datetime.now()
+    today = datetime(today.year, today.month, today.day)
+    days = [today - timedelta(days=i) for i in range(int(years * 365) - 1, -1, -1)]
+
+    cashiers = [f"cashier{i:02d}" for i in range(1, users + 1)]
+    password_hash = auth.hash_password('benchmark')
+    db.cursor.executemany('''
+        INSERT OR IGNORE INTO users (username, password_hash, role, full_name, created_at, created_by)
+        VALUES (?, ?, 'user', ?, ?, 'admin')
+    ''', [(name, password_hash, f"Cashier {name[-2:]}", days[0].strftime('%Y-%m-%d 08:00:00')) for name in cashiers])
+
+    services = [service for service, _, _, _ in SERVICES]
+    service_weights = [weight for _, weight, _, _ in SERVICES]
+    service_info = {service: (quantity, papers) for service, _, quantity, papers in SERVICES}
+    daily = {}
+
+    def transactions():
+        for day, count in zip(days, day_counts(rng, rows, days)):
+            date = day.strftime('%Y-%m-%d')
+            on_shift = rng.sample(cashiers, min(len(cashiers), rng.randint(1, 3)))
+            income = 0.0
+            papers_used = 0
+            sale_id = None
+            for timestamp in timestamps(rng, day, count):
+                service = rng.choices(services, weights=service_weights)[0]
+                max_quantity, papers_per_item = service_info[service]
+                quantity = min(max_quantity, int(rng.expovariate(3 / max_quantity)) + 1)
+                amount = quantity * PRICES[service]
+                papers = quantity * papers_per_item
+                if sale_id is None or rng.random() < 0.7:
+                    sale_id = f"{rng.getrandbits(128):032x}"
+                income += amount
+                papers_used += papers
+                yield (date, service, quantity, amount, papers, timestamp, rng.choice(on_shift), sale_id)
+            daily[date] = [income, papers_used, dict.fromkeys((category for category, _, _ in EXPENSES), 0.0)]
+
+    insert_batches(db, '''
+        INSERT INTO transactions
+        (date, service, quantity, amount, papers_used, timestamp, created_by, sale_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', transactions())
+
+    categories = [category for category, _, _ in EXPENSES]
+    category_weights = [weight for _, weight, _ in EXPENSES]
+    typical = {category: amount for category, _, amount in EXPENSES}
+    expense_rows = max(1, rows // EXPENSE_RATIO)
+
+    def expenses():
+        for day, count in zip(days, day_counts(rng, expense_rows, days)):
+            date = day.strftime('%Y-%m-%d')
+            for timestamp in timestamps(rng, day, count):
+                category = rng.choices(categories, weights=category_weights)[0]
+                amount = round(typical[category] * rng.uniform(0.5, 1.5), 2)
+                daily[date][2][category] += amount
+                yield (date, category, amount, f"{category} purchase", timestamp, 'admin')
+
+    insert_batches(db, '''
+        INSERT INTO expenses (date, category, amount, description, timestamp, created_by)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', expenses())
+
+    def restocks():
+        papers = sum(values[1] for values in daily.values())
+        interval = 7
+        per_restock = max(500, papers * interval // max(1, len(days)))
+        for day in days[::interval]:
+            yield (day.strftime('%Y-%m-%d'), per_restock, day.strftime('%Y-%m-%d 08:15:00'), 'admin')
+
+    insert_batches(db, '''
+        INSERT INTO paper_stock_log (date, quantity_added, timestamp, created_by)
+        VALUES (?, ?, ?, ?)
+    ''', restocks())
+
+    today_key = today.strftime('%Y-%m-%d')
+    db.cursor.executemany('''
+        INSERT OR REPLACE INTO daily_records
+        (date, daily_income, mottakase, pampiri, ink_cardrige, drawings,
+         total_expenses, balance, papers_used)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (date, income, spent['Mottakase'], spent['Pampiri'], spent['INK/Cardrige'], spent['Drawings'],
+         sum(spent.values()), income - sum(spent.values()), papers)
+        for date, (income, papers, spent) in daily.items() if date != today_key
+    ])
+
+    db.cursor.execute("UPDATE inventory SET quantity = 100000000")
+    db.conn.commit()
+    db.cursor.execute('ANALYZE')
+    db.close()
+
+    return {
+        'rows': rows,
+        'expenses': expense_rows,
+        'users': users,
+        'days': len(days),
+        'years': years,
+        'seed': seed,
+        'generate_seconds': round(time.perf_counter() - started, 2)
+    }
+
+def summarize(samples):
+    samples_ms = [sample * 1000 for sample in samples]
+    return {
+        'runs': len(samples_ms),
+        'min_ms': round(min(samples_ms), 4),
+        'median_ms': round(statistics.median(samples_ms), 4),
+        'mean_ms': round(statistics.fmean(samples_ms), 4),
+        'p95_ms': round(percentile(samples_ms, 95), 4),
+        'max_ms': round(max(samples_ms), 4)
+    }
+
+def measure(func, runs, setup=None):
+    samples = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def run_benchmarks(path, repeat, sales, only=None):
+    """Time every benchmark against the database at path; returns {name: stats}"""
+    db = DatabaseManager(path)
+    auth = AuthManager(db)
+    service = PrintShopService(db, User('cashier01', 'user', 'Cashier 01'))
+    writer = ReportWriter(service, auth, report_dir='reports')
+    timeseries = TimeSeriesProvider(db)
+    dashboard = SimpleNamespace(db=db, service=service, timeseries=timeseries)
+    branch_hub = BranchHub(db)
+    branch_hub.register_branch('benchmark', path)
+
+    today = datetime.now().date()
+    db.cursor.execute('SELECT MIN(date) FROM transactions')
+    first = db.cursor.fetchone()[0] or str(today)
+    ranges = {'30d': (str(today - timedelta(days=29)), str(today)), 'all': (first, str(today))}
+
+    rng = random.Random(0)
+    services = [service for service, _, _, _ in SERVICES]
+
+    def sale():
+        name = rng.choice(services)
+        service.process_transaction(name, rng.randint(1, 5), 1 if name in ("Photocopy", "Printing") else 0)
+
+    def export():
+        service.export_data()
+        shutil.rmtree('exports', ignore_errors=True)
+
+    def activity_chart():
+        for range_key in TimeSeriesProvider.RANGES:
+            series = timeseries.get_range_series(range_key)
+            downsample_lttb([(i, value) for i, (_, value) in enumerate(series)], ACTIVITY_CHART_MAX_POINTS)
+
+    def clear_branch_cache():
+        branch_hub._cache.clear()
+
+    benchmarks = [
+        ('process_transaction', sale, sales, None),
+        ('get_daily_summary', service.get_daily_summary, repeat, None),
+        ('get_service_summary', service.get_service_summary, repeat, None),
+        ('end_day', service.end_day, repeat, None),
+        ('export_data', export, repeat, None),
+        ('dashboard_build', lambda: DashboardCache().build(dashboard, dashboard_version(db)), repeat, None),
+        ('dashboard_activity_chart', activity_chart, repeat, None),
+        ('recent_activity_seed', lambda: RecentActivity().seed(db), repeat, None),
+        ('history_first_page', lambda: service.fetch_history_page('transactions'), repeat, None),
+    ]
+    for range_name, (start, end) in ranges.items():
+        for report in ('user', 'jobs', 'stock', 'performance'):
+            write = getattr(writer, f"{report}_report")
+            benchmarks.append((f"report_{report}_{range_name}", lambda write=write, start=start, end=end: write(start, end), repeat, None))
+        benchmarks.append((
+            f"report_branches_{range_name}",
+            lambda start=start, end=end: writer.branches_report(branch_hub, start, end),
+            repeat, clear_branch_cache
+        ))
+
+    results = {}
+    try:
+        for name, func, runs, setup in benchmarks:
+            if only and not any(pattern in name for pattern in only):
+                continue
+            func()
+            results[name] = summarize(measure(func, runs, setup))
+            print(f"{name:32} median {results[name]['median_ms']:10.3f} ms  p95 {results[name]['p95_ms']:10.3f} ms", flush=True)
+    finally:
+        branch_hub.close()
+        db.close()
+    return results
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                               text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        return commit, bool(dirty)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def compare(baseline, current, threshold):
+    """Print per-benchmark median changes; returns the names that got slower than threshold percent"""
+    regressions = []
+    print(f"\n{'benchmark':32} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, stats in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:32} {'-':>12} {stats['median_ms']:12.3f}      new")
+            continue
+        change = (stats['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  slower'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"{name:32} {before['median_ms']:12.3f} {stats['median_ms']:12.3f} {change:+8.1f}%{flag}")
+
+    if baseline['meta'].get('dataset', {}).get('rows') != current['meta'].get('dataset', {}).get('rows'):
+        print("\nWarning: the two runs used datasets of different sizes")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PrintShop against a synthetic shop history")
+    parser.add_argument('--rows', type=int, default=100000, help="transaction rows to generate")
+    parser.add_argument('--years', type=float, default=3, help="years of history to spread them over")
+    parser.add_argument('--users', type=int, default=12, help="cashier accounts")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument('--sales', type=int, default=200, help="timed process_transaction calls")
+    parser.add_argument('--only', action='append', help="run only benchmarks whose name contains this")
+    parser.add_argument('--db', help="keep the generated database here and reuse it if it exists")
+    parser.add_argument('--output', help="write the JSON results to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="percent slowdown in the median reported as a regression")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='printshop-bench-')
+    path = os.path.abspath(args.db) if args.db else os.path.join(workdir, 'printshop.db')
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        if os.path.exists(path):
+            dataset = {}
+            if os.path.exists(path + '.dataset.json'):
+                with open(path + '.dataset.json') as f:
+                    dataset = json.load(f)
+            print(f"Reusing {path}")
+        else:
+            print(f"Generating {args.rows} transactions over {args.years} years (seed {args.seed})...", flush=True)
+            dataset = generate_dataset(path, args.rows, args.years, args.seed, args.users)
+            if args.db:
+                with open(path + '.dataset.json', 'w') as f:
+                    json.dump(dataset, f)
+            print(f"Generated in {dataset['generate_seconds']} s")
+        dataset['db_size_mb'] = round(os.path.getsize(path) / (1024 * 1024), 2)
+
+        results = run_benchmarks(path, args.repeat, args.sales, args.only)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    commit, dirty = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'dataset': dataset
+        },
+        'results': results
+    }
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {output}")
+
+    if baseline:
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than {args.threshold:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import os
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+def connect_readonly(db_path):
+    return sqlite3.connect(Path(db_path).resolve().as_uri() + '?mode=ro', uri=True, timeout=30)
+
+def branch_data_version(conn, db_path):
+    """Return a value that changes whenever a branch's sales, expenses or stock change
+
+    Every mutation appends to the journal and every stock change bumps an
+    inventory version, so these two numbers are enough. Databases created
+    before the journal existed fall back to the file's size and mtime.
+    """
+    try:
+        return conn.execute('''
+            SELECT (SELECT IFNULL(MAX(seq), 0) FROM journal),
+                   (SELECT IFNULL(SUM(version), 0) FROM inventory)
+        ''').fetchone()
+    except sqlite3.OperationalError:
+        stat = os.stat(db_path)
+        return (stat.st_size, stat.st_mtime_ns)
+
+def summarize_branch(db_path, start, end):
+    """Compute the mergeable report aggregates for one branch database
+
+    Runs in a worker thread on its own read-only connection; sqlite3
+    releases the GIL while a query runs, so branches are read in parallel.
+    """
+    conn = connect_readonly(db_path)
+    try:
+        cursor = conn.cursor()
+        summary = {}
+
+        cursor.execute('''
+            SELECT COUNT(*), IFNULL(SUM(amount), 0), IFNULL(SUM(papers_used), 0)
+            FROM transactions
+            WHERE date BETWEEN ? AND ?
+        ''', (start, end))
+        summary['transactions'], summary['revenue'], summary['papers_used'] = cursor.fetchone()
+
+        cursor.execute('''
+            SELECT service, COUNT(*), IFNULL(SUM(amount), 0), IFNULL(SUM(papers_used), 0)
+            FROM transactions
+            WHERE date BETWEEN ? AND ?
+            GROUP BY service
+        ''', (start, end))
+        summary['services'] = {row[0]: list(row[1:]) for row in cursor.fetchall()}
+
+        cursor.execute('''
+            SELECT date, created_by, COUNT(*), IFNULL(SUM(amount), 0)
+            FROM transactions
+            WHERE date BETWEEN ? AND ?
+            GROUP BY date, created_by
+        ''', (start, end))
+        summary['daily_users'] = [list(row) for row in cursor.fetchall()]
+
+        cursor.execute('''
+            SELECT strftime('%H', timestamp), COUNT(*)
+            FROM transactions
+            WHERE date BETWEEN ? AND ?
+            GROUP BY 1
+        ''', (start, end))
+        summary['hours'] = dict(cursor.fetchall())
+
+        cursor.execute('''
+            SELECT category, IFNULL(SUM(amount), 0)
+            FROM expenses
+            WHERE date BETWEEN ? AND ?
+            GROUP BY category
+        ''', (start, end))
+        summary['expenses'] = dict(cursor.fetchall())
+        summary['total_expenses'] = sum(summary['expenses'].values())
+
+        cursor.execute('SELECT item, quantity FROM inventory')
+        summary['stock'] = dict(cursor.fetchall())
+        return summary
+    finally:
+        conn.close()
+
+def merge_summaries(summaries):
+    """Combine branch summaries into one, as if all sales happened in one shop"""
+    merged = {
+        'transactions': 0,
+        'revenue': 0,
+        'papers_used': 0,
+        'services': {},
+        'users': {},
+        'daily': {},
+        'hours': {},
+        'expenses': {},
+        'total_expenses': 0,
+        'stock': {}
+    }
+    daily_users = {}
+
+    for summary in summaries:
+        for key in ('transactions', 'revenue', 'papers_used', 'total_expenses'):
+            merged[key] += summary[key]
+
+        for service, values in summary['services'].items():
+            totals = merged['services'].setdefault(service, [0, 0, 0])
+            for i, value in enumerate(values):
+                totals[i] += value
+
+        for date, user, count, revenue in summary['daily_users']:
+            day = merged['daily'].setdefault(date, [0, 0])
+            day[0] += count
+            day[1] += revenue
+            daily_users.setdefault(date, set()).add(user)
+
+            totals = merged['users'].setdefault(user, [0, 0])
+            totals[0] += count
+            totals[1] += revenue
+
+        for name in ('hours', 'expenses', 'stock'):
+            for key, value in summary[name].items():
+                merged[name][key] = merged[name].get(key, 0) + value
+
+    merged['active_users'] = {date: len(users) for date, users in daily_users.items()}
+    merged['balance'] = merged['revenue'] - merged['total_expenses']
+    return merged
+
+def combine_branches(branches):
+    """Merge {branch name: summary} results, keeping them under 'branches'"""
+    combined = merge_summaries(summary for summary in branches.values() if 'error' not in summary)
+    combined['branches'] = branches
+    return combined
+
+class SummaryJob:
+    """Branch summaries being computed by BranchHub.submit_summaries
+
+    done() never blocks, so a Tk callback can poll it with root.after and
+    call result() once it is true. result() must be called on the thread
+    that owns the hub, since it fills the hub's cache.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.results = {}
+        self.pending = {}
+
+    def done(self):
+        return all(future.done() for future, _, _ in self.pending.values())
+
+    def cancel(self):
+        for future, _, _ in self.pending.values():
+            future.cancel()
+
+    def result(self):
+        """Wait for every branch and return {branch name: summary or {'error': message}}"""
+        for name, (future, key, version) in self.pending.items():
+            try:
+                summary = future.result()
+            except Exception as e:
+                self.results[name] = {'error': str(e)}
+                continue
+            summary['version'] = version
+            self.results[name] = summary
+            self.hub.cache_summary(key, summary)
+        self.pending = {}
+        return self.results
+
+class BranchHub:
+    """Head-office view over several branch databases.
+
+    Branches are registered in the local database. Report aggregates are
+    computed for every branch in parallel worker threads, so a combined
+    report takes about as long as the slowest branch. Results are cached
+    per branch and date range until that branch's data version changes,
+    and only stale branches are queried again. The UI uses
+    submit_summaries and polls the returned job instead of blocking.
+    """
+    CACHE_SIZE = 256
+
+    def __init__(self, db_manager, max_workers=None):
+        self.db = db_manager
+        self.max_workers = max_workers
+        self._executor = None
+        self._cache = OrderedDict()
+        self.init_branch_table()
+
+    def init_branch_table(self):
+        self.db.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS branches (
+                name TEXT PRIMARY KEY,
+                db_path TEXT NOT NULL,
+                added_at TEXT NOT NULL
+            )
+        ''')
+        self.db.conn.commit()
+
+    def register_branch(self, name, db_path):
+        """Register a branch database, returning False if the name is taken"""
+        try:
+            self.db.cursor.execute('''
+                INSERT INTO branches (name, db_path, added_at)
+                VALUES (?, ?, ?)
+            ''', (name, os.path.abspath(db_path), self.db.clock.now().strftime('%Y-%m-%d %H:%M:%S')))
+            self.db.conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def remove_branch(self, name):
+        self.db.cursor.execute('DELETE FROM branches WHERE name = ?', (name,))
+        self.db.conn.commit()
+
+    def get_branches(self):
+        """Return (name, db_path, added_at) for every registered branch"""
+        self.db.cursor.execute('SELECT name, db_path, added_at FROM branches ORDER BY name')
+        return self.db.cursor.fetchall()
+
+    def branch_summaries(self, start, end):
+        """Return {branch name: summary}, or {'error': message} for unreadable branches"""
+        return self.submit_summaries(start, end).result()
+
+    def submit_summaries(self, start, end):
+        """Start querying every stale branch in the background and return a SummaryJob"""
+        start, end = str(start), str(end)
+        job = SummaryJob(self)
+        results = job.results
+        stale = {}
+
+        for name, db_path, _ in self.get_branches():
+            try:
+                conn = connect_readonly(db_path)
+                try:
+                    version = branch_data_version(conn, db_path)
+                finally:
+                    conn.close()
+            except (sqlite3.Error, OSError) as e:
+                results[name] = {'error': str(e)}
+                continue
+
+            cached = self._cache.get((db_path, start, end))
+            if cached and cached['version'] == version:
+                self._cache.move_to_end((db_path, start, end))
+                results[name] = cached
+            else:
+                stale[name] = (db_path, version)
+
+        if stale:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='branch')
+            for name, (db_path, version) in stale.items():
+                future = self._executor.submit(summarize_branch, db_path, start, end)
+                job.pending[name] = (future, (db_path, start, end), version)
+
+        return job
+
+    def cache_summary(self, key, summary):
+        self._cache[key] = summary
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def combined_summary(self, start, end):
+        """Return the merged summary of every readable branch plus the per-branch results"""
+        return combine_branches(self.branch_summaries(start, end))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,270 @@
+"""Change feed over the journal for downstream consumers.
+
+Every sale, expense, stock move and end of day is appended to the journal
+in the same transaction as the change itself (see
+DatabaseManager.record_event), so the journal is a transactional outbox: an
+event exists if and only if its change was committed. Consumers read it
+in seq order and store how far they got in consumer_offsets, which makes
+delivery at-least-once and resumable. Events every consumer has passed
+are pruned at the end of the day once they are older than
+RETENTION_DAYS, so a consumer registered later starts from what is left.
+
+    python changefeed.py --consumer accounting --follow
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import timedelta
+
+from models import DatabaseManager
+
+class ChangeFeed:
+    """Batch reader over the journal with durable, named consumer offsets"""
+    POLL_INTERVAL = 0.002
+    MAX_POLL_INTERVAL = 0.01
+    RETENTION_DAYS = 7
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self.init_offsets_table()
+
+    def init_offsets_table(self):
+        self.db.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS consumer_offsets (
+                consumer TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        self.db.conn.commit()
+
+    def latest_seq(self):
+        self.db.cursor.execute('SELECT IFNULL(MAX(seq), 0) FROM journal')
+        return self.db.cursor.fetchone()[0]
+
+    def fetch(self, after_seq=0, limit=500, kinds=None):
+        """Return up to limit events with seq > after_seq, oldest first
+
+        The read is a range scan on the journal's primary key, so its cost
+        depends only on the number of events returned.
+        """
+        sql = 'SELECT seq, event_id, kind, payload, created_at FROM journal WHERE seq > ?'
+        params = [after_seq]
+        if kinds:
+            sql += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+            params.extend(kinds)
+        sql += ' ORDER BY seq LIMIT ?'
+        params.append(limit)
+
+        self.db.cursor.execute(sql, params)
+        return [
+            {'seq': seq, 'event_id': event_id, 'kind': kind, 'payload': json.loads(payload), 'created_at': created_at}
+            for seq, event_id, kind, payload, created_at in self.db.cursor.fetchall()
+        ]
+
+    def count_after(self, after_seq):
+        self.db.cursor.execute('SELECT COUNT(*) FROM journal WHERE seq > ?', (after_seq,))
+        return self.db.cursor.fetchone()[0]
+
+    def get_offset(self, consumer):
+        """Return the last seq a consumer has committed, 0 for a new consumer"""
+        self.db.cursor.execute('SELECT seq FROM consumer_offsets WHERE consumer = ?', (consumer,))
+        result = self.db.cursor.fetchone()
+        return result[0] if result else 0
+
+    def commit_offset(self, consumer, seq, commit=True):
+        """Record that a consumer has processed every event up to seq
+
+        With commit=False the offset joins the caller's open transaction,
+        so it can be stored atomically with the consumer's own writes.
+        """
+        self.db.cursor.execute('''
+            INSERT INTO consumer_offsets (consumer, seq, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT (consumer) DO UPDATE SET seq = excluded.seq, updated_at = excluded.updated_at
+        ''', (consumer, seq, self.db.clock.now().strftime('%Y-%m-%d %H:%M:%S')))
+        if commit:
+            self.db.conn.commit()
+
+    def register(self, consumer):
+        """Start tracking a consumer at seq 0 unless it already has an offset
+
+        A registered consumer is listed with its lag before its first commit,
+        and holds back pruning until it has caught up.
+        """
+        self.db.cursor.execute('''
+            INSERT OR IGNORE INTO consumer_offsets (consumer, seq, updated_at)
+            VALUES (?, 0, ?)
+        ''', (consumer, self.db.clock.now().strftime('%Y-%m-%d %H:%M:%S')))
+        self.db.conn.commit()
+
+    def prune(self, retention_days=None):
+        """Delete events that every consumer has processed and that are older than retention_days
+
+        With no consumers registered nothing holds events back except the
+        retention window, which also covers readers that follow by seq
+        without storing an offset. The newest event is always kept so
+        latest_seq never goes backwards. Returns the number of events deleted.
+        """
+        retention_days = self.RETENTION_DAYS if retention_days is None else retention_days
+        cutoff = (self.db.clock.now() - timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+        self.db.cursor.execute('''
+            DELETE FROM journal
+            WHERE seq <= (SELECT IFNULL(MIN(seq), (SELECT MAX(seq) FROM journal)) FROM consumer_offsets)
+              AND seq < (SELECT MAX(seq) FROM journal)
+              AND created_at < ?
+        ''', (cutoff,))
+        deleted = self.db.cursor.rowcount
+        self.db.conn.commit()
+        return deleted
+
+    def get_consumers(self):
+        """Return (consumer, seq, lag, updated_at) for every consumer"""
+        latest = self.latest_seq()
+        self.db.cursor.execute('SELECT consumer, seq, updated_at FROM consumer_offsets ORDER BY consumer')
+        return [(consumer, seq, latest - seq, updated_at) for consumer, seq, updated_at in self.db.cursor.fetchall()]
+
+    def read(self, consumer, limit=500, kinds=None):
+        """Return the next batch for a consumer without moving its offset"""
+        return self.fetch(self.get_offset(consumer), limit, kinds)
+
+    def wait(self, after_seq, timeout=None):
+        """Block until an event newer than after_seq is committed, by any connection
+
+        Polls PRAGMA data_version, which only changes when another
+        connection commits, so an idle wait does not touch the journal.
+        Returns the latest seq, which equals after_seq on timeout. The
+        polling goes through the raw connection rather than the
+        instrumented cursor, so it stays out of QUERY_STATS and traces.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interval = self.POLL_INTERVAL
+        data_version = None
+
+        while True:
+            current = self.db.conn.execute('PRAGMA data_version').fetchone()[0]
+            if current != data_version:
+                data_version = current
+                latest = self.db.conn.execute('SELECT IFNULL(MAX(seq), 0) FROM journal').fetchone()[0]
+                if latest > after_seq:
+                    return latest
+                interval = self.POLL_INTERVAL
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return after_seq
+            time.sleep(interval if deadline is None else max(0, min(interval, deadline - time.monotonic())))
+            interval = min(self.MAX_POLL_INTERVAL, interval * 2)
+
+    def consume(self, consumer, handler, batch_size=500, kinds=None, stop_event=None):
+        """Feed batches to handler(events) until stop_event is set
+
+        The offset is committed after handler returns, so a crash in the
+        handler replays the batch on the next run.
+        """
+        while stop_event is None or not stop_event.is_set():
+            offset = self.get_offset(consumer)
+            events = self.fetch(offset, batch_size, kinds)
+            if events:
+                handler(events)
+                self.commit_offset(consumer, events[-1]['seq'])
+            else:
+                self.wait(offset, timeout=0.5)
+
+class JournalWatcher:
+    """Background thread that tracks the newest journal seq for many waiters.
+
+    Lets any number of threads wait for new events without each one
+    polling the database or holding a connection while it waits. Given an
+    EventBus, it also publishes every new event to it as soon as it is
+    committed.
+    """
+    PUBLISH_BATCH = 1000
+
+    def __init__(self, db_name, bus=None):
+        self.db_name = db_name
+        self.bus = bus
+        self.latest_seq = 0
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self.run, name='journal-watcher', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def run(self):
+        db = DatabaseManager(self.db_name, check_same_thread=False)
+        feed = ChangeFeed(db)
+        try:
+            self.latest_seq = feed.latest_seq()
+            if self.bus is not None:
+                self.bus.last_seq = self.latest_seq
+            self._ready.set()
+            while not self._stopping:
+                latest = feed.wait(self.latest_seq, timeout=0.5)
+                if latest == self.latest_seq:
+                    continue
+                if self.bus is not None:
+                    latest = max(latest, self.publish(feed, self.latest_seq))
+                with self._condition:
+                    self.latest_seq = latest
+                    self._condition.notify_all()
+        finally:
+            self._ready.set()
+            db.close()
+
+    def publish(self, feed, after_seq):
+        """Publish every event after after_seq and return the last seq published"""
+        while True:
+            events = feed.fetch(after_seq, self.PUBLISH_BATCH)
+            if not events:
+                return after_seq
+            self.bus.publish(events)
+            after_seq = events[-1]['seq']
+
+    def wait(self, after_seq, timeout=None):
+        """Block until the journal has an event newer than after_seq; returns the latest seq"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.latest_seq > after_seq or self._stopping, timeout)
+            return self.latest_seq
+
+    def stop(self):
+        self._stopping = True
+        with self._condition:
+            self._condition.notify_all()
+        self._thread.join(2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the PrintShop change feed as JSON lines")
+    parser.add_argument('--db', default='printshop.db')
+    parser.add_argument('--consumer', help="consumer name whose offset is read and committed")
+    parser.add_argument('--after', type=int, default=0, help="start after this seq when no consumer is given")
+    parser.add_argument('--kind', action='append', choices=['sale', 'expense', 'stock', 'end_of_day'])
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--follow', action='store_true', help="keep waiting for new events")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    feed = ChangeFeed(db)
+    offset = feed.get_offset(args.consumer) if args.consumer else args.after
+
+    try:
+        while True:
+            events = feed.fetch(offset, args.limit, args.kind)
+            for event in events:
+                print(json.dumps(event), flush=True)
+            if events:
+                offset = events[-1]['seq']
+                if args.consumer:
+                    feed.commit_offset(args.consumer, offset)
+            elif not args.follow:
+                break
+            else:
+                feed.wait(offset, timeout=1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import time
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+class LiveChart:
+    """Long-lived matplotlib figure embedded in Tk.
+
+    The figure is created once and is not registered with pyplot, so it is
+    freed together with the widget. Data updates only mutate the existing
+    artists and ask for a redraw; redraw requests arriving within
+    MIN_REDRAW_INTERVAL of each other are coalesced into a single draw_idle.
+    """
+    MIN_REDRAW_INTERVAL = 0.25
+
+    def __init__(self, parent, figsize=(6, 4)):
+        self.figure = Figure(figsize=figsize)
+        self.ax = self.figure.add_subplot(111)
+        self.canvas = FigureCanvasTkAgg(self.figure, parent)
+        self.widget = self.canvas.get_tk_widget()
+        self.redraw_count = 0
+        self._pending_redraw = None
+        self._last_redraw = 0.0
+        self._layout_done = False
+
+    def pack(self, **kwargs):
+        self.widget.pack(**kwargs)
+
+    def request_redraw(self):
+        """Schedule a redraw, merging it with any redraw already pending"""
+        if self._pending_redraw is not None:
+            return
+        elapsed = time.monotonic() - self._last_redraw
+        delay_ms = max(0, int((self.MIN_REDRAW_INTERVAL - elapsed) * 1000))
+        self._pending_redraw = self.widget.after(delay_ms, self._redraw)
+
+    def _redraw(self):
+        self._pending_redraw = None
+        self._last_redraw = time.monotonic()
+        if not self._layout_done:
+            self.figure.tight_layout()
+            self._layout_done = True
+        self.canvas.draw_idle()
+        self.redraw_count += 1
+
+    def destroy(self):
+        """Cancel pending redraws and release the figure"""
+        if self._pending_redraw is not None:
+            self.widget.after_cancel(self._pending_redraw)
+            self._pending_redraw = None
+        self.widget.destroy()
+        self.figure.clear()
+
+class ActivityChart(LiveChart):
+    """Line chart of a daily transaction series"""
+    MAX_TICKS = 10
+    MAX_MARKERS = 31
+
+    def __init__(self, parent, figsize=(6, 4)):
+        super().__init__(parent, figsize)
+        self.line, = self.ax.plot([], [], marker='o')
+        self.ax.set_title('Weekly Transaction Activity')
+        self.ax.set_xlabel('Day')
+        self.ax.set_ylabel('Number of Transactions')
+        self._ticks = None
+
+    def set_labels(self, title, ylabel):
+        self.ax.set_title(title)
+        self.ax.set_ylabel(ylabel)
+
+    def update(self, labels, values, positions=None):
+        """Replace the plotted series in place
+
+        positions gives the x value of each point when the series has been
+        downsampled; only up to MAX_TICKS of the labels are shown.
+        """
+        if positions is None:
+            positions = list(range(len(values)))
+        self.line.set_data(positions, values)
+        self.line.set_marker('o' if len(values) <= self.MAX_MARKERS else '')
+
+        step = max(1, -(-len(positions) // self.MAX_TICKS))
+        ticks = (list(positions[::step]), list(labels[::step]))
+        if ticks != self._ticks:
+            self.ax.set_xticks(ticks[0])
+            self.ax.set_xticklabels(ticks[1], rotation=45)
+            self._ticks = ticks
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.request_redraw()
+
+class StockLevelsChart(LiveChart):
+    """Bar chart of current stock quantities"""
+
+    def __init__(self, parent, figsize=(6, 4)):
+        super().__init__(parent, figsize)
+        self.ax.set_title('Current Stock Levels')
+        self.ax.set_ylabel('Quantity')
+        self.bars = None
+        self.bar_labels = []
+        self._categories = None
+
+    def update(self, categories, quantities):
+        """Update bar heights in place, rebuilding bars only if categories change"""
+        categories = list(categories)
+        if categories != self._categories:
+            if self.bars is not None:
+                self.bars.remove()
+            for text in self.bar_labels:
+                text.remove()
+
+            self.bars = self.ax.bar(categories, quantities)
+            self.bar_labels = [
+                self.ax.text(bar.get_x() + bar.get_width()/2., 0, '', ha='center', va='bottom')
+                for bar in self.bars
+            ]
+            for tick in self.ax.get_xticklabels():
+                tick.set_rotation(45)
+            self._categories = categories
+
+        for bar, text, quantity in zip(self.bars, self.bar_labels, quantities):
+            bar.set_height(quantity)
+            text.set_y(quantity)
+            text.set_text(f'{int(quantity):,}')
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.request_redraw()
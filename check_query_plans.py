@@ -0,0 +1,212 @@
+"""Query-plan regression check for the SQL in the codebase.
+
+Collects the SQL statements written as string literals in the app's
+modules (models, services, auth, ui, admin and the modules their queries
+live in), adds every statement actually executed while the benchmark
+workload runs (which covers queries assembled at runtime), and runs
+EXPLAIN QUERY PLAN for each against a benchmark-sized database. A plan
+step that SCANs a table with at least --min-rows rows fails the check
+unless the statement and table are listed in the allowlist file with a
+reason. Parameters are bound as NULL; the plans SQLite picks do not
+depend on the values.
+
+    python check_query_plans.py                       # generates 200k rows
+    python check_query_plans.py --db bench.db --verbose
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from auth import AuthManager
+from benchmark import generate_dataset, run_benchmarks
+from branches import BranchHub
+from changefeed import ChangeFeed
+from models import DatabaseManager
+from sqlstats import QUERY_STATS, fingerprint
+from sync import init_sync_tables
+
+MODULES = (
+    'models.py', 'services.py', 'auth.py', 'ui.py', 'admin.py',
+    'reports.py', 'history.py', 'timeseries.py', 'webdash.py', 'branches.py',
+    'changefeed.py', 'sync.py', 'activity.py'
+)
+ALLOWLIST = 'query_plan_allowlist.json'
+PLANNED = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b')
+SCAN = re.compile(r'^SCAN (\w+)')
+NAMED_PARAMETER = re.compile(r'(?<![\w:]):(\w+)')
+
+def collect_static(paths):
+    """Return {fingerprint: {'sql', 'locations'}} for SQL string literals in the given files.
+
+    The repo writes SQL keywords in capitals, which tells statements apart
+    from docstrings and labels. f-strings are skipped here; whatever they
+    build is picked up when the workload executes it.
+    """
+    statements = {}
+    for path in paths:
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        fragments = {id(value) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for value in node.values}
+        for node in ast.walk(tree):
+            if id(node) in fragments:
+                continue
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and PLANNED.match(node.value):
+                location = f"{os.path.basename(path)}:{node.lineno}"
+                entry = statements.setdefault(fingerprint(node.value), {'sql': node.value, 'locations': []})
+                entry['locations'].append(location)
+    return statements
+
+def collect_runtime(path):
+    """Run the benchmark workload once on path and return the statements it executed"""
+    QUERY_STATS.reset()
+    run_benchmarks(path, repeat=1, sales=5)
+    return [entry['query'] for entry in QUERY_STATS.snapshot() if PLANNED.match(entry['query'])]
+
+def prepare_schema(path):
+    """Create every table the app owns, as the running app would"""
+    db = DatabaseManager(path)
+    AuthManager(db)
+    BranchHub(db)
+    ChangeFeed(db)
+    init_sync_tables(db)
+    db.close()
+
+def table_sizes(conn):
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+
+def explain(conn, sql):
+    """Return the EXPLAIN QUERY PLAN detail lines for sql, binding every parameter as NULL"""
+    names = NAMED_PARAMETER.findall(sql)
+    if names:
+        parameters = {name: None for name in names}
+    else:
+        try:
+            return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+        except sqlite3.ProgrammingError as e:
+            match = re.search(r'uses (\d+)', str(e))
+            if not match:
+                raise
+            parameters = [None] * int(match.group(1))
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, parameters)]
+
+def load_allowlist(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+def allowed(allowlist, query, table):
+    return any(entry['query'] == query and entry['table'] == table for entry in allowlist)
+
+def check(conn, statements, sizes, allowlist, min_rows):
+    """Return one result dict per statement with its plan, large-table scans and status"""
+    results = []
+    for query, statement in sorted(statements.items()):
+        result = {'query': query, 'locations': statement['locations'], 'plan': [], 'scans': [], 'status': 'OK'}
+        try:
+            result['plan'] = explain(conn, statement['sql'])
+        except sqlite3.Error as e:
+            result['status'] = 'ERROR'
+            result['error'] = str(e)
+            results.append(result)
+            continue
+
+        for step in result['plan']:
+            match = SCAN.match(step)
+            if match and sizes.get(match.group(1), 0) >= min_rows:
+                table = match.group(1)
+                result['scans'].append({'table': table, 'step': step, 'allowed': allowed(allowlist, query, table)})
+        if any(not scan['allowed'] for scan in result['scans']):
+            result['status'] = 'SCAN'
+        elif result['scans']:
+            result['status'] = 'ALLOWED'
+        results.append(result)
+    return results
+
+def print_results(results, sizes, verbose):
+    for result in results:
+        if result['status'] == 'OK' and not verbose:
+            continue
+        print(f"[{result['status']}] {result['query']}")
+        print(f"    from {', '.join(sorted(set(result['locations'])))}")
+        if 'error' in result:
+            print(f"    error: {result['error']}")
+        for step in result['plan']:
+            print(f"    {step}")
+        for scan in result['scans']:
+            note = 'allowlisted' if scan['allowed'] else 'NOT allowlisted'
+            print(f"    -> scans {scan['table']} ({sizes[scan['table']]} rows), {note}")
+        print()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when a query's plan scans a large table")
+    parser.add_argument('--db', help="benchmark database to check against (generated if missing)")
+    parser.add_argument('--rows', type=int, default=200000, help="transaction rows when generating")
+    parser.add_argument('--min-rows', type=int, default=5000, help="tables at least this big must not be scanned")
+    parser.add_argument('--allowlist', default=ALLOWLIST)
+    parser.add_argument('--no-workload', action='store_true', help="only check the SQL literals in the source")
+    parser.add_argument('--verbose', action='store_true', help="also print the plans that are fine")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    allowlist_path = os.path.abspath(args.allowlist)
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = tempfile.mkdtemp(prefix='printshop-plans-')
+    path = os.path.join(workdir, 'printshop.db')
+    if args.db and os.path.exists(args.db):
+        shutil.copy(args.db, path)
+    else:
+        print(f"Generating {args.rows} transactions...", flush=True)
+        generate_dataset(path, args.rows, 3, 42, 12)
+        if args.db:
+            shutil.copy(path, args.db)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    stdout = sys.stdout
+    try:
+        prepare_schema(path)
+        statements = collect_static([os.path.join(here, module) for module in MODULES])
+        static_count = len(statements)
+        if not args.no_workload:
+            sys.stdout = open(os.devnull, 'w')
+            for query in collect_runtime(path):
+                statements.setdefault(query, {'sql': query, 'locations': []})['locations'].append('workload')
+
+        conn = sqlite3.connect(path)
+        sizes = table_sizes(conn)
+        results = check(conn, statements, sizes, load_allowlist(allowlist_path), args.min_rows)
+        conn.close()
+    finally:
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout = stdout
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results, sizes, args.verbose)
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    print(f"{len(results)} statements ({static_count} from source, "
+          f"{len(results) - static_count} more from the workload): "
+          + ', '.join(f"{count} {status}" for status, count in sorted(counts.items())))
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'table_rows': sizes, 'results': results}, f, indent=2)
+
+    if counts.get('SCAN') or counts.get('ERROR'):
+        print(f"Fix the query or index, or add {{\"query\", \"table\", \"reason\"}} to {args.allowlist}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
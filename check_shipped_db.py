@@ -0,0 +1,89 @@
+"""Upgrade check against the checked-in printshop.db.
+
+The shipped database predates several columns and tables (created_by on
+expenses, sale_id, the journal, versions). This opens a copy of it the
+way the app does and runs the everyday operations on top, so a missing
+migration fails here instead of on an existing install.
+
+    python check_shipped_db.py
+    python check_shipped_db.py --db path/to/customer.db
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import traceback
+
+from auth import AuthManager, User
+from models import DatabaseManager
+from reports import ReportWriter
+from services import PrintShopService
+
+def run_checks(path):
+    db = DatabaseManager(path)
+    auth = AuthManager(db)
+    user = User('upgrade_check', 'user', 'Upgrade Check')
+    service = PrintShopService(db, user)
+    writer = ReportWriter(service, auth)
+    today = str(db.clock.now().date())
+
+    def restock():
+        for item in ('paper', 'file', 'envelope'):
+            assert service.inventory_model.add_stock(item, 100), f"restocking {item} failed"
+
+    def history():
+        for source in ('transactions', 'expenses', 'daily_records'):
+            service.fetch_history_page(source)
+        service.fetch_history_page('transactions', {'user': user.username})
+        rows = service.fetch_history_page('expenses', {'user': user.username})
+        assert rows, "expense recorded by the check is missing from history"
+
+    checks = [
+        ('restock', restock),
+        ('sale', lambda: service.process_transaction('Printing', 2, 1)),
+        ('multi-line sale', lambda: service.process_sale([('File', 1), ('Photocopy', 3, 1)])),
+        ('expense', lambda: service.record_expense('Pampiri', 5, 'upgrade check')),
+        ('history', history),
+        ('daily summary', service.get_daily_summary),
+        ('period summary', lambda: service.get_period_summary(today, today)),
+        ('reports', lambda: [getattr(writer, f"{report}_report")(today, today)
+                             for report in ('user', 'jobs', 'stock', 'performance')]),
+        ('end of day', service.end_day),
+    ]
+
+    failures = 0
+    for name, check in checks:
+        try:
+            check()
+            print(f"ok    {name}")
+        except Exception:
+            failures += 1
+            print(f"FAIL  {name}")
+            traceback.print_exc(file=sys.stdout)
+    db.close()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Run everyday operations on a copy of an existing database")
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'printshop.db'))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='printshop-upgrade-')
+    path = os.path.join(workdir, 'printshop.db')
+    shutil.copy(args.db, path)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        failures = run_checks(path)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print(f"\n{failures} check(s) failed against {args.db}")
+        sys.exit(1)
+    print(f"\nAll checks passed against a copy of {args.db}")
+
+if __name__ == "__main__":
+    main()
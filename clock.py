@@ -0,0 +1,34 @@
+import threading
+from datetime import datetime, timedelta
+
+class SystemClock:
+    """The real wall clock, used unless another clock is injected"""
+
+    def now(self):
+        return datetime.now()
+
+class ManualClock:
+    """Clock that only moves when told to, for replays, tests and benchmarks.
+
+    Pass it to DatabaseManager and every date and timestamp written
+    through that database (sales, expenses, stock moves, end of day,
+    sessions, journal events) comes from it instead of the wall clock.
+    """
+
+    def __init__(self, start=None):
+        self._now = start or datetime.now().replace(microsecond=0)
+        self._lock = threading.Lock()
+
+    def now(self):
+        with self._lock:
+            return self._now
+
+    def set(self, moment):
+        with self._lock:
+            self._now = moment
+
+    def advance(self, seconds=0, **kwargs):
+        """Move the clock forward, e.g. advance(minutes=5) or advance(days=1)"""
+        with self._lock:
+            self._now += timedelta(seconds=seconds, **kwargs)
+            return self._now
@@ -0,0 +1,151 @@
+import threading
+import time
+
+def coalesce(events, update=None):
+    """Fold journal events into one update, optionally adding to an earlier one
+
+    A busy minute of sales becomes a few totals and the latest stock
+    quantities, so an update stays the same size however many rows it covers.
+    """
+    if update is None:
+        update = {
+            'first_seq': events[0]['seq'] if events else None,
+            'seq': None,
+            'count': 0,
+            'sales': 0,
+            'revenue': 0.0,
+            'papers_used': 0,
+            'services': {},
+            'expenses': 0,
+            'expense_total': 0.0,
+            'stock': {},
+            'end_of_day': None
+        }
+
+    for event in events:
+        payload = event['payload']
+        kind = event['kind']
+        update['seq'] = event['seq']
+        update['count'] += 1
+
+        if kind == 'sale':
+            update['sales'] += 1
+            update['revenue'] += payload['amount']
+            update['papers_used'] += payload['papers_used']
+            update['services'][payload['service']] = update['services'].get(payload['service'], 0) + payload['quantity']
+        elif kind == 'expense':
+            update['expenses'] += 1
+            update['expense_total'] += payload['amount']
+        elif kind == 'stock':
+            update['stock'][payload['item']] = payload['quantity']
+        elif kind == 'end_of_day':
+            update['end_of_day'] = payload
+
+    return update
+
+class Subscription:
+    """One subscriber's view of an EventBus.
+
+    Events offered while the subscriber is busy are folded into a single
+    pending update, and updates are handed out at most once per interval,
+    so a slow or busy subscriber costs constant memory.
+    """
+
+    def __init__(self, bus, kinds, interval, after_seq):
+        self.bus = bus
+        self.kinds = set(kinds) if kinds else None
+        self.interval = interval
+        self.after_seq = after_seq
+        self.closed = False
+
+        self._condition = threading.Condition()
+        self._pending = None
+        self._last_delivery = 0.0
+
+    def offer(self, events):
+        events = [
+            event for event in events
+            if event['seq'] > self.after_seq and (self.kinds is None or event['kind'] in self.kinds)
+        ]
+        if not events:
+            return
+        with self._condition:
+            self._pending = coalesce(events, self._pending)
+            self._condition.notify_all()
+
+    def poll(self):
+        """Return the pending update if one is due, without blocking"""
+        with self._condition:
+            if self._pending is None or time.monotonic() - self._last_delivery < self.interval:
+                return None
+            update, self._pending = self._pending, None
+            self._last_delivery = time.monotonic()
+            return update
+
+    def get(self, timeout=None):
+        """Block until an update is due; returns None on timeout or once closed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending is None and not self.closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            if self.closed:
+                return None
+
+        hold = self._last_delivery + self.interval - time.monotonic()
+        if hold > 0:
+            time.sleep(hold)
+        return self.poll()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+class EventBus:
+    """In-process publish/subscribe for committed journal events.
+
+    A JournalWatcher publishes every batch of new journal events; each
+    subscriber receives them coalesced (see Subscription). last_seq is
+    the newest event published, so a new subscriber knows exactly where
+    its live updates start.
+    """
+    INTERVAL = 1.0
+
+    def __init__(self, interval=None):
+        self.interval = interval or self.INTERVAL
+        self.last_seq = 0
+        self._subscriptions = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, kinds=None, interval=None):
+        with self._lock:
+            subscription = Subscription(self, kinds, interval or self.interval, self.last_seq)
+            self._subscriptions.append(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, events):
+        with self._lock:
+            if events:
+                self.last_seq = events[-1]['seq']
+            for subscription in self._subscriptions:
+                subscription.offer(events)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def close(self):
+        """Close every subscription, ending any stream waiting on one"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.close()
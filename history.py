@@ -0,0 +1,354 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from datetime import datetime
+
+HISTORY_SOURCES = {
+    'transactions': {
+        'title': 'Transactions',
+        'key': 'id',
+        'columns': ['timestamp', 'service', 'quantity', 'papers_used', 'amount', 'created_by'],
+        'headings': ['Date', 'Time', 'Service', 'Quantity', 'Papers', 'Amount', 'User'],
+        'money': ['amount'],
+        'filters': {'service': 'service', 'user': 'created_by'}
+    },
+    'expenses': {
+        'title': 'Expenses',
+        'key': 'id',
+        'columns': ['timestamp', 'category', 'amount', 'description', 'created_by'],
+        'headings': ['Date', 'Time', 'Category', 'Amount', 'Description', 'User'],
+        'money': ['amount'],
+        'filters': {'category': 'category', 'user': 'created_by'}
+    },
+    'daily_records': {
+        'title': 'Daily Records',
+        'key': 'rowid',
+        'columns': ['daily_income', 'total_expenses', 'balance', 'papers_used'],
+        'headings': ['Date', 'Daily Income', 'Total Expenses', 'Balance', 'Papers Used'],
+        'money': ['daily_income', 'total_expenses', 'balance'],
+        'filters': {}
+    }
+}
+
+class HistoryQuery:
+    """Keyset pagination over the history tables, newest first.
+
+    Pages are addressed by the (date, key) of the row next to them rather
+    than by OFFSET, so every page is an index seek no matter how deep into
+    the history it is. OFFSET is only used to jump straight to a position,
+    when the scrollbar is dragged.
+    """
+    PAGE_SIZE = 100
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def _filter_clauses(self, spec, filters):
+        """Return the WHERE conditions and parameters for filters"""
+        where = []
+        params = []
+
+        if filters.get('start'):
+            where.append('date >= ?')
+            params.append(filters['start'])
+        if filters.get('end'):
+            where.append('date <= ?')
+            params.append(filters['end'])
+
+        for name, column in spec['filters'].items():
+            if filters.get(name):
+                where.append(f'{column} = ?')
+                params.append(filters[name])
+        return where, params
+
+    def count(self, source, filters=None):
+        """Return how many rows match filters"""
+        where, params = self._filter_clauses(HISTORY_SOURCES[source], filters or {})
+        sql = f"SELECT COUNT(*) FROM {source}"
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        self.db.cursor.execute(sql, params)
+        return self.db.cursor.fetchone()[0]
+
+    def fetch_page(self, source, filters=None, after=None, before=None, limit=None, offset=None):
+        """Return up to limit rows as (key, date, *columns) tuples
+
+        after: (date, key) of the last row already shown, to page forward
+        before: (date, key) of the first row already shown, to page back
+        offset: number of newer rows to skip, to jump to a position
+        """
+        spec = HISTORY_SOURCES[source]
+        key = spec['key']
+        limit = limit or self.PAGE_SIZE
+        where, params = self._filter_clauses(spec, filters or {})
+
+        order = 'DESC'
+        if after:
+            where.append(f'(date, {key}) < (?, ?)')
+            params.extend(after)
+        elif before:
+            where.append(f'(date, {key}) > (?, ?)')
+            params.extend(before)
+            order = 'ASC'
+
+        sql = f"SELECT {key}, date, {', '.join(spec['columns'])} FROM {source}"
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += f' ORDER BY date {order}, {key} {order} LIMIT ?'
+        params.append(limit)
+        if offset:
+            sql += ' OFFSET ?'
+            params.append(offset)
+
+        self.db.cursor.execute(sql, params)
+        rows = self.db.cursor.fetchall()
+        if before:
+            rows.reverse()
+        return rows
+
+class HistoryBrowser(ttk.Frame):
+    """Filterable history view that only keeps a few pages in the Treeview.
+
+    Scrolling near the bottom fetches the next page and drops the page at
+    the top once more than MAX_PAGES are loaded; scrolling back up reverses
+    the process. Memory stays bounded however far the user scrolls.
+
+    The scrollbar covers every matching row, not just the loaded window:
+    the rows are counted on reload and offset tracks how many newer rows
+    sit above the window. Dragging the scrollbar outside the window loads
+    the page at that position.
+    """
+    MAX_PAGES = 3
+    JUMP_DELAY_MS = 100
+
+    def __init__(self, parent, service, users=(), **kwargs):
+        super().__init__(parent, **kwargs)
+        self.service = service
+        self.users = list(users)
+
+        self.pages = []
+        self.has_more_below = False
+        self.has_more_above = False
+        self.filters = {}
+        self.total = 0
+        self.offset = 0
+        self._check_pending = None
+        self._jump_pending = None
+
+        self.create_filters()
+        self.create_tree()
+        self.reload()
+
+    def create_filters(self):
+        """Create the source and filter controls"""
+        filter_frame = ttk.LabelFrame(self, text="Filters", padding="10")
+        filter_frame.pack(fill='x', pady=(0, 10))
+
+        self.source_var = tk.StringVar(value='transactions')
+        self.start_var = tk.StringVar()
+        self.end_var = tk.StringVar()
+        self.service_var = tk.StringVar()
+        self.user_var = tk.StringVar()
+        self.category_var = tk.StringVar()
+
+        ttk.Label(filter_frame, text="Show:").grid(row=0, column=0, sticky='w', padx=5)
+        source_combo = ttk.Combobox(
+            filter_frame,
+            textvariable=self.source_var,
+            values=list(HISTORY_SOURCES.keys()),
+            state='readonly',
+            width=15
+        )
+        source_combo.grid(row=0, column=1, padx=5, pady=2)
+        source_combo.bind('<<ComboboxSelected>>', lambda e: self.reload())
+
+        ttk.Label(filter_frame, text="From (YYYY-MM-DD):").grid(row=0, column=2, sticky='w', padx=5)
+        ttk.Entry(filter_frame, textvariable=self.start_var, width=12).grid(row=0, column=3, padx=5, pady=2)
+
+        ttk.Label(filter_frame, text="To:").grid(row=0, column=4, sticky='w', padx=5)
+        ttk.Entry(filter_frame, textvariable=self.end_var, width=12).grid(row=0, column=5, padx=5, pady=2)
+
+        ttk.Label(filter_frame, text="Service:").grid(row=1, column=0, sticky='w', padx=5)
+        ttk.Combobox(
+            filter_frame,
+            textvariable=self.service_var,
+            values=[''] + list(self.service.prices.keys()),
+            state='readonly',
+            width=15
+        ).grid(row=1, column=1, padx=5, pady=2)
+
+        ttk.Label(filter_frame, text="User:").grid(row=1, column=2, sticky='w', padx=5)
+        ttk.Combobox(
+            filter_frame,
+            textvariable=self.user_var,
+            values=[''] + self.users,
+            state='readonly',
+            width=12
+        ).grid(row=1, column=3, padx=5, pady=2)
+
+        ttk.Label(filter_frame, text="Category:").grid(row=1, column=4, sticky='w', padx=5)
+        ttk.Combobox(
+            filter_frame,
+            textvariable=self.category_var,
+            values=[''] + list(self.service.expense_categories),
+            state='readonly',
+            width=12
+        ).grid(row=1, column=5, padx=5, pady=2)
+
+        ttk.Button(filter_frame, text="Apply", command=self.reload).grid(row=0, column=6, rowspan=2, padx=10)
+
+    def create_tree(self):
+        """Create the Treeview and its scrollbar"""
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(fill='both', expand=True)
+
+        self.tree = ttk.Treeview(tree_frame, show='headings', height=20)
+        self.scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self._on_scrollbar)
+        self.tree.configure(yscrollcommand=self._on_yscroll)
+
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+
+    def read_filters(self):
+        """Return the filter values, or None if a date is invalid"""
+        filters = {}
+        for name, var in (('start', self.start_var), ('end', self.end_var)):
+            value = var.get().strip()
+            if value:
+                try:
+                    datetime.strptime(value, '%Y-%m-%d')
+                except ValueError:
+                    messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format")
+                    return None
+                filters[name] = value
+
+        filters['service'] = self.service_var.get()
+        filters['user'] = self.user_var.get()
+        filters['category'] = self.category_var.get()
+        return filters
+
+    def reload(self):
+        """Apply the current source and filters and show the newest rows"""
+        filters = self.read_filters()
+        if filters is None:
+            return
+        self.filters = filters
+
+        spec = HISTORY_SOURCES[self.source_var.get()]
+        columns = ['date'] + spec['columns']
+        self.tree.delete(*self.tree.get_children())
+        self.tree.configure(columns=columns)
+        for column, heading in zip(columns, spec['headings']):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=120)
+
+        self.pages = []
+        self.has_more_above = False
+        self.offset = 0
+        self.total = self.service.count_history(self.source_var.get(), self.filters)
+        rows = self.service.fetch_history_page(self.source_var.get(), self.filters)
+        self.has_more_below = len(rows) == HistoryQuery.PAGE_SIZE
+        if rows:
+            self._insert_rows(rows, 'end')
+            self.pages.append(rows)
+        self.tree.yview_moveto(0)
+
+    def _format_row(self, row):
+        spec = HISTORY_SOURCES[self.source_var.get()]
+        values = [row[1]]
+        for column, value in zip(spec['columns'], row[2:]):
+            if column in spec['money']:
+                values.append(f"M{value or 0:.2f}")
+            elif column == 'timestamp' and value:
+                values.append(value[11:])
+            else:
+                values.append('' if value is None else value)
+        return values
+
+    def _insert_rows(self, rows, position):
+        index = 0 if position == 'start' else 'end'
+        for row in (reversed(rows) if position == 'start' else rows):
+            self.tree.insert('', index, iid=str(row[0]), values=self._format_row(row))
+
+    def loaded_rows(self):
+        return sum(len(page) for page in self.pages)
+
+    def _on_yscroll(self, first, last):
+        loaded = self.loaded_rows()
+        if self.total and loaded:
+            self.scrollbar.set((self.offset + float(first) * loaded) / self.total,
+                               (self.offset + float(last) * loaded) / self.total)
+        else:
+            self.scrollbar.set(first, last)
+        if self._check_pending is None:
+            self._check_pending = self.after_idle(self._check_window, float(first), float(last))
+
+    def _on_scrollbar(self, *args):
+        """Scroll the Treeview, or jump to another window when dragged outside this one"""
+        loaded = self.loaded_rows()
+        if args[0] != 'moveto' or not self.total or not loaded:
+            self.tree.yview(*args)
+            return
+        position = min(max(0, int(float(args[1]) * self.total)), self.total - 1)
+        if self.offset <= position < self.offset + loaded:
+            self.tree.yview_moveto((position - self.offset) / loaded)
+            return
+        if self._jump_pending is not None:
+            self.after_cancel(self._jump_pending)
+        self._jump_pending = self.after(self.JUMP_DELAY_MS, self.jump_to, position)
+
+    def jump_to(self, position):
+        """Replace the loaded window with the page starting at row position"""
+        self._jump_pending = None
+        rows = self.service.fetch_history_page(self.source_var.get(), self.filters, offset=position)
+        if not rows:
+            return
+        self.tree.delete(*self.tree.get_children())
+        self.pages = [rows]
+        self.offset = position
+        self.has_more_above = position > 0
+        self.has_more_below = len(rows) == HistoryQuery.PAGE_SIZE
+        self._insert_rows(rows, 'end')
+        self.tree.yview_moveto(0)
+
+    def _check_window(self, first, last):
+        self._check_pending = None
+        if last >= 0.9 and self.has_more_below:
+            self.load_next_page()
+        elif first <= 0.1 and self.has_more_above:
+            self.load_previous_page()
+
+    def load_next_page(self):
+        """Append the page below the window, dropping the top page if needed"""
+        last_row = self.pages[-1][-1]
+        rows = self.service.fetch_history_page(self.source_var.get(), self.filters, after=(last_row[1], last_row[0]))
+        self.has_more_below = len(rows) == HistoryQuery.PAGE_SIZE
+        if not rows:
+            return
+
+        self._insert_rows(rows, 'end')
+        self.pages.append(rows)
+
+        if len(self.pages) > self.MAX_PAGES:
+            dropped = self.pages.pop(0)
+            self.tree.delete(*[str(row[0]) for row in dropped])
+            self.offset += len(dropped)
+            self.has_more_above = True
+        self.tree.see(str(last_row[0]))
+
+    def load_previous_page(self):
+        """Prepend the page above the window, dropping the bottom page if needed"""
+        first_row = self.pages[0][0]
+        rows = self.service.fetch_history_page(self.source_var.get(), self.filters, before=(first_row[1], first_row[0]))
+        self.has_more_above = len(rows) == HistoryQuery.PAGE_SIZE
+        if not rows:
+            return
+
+        self._insert_rows(rows, 'start')
+        self.pages.insert(0, rows)
+        self.offset = max(0, self.offset - len(rows))
+
+        if len(self.pages) > self.MAX_PAGES:
+            dropped = self.pages.pop()
+            self.tree.delete(*[str(row[0]) for row in dropped])
+            self.has_more_below = True
+        self.tree.see(str(first_row[0]))
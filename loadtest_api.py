@@ -0,0 +1,161 @@
+"""Load test for the PrintShop HTTP API.
+
+Starts a server on a temporary database (or targets --url), runs several
+concurrent cashier clients posting sales, re-sends a share of them with the
+same idempotency key to simulate retries, and checks that no sale was
+recorded twice and that stock adds up.
+
+    python loadtest_api.py --clients 8 --sales 200
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from api_client import ApiClient
+from api_server import APIServer, ApiError, PrintShopAPI
+from auth import AuthManager
+from models import DatabaseManager
+
+SERVICE_MIX = [
+    ("Photocopy", 40, 1),
+    ("Printing", 30, 2),
+    ("Scanning", 10, 0),
+    ("Lamination", 10, 0),
+    ("File", 5, 0),
+    ("Envelope", 5, 0)
+]
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def prepare_database(path, users):
+    """Create a database with plenty of stock and one cashier per client"""
+    db = DatabaseManager(path)
+    auth = AuthManager(db)
+    db.cursor.execute("UPDATE inventory SET quantity = 10000000")
+    db.conn.commit()
+    for username in users:
+        auth.register_user(username, 'loadtest', 'user', username, 'loadtest')
+    db.close()
+
+def cashier(url, username, sales, retry_rate, results, lock):
+    client = ApiClient(url)
+    client.token = client.post('/api/login', {'username': username, 'password': 'loadtest'})['token']
+
+    weights = [weight for _, weight, _ in SERVICE_MIX]
+    latencies = []
+    keys = set()
+    papers = 0
+    errors = 0
+
+    for _ in range(sales):
+        service, _, papers_per_item = random.choices(SERVICE_MIX, weights)[0]
+        quantity = random.randint(1, 5)
+        key = uuid.uuid4().hex
+        attempts = 2 if random.random() < retry_rate else 1
+
+        for _ in range(attempts):
+            started = time.perf_counter()
+            try:
+                result = client.post(
+                    '/api/sales',
+                    {'lines': [[service, quantity, papers_per_item]]},
+                    headers={'Idempotency-Key': key}
+                )
+            except (ApiError, OSError):
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if key not in keys:
+                keys.add(key)
+                papers += result['papers_used']
+
+    client.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['keys'] += len(keys)
+        results['papers'] += papers
+        results['errors'] += errors
+
+def run(args):
+    temp_dir = None
+    server = None
+    url = args.url
+
+    if not url:
+        temp_dir = tempfile.mkdtemp(prefix='printshop_loadtest_')
+        db_path = os.path.join(temp_dir, 'loadtest.db')
+        users = [f"cashier{i}" for i in range(args.clients)]
+        prepare_database(db_path, users)
+        server = APIServer(('127.0.0.1', 0), PrintShopAPI(db_path, args.pool_size))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    results = {'latencies': [], 'keys': 0, 'papers': 0, 'errors': 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=cashier,
+            args=(url, f"cashier{i}", args.sales, args.retry_rate, results, lock)
+        )
+        for i in range(args.clients)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = results['latencies']
+    print(f"Clients:        {args.clients}")
+    print(f"Requests:       {len(latencies)} ok, {results['errors']} failed")
+    print(f"Unique sales:   {results['keys']}")
+    print(f"Throughput:     {len(latencies) / elapsed:.1f} requests/s")
+    print(f"Latency p50:    {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"Latency p95:    {percentile(latencies, 95) * 1000:.1f} ms")
+    print(f"Latency p99:    {percentile(latencies, 99) * 1000:.1f} ms")
+
+    ok = True
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+        server.api.close()
+
+        db = DatabaseManager(db_path)
+        db.cursor.execute("SELECT COUNT(*) FROM transactions")
+        recorded = db.cursor.fetchone()[0]
+        paper = db.cursor.execute("SELECT quantity FROM inventory WHERE item = 'paper'").fetchone()[0]
+        db.close()
+
+        duplicates = recorded - results['keys']
+        stock_drift = (10000000 - paper) - results['papers']
+        print(f"Duplicate sales: {duplicates}")
+        print(f"Paper drift:     {stock_drift}")
+        ok = duplicates == 0 and stock_drift == 0
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the PrintShop HTTP API")
+    parser.add_argument('--url', help="test an already running server instead of a temporary one")
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--sales', type=int, default=200, help="sales per client")
+    parser.add_argument('--retry-rate', type=float, default=0.1, help="share of sales sent twice")
+    parser.add_argument('--pool-size', type=int, default=8)
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args) else 1)
+
+if __name__ == "__main__":
+    main()
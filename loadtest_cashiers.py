@@ -0,0 +1,262 @@
+"""Concurrent cashier load generator for a shared PrintShop database.
+
+Runs N simulated cashiers, each with its own connection like a separate
+counter, selling through PrintShopService.process_transaction and
+entering the odd expense with random think times in between. An admin
+simulator generates reports against the same database at the same time.
+At the end it prints sale latency percentiles, throughput and how often
+"database is locked" surfaced, so you can see how many counters one
+database file can serve.
+
+    python loadtest_cashiers.py --cashiers 8 --duration 30
+    python loadtest_cashiers.py --cashiers 16 --threads --think 200 --mix Photocopy=70,Printing=30
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from auth import AuthManager, User
+from benchmark import generate_dataset
+from models import DatabaseManager
+from reports import ReportWriter
+from services import PrintShopService
+
+DEFAULT_MIX = "Photocopy=40,Printing=30,Scanning=10,Lamination=10,File=5,Envelope=5"
+PAPER_SERVICES = ("Photocopy", "Printing")
+REPORTS = ('user', 'jobs', 'stock', 'performance')
+
+def parse_mix(text):
+    """Parse "Service=weight,..." into {service: weight}"""
+    mix = {}
+    for part in text.split(','):
+        service, _, weight = part.partition('=')
+        mix[service.strip()] = float(weight or 1)
+    return mix
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def is_locked(error):
+    return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+def open_database(path, busy_timeout):
+    db = DatabaseManager(path)
+    if busy_timeout is not None:
+        db.cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout)}')
+    return db
+
+def new_outcome(role):
+    return {'role': role, 'latencies': {}, 'locked': {}, 'errors': {}}
+
+def timed(outcome, operation, func):
+    """Run func, filing its latency or its failure under operation"""
+    started = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        bucket = outcome['locked'] if is_locked(e) else outcome['errors']
+        bucket[operation] = bucket.get(operation, 0) + 1
+        return
+    outcome['latencies'].setdefault(operation, []).append(time.perf_counter() - started)
+
+def cashier(path, username, settings, seed, start_event, results):
+    rng = random.Random(seed)
+    db = open_database(path, settings['busy_timeout'])
+    service = PrintShopService(db, User(username, 'user', username))
+    services = list(settings['mix'])
+    weights = list(settings['mix'].values())
+    outcome = new_outcome('cashier')
+
+    def sale():
+        name = rng.choices(services, weights)[0]
+        papers_per_item = 1 if name in PAPER_SERVICES else 0
+        service.process_transaction(name, rng.randint(1, settings['max_quantity']), papers_per_item)
+
+    def expense():
+        category = rng.choice(service.expense_categories)
+        service.record_expense(category, round(rng.uniform(10, 500), 2), "load test")
+
+    start_event.wait()
+    deadline = time.monotonic() + settings['duration']
+    while time.monotonic() < deadline:
+        if settings['think']:
+            time.sleep(rng.expovariate(1000 / settings['think']))
+        if rng.random() < settings['expense_rate']:
+            timed(outcome, 'expense', expense)
+        else:
+            timed(outcome, 'sale', sale)
+
+    db.close()
+    results.put(outcome)
+
+def admin(path, report_dir, settings, seed, start_event, results):
+    rng = random.Random(seed)
+    db = open_database(path, settings['busy_timeout'])
+    service = PrintShopService(db, User('admin', 'admin', 'Administrator'))
+    writer = ReportWriter(service, AuthManager(db), report_dir)
+    outcome = new_outcome('admin')
+
+    today = datetime.now().date()
+    db.cursor.execute('SELECT MIN(date) FROM transactions')
+    first = db.cursor.fetchone()[0] or str(today)
+    ranges = {'30d': (str(today - timedelta(days=29)), str(today)), 'all': (first, str(today))}
+
+    start_event.wait()
+    deadline = time.monotonic() + settings['duration']
+    while time.monotonic() < deadline:
+        range_name = rng.choice(list(ranges))
+        start, end = ranges[range_name]
+        report = rng.choice(REPORTS + ('period_summary',))
+        if report == 'period_summary':
+            timed(outcome, f"period_summary_{range_name}", lambda: service.get_period_summary(start, end))
+        else:
+            write = getattr(writer, f"{report}_report")
+            timed(outcome, f"report_{report}_{range_name}", lambda: write(start, end))
+        time.sleep(rng.expovariate(1 / settings['admin_interval']))
+
+    db.close()
+    results.put(outcome)
+
+def prepare_database(path, cashiers, history, wal):
+    """Create the test database with a sales history, cashier accounts and ample stock"""
+    if history:
+        generate_dataset(path, history, 1, 7, len(cashiers))
+    db = DatabaseManager(path)
+    auth = AuthManager(db)
+    if wal:
+        db.cursor.execute('PRAGMA journal_mode=WAL').fetchone()
+    db.cursor.execute("UPDATE inventory SET quantity = 100000000")
+    db.conn.commit()
+    for username in cashiers:
+        auth.register_user(username, 'loadtest', 'user', username, 'loadtest')
+    db.close()
+
+def merge(outcomes):
+    merged = {'latencies': {}, 'locked': {}, 'errors': {}}
+    for outcome in outcomes:
+        for operation, samples in outcome['latencies'].items():
+            merged['latencies'].setdefault(operation, []).extend(samples)
+        for key in ('locked', 'errors'):
+            for operation, count in outcome[key].items():
+                merged[key][operation] = merged[key].get(operation, 0) + count
+    return merged
+
+def summarize(merged, elapsed):
+    summary = {}
+    operations = set(merged['latencies']) | set(merged['locked']) | set(merged['errors'])
+    for operation in sorted(operations):
+        samples = merged['latencies'].get(operation, [])
+        locked = merged['locked'].get(operation, 0)
+        errors = merged['errors'].get(operation, 0)
+        attempts = len(samples) + locked + errors
+        summary[operation] = {
+            'ok': len(samples),
+            'locked': locked,
+            'errors': errors,
+            'locked_rate': locked / attempts if attempts else 0.0,
+            'throughput': len(samples) / elapsed,
+            'p50_ms': percentile(samples, 50) * 1000,
+            'p95_ms': percentile(samples, 95) * 1000,
+            'p99_ms': percentile(samples, 99) * 1000,
+            'max_ms': max(samples) * 1000 if samples else 0.0
+        }
+    return summary
+
+def run(args):
+    temp_dir = tempfile.mkdtemp(prefix='printshop_cashiers_')
+    path = os.path.join(temp_dir, 'loadtest.db')
+    cashiers = [f"cashier{i + 1:02d}" for i in range(args.cashiers)]
+    prepare_database(path, cashiers, args.history, not args.no_wal)
+
+    settings = {
+        'duration': args.duration,
+        'think': args.think,
+        'expense_rate': args.expense_rate,
+        'max_quantity': args.max_quantity,
+        'mix': parse_mix(args.mix),
+        'admin_interval': args.admin_interval,
+        'busy_timeout': args.busy_timeout
+    }
+
+    if args.threads:
+        worker, start_event, results = threading.Thread, threading.Event(), multiprocessing.Queue()
+    else:
+        worker, start_event, results = multiprocessing.Process, multiprocessing.Event(), multiprocessing.Queue()
+
+    workers = [
+        worker(target=cashier, args=(path, username, settings, i, start_event, results))
+        for i, username in enumerate(cashiers)
+    ]
+    workers += [
+        worker(target=admin, args=(path, os.path.join(temp_dir, 'reports'), settings, 1000 + i, start_event, results))
+        for i in range(args.admins)
+    ]
+    for process in workers:
+        process.start()
+
+    started = time.perf_counter()
+    start_event.set()
+    outcomes = [results.get() for _ in workers]
+    elapsed = time.perf_counter() - started
+    for process in workers:
+        process.join()
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+    cashier_summary = summarize(merge(o for o in outcomes if o['role'] == 'cashier'), elapsed)
+    admin_summary = summarize(merge(o for o in outcomes if o['role'] == 'admin'), elapsed)
+
+    print(f"Cashiers:     {args.cashiers} {'threads' if args.threads else 'processes'}, "
+          f"{args.admins} admin, {args.duration:.0f} s, think {args.think:.0f} ms, "
+          f"{'rollback journal' if args.no_wal else 'WAL'}")
+    print(f"\n{'operation':28} {'ok':>7} {'locked':>7} {'errors':>7} {'per s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for summary in (cashier_summary, admin_summary):
+        for operation, stats in summary.items():
+            print(f"{operation:28} {stats['ok']:7d} {stats['locked']:7d} {stats['errors']:7d} "
+                  f"{stats['throughput']:8.1f} {stats['p50_ms']:8.1f} {stats['p95_ms']:8.1f} {stats['p99_ms']:8.1f}")
+
+    sales = cashier_summary.get('sale', {})
+    if sales:
+        print(f"\nSale throughput:     {sales['throughput']:.1f} sales/s")
+        print(f"Sale latency:        p50 {sales['p50_ms']:.1f} ms, p95 {sales['p95_ms']:.1f} ms, p99 {sales['p99_ms']:.1f} ms")
+        print(f"'database is locked': {sales['locked_rate'] * 100:.2f}% of sales")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'settings': vars(args), 'elapsed': elapsed,
+                       'cashiers': cashier_summary, 'admin': admin_summary}, f, indent=2)
+
+    errors = sum(stats['errors'] for summary in (cashier_summary, admin_summary) for stats in summary.values())
+    return errors == 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent cashiers and an admin on one database")
+    parser.add_argument('--cashiers', type=int, default=8)
+    parser.add_argument('--threads', action='store_true', help="run cashiers as threads instead of processes")
+    parser.add_argument('--duration', type=float, default=20, help="seconds to run")
+    parser.add_argument('--think', type=float, default=50, help="mean think time between actions in ms")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="service weights, e.g. Photocopy=70,Printing=30")
+    parser.add_argument('--max-quantity', type=int, default=5)
+    parser.add_argument('--expense-rate', type=float, default=0.02, help="share of actions that are expenses")
+    parser.add_argument('--admins', type=int, default=1, help="concurrent admin report simulators")
+    parser.add_argument('--admin-interval', type=float, default=2.0, help="mean seconds between admin reports")
+    parser.add_argument('--history', type=int, default=50000, help="transactions of history to seed")
+    parser.add_argument('--busy-timeout', type=int, help="override the connection busy timeout in ms")
+    parser.add_argument('--no-wal', action='store_true', help="use the default rollback journal")
+    parser.add_argument('--output', help="also write the results as JSON to this file")
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args) else 1)
+
+if __name__ == "__main__":
+    main()
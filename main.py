@@ -1,21 +1,112 @@
+import argparse
+import multiprocessing
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from admin import AdminDashboardUI
 from auth import AuthManager
+from changefeed import JournalWatcher
+from events import EventBus
 from login_ui import LoginUI
+from memmonitor import MemoryMonitor
+from metrics import EventLoopLagMonitor, TextfileExporter
 from models import DatabaseManager
+from profiler import PROFILER
 from services import PrintShopService
+from sqlstats import QUERY_STATS
+from tracing import TRACER
 from ui import PrintShopUI
+from uiwatchdog import UIWatchdog
+
+def finish_profile():
+    files = PROFILER.stop()
+    if files:
+        print(f"Profile saved: {files[0]} and {files[1]}")
 
 def main():
-    db_manager = DatabaseManager()
-    auth_manager = AuthManager(db_manager)
-    service = PrintShopService(db_manager)
+    parser = argparse.ArgumentParser(description="AlphaPrinting Management System")
+    parser.add_argument('--server', help="run as a thin client against the API server at this URL")
+    parser.add_argument('--serve', action='store_true', help="run the HTTP JSON API server instead of the UI")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--sync-hub', help="sync this terminal's journal to a hub database file or API server URL")
+    parser.add_argument('--sync-user', help="API server username for --sync-hub")
+    parser.add_argument('--sync-password', help="API server password for --sync-hub")
+    parser.add_argument('--slow-query-log', default='slow_queries.log', help="slow query log file, '' to turn it off")
+    parser.add_argument('--slow-query-ms', type=float, default=250, help="log queries slower than this")
+    parser.add_argument('--metrics-file', help="write Prometheus metrics to this .prom file for node_exporter")
+    parser.add_argument('--metrics-interval', type=float, default=15, help="seconds between --metrics-file writes")
+    parser.add_argument('--stall-ms', type=float, default=500,
+                        help="log main-thread stacks when the UI is unresponsive this long, 0 to only record event-loop lag")
+    parser.add_argument('--diagnostics-log', default='diagnostics.log', help="where UI stalls are logged")
+    parser.add_argument('--memory-monitor', action='store_true',
+                        help="trace allocations and log growth over the budget to the diagnostics log")
+    parser.add_argument('--memory-interval', type=float, default=300, help="seconds between memory checks")
+    parser.add_argument('--memory-budget-mb', type=float, default=50, help="allowed growth after the first check")
+    parser.add_argument('--profile', type=float, metavar='SECONDS',
+                        help="profile the first SECONDS of the run into diagnostics/")
+    parser.add_argument('--trace', action='store_true', help="record spans from startup and save them to traces/ on exit")
+    args = parser.parse_args()
+    
+    QUERY_STATS.set_slow_log(args.slow_query_log or None, args.slow_query_ms)
+    if args.trace:
+        TRACER.start()
+    exporter = None
+    if args.metrics_file:
+        exporter = TextfileExporter(args.metrics_file, args.metrics_interval)
+        exporter.start()
+
+    if args.serve:
+        from api_server import serve
+        if args.profile:
+            PROFILER.start(args.profile, 'serve', profile_thread=False)
+            timer = threading.Timer(args.profile, finish_profile)
+            timer.daemon = True
+            timer.start()
+        try:
+            serve(host=args.host, port=args.port)
+        finally:
+            finish_profile()
+            if exporter:
+                exporter.stop()
+            if TRACER.enabled:
+                print(f"Trace saved: {TRACER.save()}")
+        return
+
+    if args.server:
+        from api_client import ApiClient, RemoteAuthManager, RemoteService
+        client = ApiClient(args.server)
+        auth_manager = RemoteAuthManager(client)
+        service = RemoteService(client)
+    else:
+        db_manager = DatabaseManager()
+        auth_manager = AuthManager(db_manager)
+        service = PrintShopService(db_manager)
+        service.event_bus = EventBus()
+        journal_watcher = JournalWatcher(db_manager.db_name, service.event_bus)
+        if args.sync_hub:
+            from sync import FileHub, HttpHub, SyncWorker
+            if args.sync_hub.startswith(('http://', 'https://')):
+                hub = HttpHub(args.sync_hub, args.sync_user, args.sync_password)
+            else:
+                hub = FileHub(args.sync_hub)
+            service.sync_worker = SyncWorker(db_manager.db_name, hub)
+            service.sync_worker.start()
     
     root = tk.Tk()
+    if args.stall_ms > 0:
+        UIWatchdog(root, args.stall_ms, args.diagnostics_log).start()
+    else:
+        EventLoopLagMonitor(root).start()
+    if args.memory_monitor:
+        MemoryMonitor(root, args.memory_interval, args.memory_budget_mb, args.diagnostics_log).start()
+    if args.profile:
+        PROFILER.start(args.profile, 'startup')
+        root.after(int(args.profile * 1000), finish_profile)
     
     def on_login_success():
-        if auth_manager.is_admin():
+        service.set_current_user(auth_manager.current_user)
+        if auth_manager.is_admin() and not args.server:
             app = AdminDashboardUI(root, auth_manager, service)
         else:
             app = PrintShopUI(root, service, auth_manager)
@@ -23,6 +114,17 @@ def main():
     login_window = LoginUI(root, auth_manager, on_login_success)
     root.withdraw()
     root.mainloop()
+    
+    if getattr(service, 'sync_worker', None):
+        service.sync_worker.stop()
+    if not args.server:
+        journal_watcher.stop()
+    finish_profile()
+    if exporter:
+        exporter.stop()
+    if TRACER.enabled:
+        print(f"Trace saved: {TRACER.save()}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    multiprocessing.freeze_support()
+    main()
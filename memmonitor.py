@@ -0,0 +1,183 @@
+"""tracemalloc-based memory monitor for long-running sessions.
+
+Every interval the monitor takes a tracemalloc snapshot and counts live
+Tk widgets (by class), Toplevel windows, Treeview rows and matplotlib
+figures. Growth is measured against a baseline taken after a warm-up
+check, so caches that fill once do not count. When traced memory has
+grown by more than the budget, or a widget/figure count keeps climbing,
+the top allocation sites (diffed against the baseline) are appended to
+the diagnostics log.
+"""
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+
+from metrics import METRICS
+
+TRACE_FRAMES = 10
+TOP_SITES = 10
+
+MEMORY_TRACED = METRICS.gauge('printshop_memory_traced_bytes', "Python memory traced by tracemalloc")
+MEMORY_GROWTH = METRICS.gauge('printshop_memory_growth_bytes', "Traced memory growth since the monitor's baseline")
+TK_WIDGETS = METRICS.gauge('printshop_tk_widgets', "Live Tk widgets")
+MPL_FIGURES = METRICS.gauge('printshop_matplotlib_figures', "Live matplotlib figures")
+
+MEMORY_WARNINGS = deque(maxlen=20)
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>')
+)
+
+def count_widgets(root):
+    """Return (widget counts by Tk class, Treeview rows) for everything under root"""
+    counts = Counter()
+    rows = 0
+    pending = [root]
+    while pending:
+        widget = pending.pop()
+        for child in widget.winfo_children():
+            kind = child.winfo_class()
+            counts[kind] += 1
+            if kind == 'Treeview':
+                rows += len(child.get_children(''))
+            pending.append(child)
+    return counts, rows
+
+def count_figures():
+    """Live matplotlib Figure objects, or 0 if matplotlib was never imported"""
+    module = sys.modules.get('matplotlib.figure')
+    if module is None:
+        return 0
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, module.Figure))
+
+class MemoryMonitor:
+    """Periodic memory checks, on the Tk loop if given a root, else on a thread"""
+
+    def __init__(self, root=None, interval=300, budget_mb=50, log_path='diagnostics.log'):
+        self.root = root
+        self.interval = interval
+        self.budget = budget_mb * 1024 * 1024
+        self.log_path = log_path
+        self.baseline = None
+        self.baseline_counts = None
+        self.history = deque(maxlen=288)
+        self._job = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Begin tracing and schedule checks (on the Tk loop when there is a root)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        if self.root is not None:
+            self._job = self.root.after(int(self.interval * 1000), self._tick)
+        else:
+            self._thread = threading.Thread(target=self._run, name='memory-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        self._stop.set()
+
+    def _tick(self):
+        self.check()
+        self._job = self.root.after(int(self.interval * 1000), self._tick)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+    def counts(self):
+        counts = Counter()
+        rows = 0
+        if self.root is not None:
+            counts, rows = count_widgets(self.root)
+        return {
+            'widgets': sum(counts.values()),
+            'toplevels': counts.get('Toplevel', 0),
+            'treeview_rows': rows,
+            'figures': count_figures(),
+            'by_class': counts
+        }
+
+    def check(self):
+        """Take a sample; the first one becomes the baseline. Returns the sample"""
+        gc.collect()
+        snapshot = self.snapshot()
+        traced = tracemalloc.get_traced_memory()[0]
+        counts = self.counts()
+        sample = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'traced': traced,
+            'widgets': counts['widgets'],
+            'toplevels': counts['toplevels'],
+            'treeview_rows': counts['treeview_rows'],
+            'figures': counts['figures']
+        }
+
+        if self.baseline is None:
+            self.baseline = (snapshot, traced)
+            self.baseline_counts = counts
+            sample['growth'] = 0
+        else:
+            sample['growth'] = traced - self.baseline[1]
+            problems = self.problems(sample, counts)
+            if problems:
+                self.warn(sample, problems, snapshot)
+
+        self.history.append(sample)
+        MEMORY_TRACED.set(traced)
+        MEMORY_GROWTH.set(sample['growth'])
+        TK_WIDGETS.set(counts['widgets'])
+        MPL_FIGURES.set(counts['figures'])
+        return sample
+
+    def problems(self, sample, counts):
+        problems = []
+        if sample['growth'] > self.budget:
+            problems.append(f"traced memory grew {sample['growth'] / 1048576:.1f} MB "
+                            f"(budget {self.budget / 1048576:.0f} MB)")
+        if len(self.history) >= 2:
+            for key in ('widgets', 'toplevels', 'figures'):
+                values = [entry[key] for entry in list(self.history)[-2:]] + [sample[key]]
+                if values[0] < values[1] < values[2] and sample[key] > self.baseline_counts[key]:
+                    problems.append(f"{key} rising for 3 checks: {' -> '.join(map(str, values))}")
+        return problems
+
+    def top_sites(self, snapshot=None, limit=TOP_SITES):
+        """Allocation sites that grew most since the baseline, as (size_diff, count_diff, site)"""
+        snapshot = snapshot or self.snapshot()
+        if self.baseline is None:
+            return []
+        result = []
+        for stat in snapshot.compare_to(self.baseline[0], 'lineno')[:limit]:
+            frame = stat.traceback[0]
+            result.append((stat.size_diff, stat.count_diff, f"{frame.filename}:{frame.lineno}"))
+        return result
+
+    def warn(self, sample, problems, snapshot):
+        MEMORY_WARNINGS.append({'time': sample['time'], 'problems': problems})
+
+        lines = [f"=== {sample['time']} memory warning: {'; '.join(problems)}",
+                 f"traced {sample['traced'] / 1048576:.1f} MB, widgets {sample['widgets']}, "
+                 f"toplevels {sample['toplevels']}, treeview rows {sample['treeview_rows']}, "
+                 f"figures {sample['figures']}",
+                 "--- top allocation sites since baseline"]
+        for size_diff, count_diff, site in self.top_sites(snapshot):
+            lines.append(f"{size_diff / 1024:+10.1f} KiB {count_diff:+8d} blocks  {site}")
+        try:
+            with open(self.log_path, 'a') as f:
+                f.write('\n'.join(lines) + '\n\n')
+        except OSError as e:
+            print(f"Error writing diagnostics log: {e}")
@@ -0,0 +1,355 @@
+"""Prometheus text-format metrics for sales, latency and database health.
+
+Everything on the hot path is an in-memory counter, gauge or histogram
+update; nothing here queries SQLite. Values that are cheap to read at
+scrape time (SQL statistics from QUERY_STATS, database and WAL file
+sizes, sales in the last minute) are collected when the text is
+rendered. The API server exposes it at GET /metrics and the desktop app
+can write it for node_exporter's textfile collector (main.py
+--metrics-file). Metrics are per process, so every terminal and the API
+server report their own.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+from sqlstats import LATENCY_BUCKETS_MS, QUERY_STATS
+
+SECONDS_BUCKETS = tuple(bound / 1000 for bound in LATENCY_BUCKETS_MS)
+SALES_WINDOW_SECONDS = 60
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = [(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in pairs]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values
+        ]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels))
+
+    def items(self):
+        """Return (label values, value) pairs"""
+        with self._lock:
+            return list(self._values.items())
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=SECONDS_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        bucket = bisect.bisect_left(self.buckets, value)
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][bucket] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = self.header()
+        for key, counts, total, count in values:
+            lines += histogram_lines(self.name, self.labels, key, self.buckets, counts, total, count)
+        return lines
+
+def histogram_lines(name, label_names, label_values, buckets, counts, total, count):
+    """Sample lines for one histogram series from per-bucket (not cumulative) counts"""
+    lines = []
+    seen = 0
+    for bound, bucket_count in zip(buckets, counts):
+        seen += bucket_count
+        lines.append(f"{name}_bucket{_format_labels(label_names, label_values, ('le', _format_value(bound)))} {seen}")
+    if buckets[-1] != float('inf'):
+        lines.append(f"{name}_bucket{_format_labels(label_names, label_values, ('le', '+Inf'))} {count}")
+    labels = _format_labels(label_names, label_values)
+    lines.append(f"{name}_sum{labels} {_format_value(float(total))}")
+    lines.append(f"{name}_count{labels} {count}")
+    return lines
+
+class MetricsRegistry:
+    """The set of metrics rendered together, plus collectors run at scrape time"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=SECONDS_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """Register func() returning extra sample lines, run on every render"""
+        self.collectors.append(func)
+        return func
+
+    def render(self):
+        lines = []
+        for collect in self.collectors:
+            lines += collect()
+        for metric in self.metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+METRICS = MetricsRegistry()
+
+SALES = METRICS.counter('printshop_sales_total', "Sales committed")
+SALE_LINES = METRICS.counter('printshop_sale_lines_total', "Items sold, by service", ('service',))
+SALES_AMOUNT = METRICS.counter('printshop_sales_amount_total', "Sales income in Maloti")
+SALE_FAILURES = METRICS.counter('printshop_sale_failures_total', "Sales rolled back, by reason", ('reason',))
+SALE_SECONDS = METRICS.histogram('printshop_sale_duration_seconds',
+                                 "Time to process a sale (process_transaction/process_sale), including commit")
+EXPENSES = METRICS.counter('printshop_expenses_total', "Expenses recorded")
+STOCK = METRICS.gauge('printshop_stock', "Stock on hand (paper in sheets)", ('item',))
+STOCK_THRESHOLD = METRICS.gauge('printshop_stock_threshold', "Low-stock warning level", ('item',))
+REPORT_SECONDS = METRICS.histogram('printshop_report_duration_seconds', "Time to write a report or export", ('report',))
+TK_LAG = METRICS.histogram('printshop_tk_event_loop_lag_seconds', "How late Tk ran a scheduled timer callback")
+TK_LAG_LAST = METRICS.gauge('printshop_tk_event_loop_lag_last_seconds', "Lateness of the most recent Tk timer tick")
+
+_sale_times = deque(maxlen=10000)
+_databases = set()
+
+def observe_sale(result, seconds):
+    """Count a committed process_sale result; its stock snapshot updates the stock gauges"""
+    SALES.inc()
+    SALES_AMOUNT.inc(result['amount'])
+    SALE_SECONDS.observe(seconds)
+    for line in result['lines']:
+        SALE_LINES.inc(line['quantity'], service=line['service'])
+    set_stock(result['stock'])
+    now = time.monotonic()
+    _sale_times.append(now)
+    try:
+        while _sale_times[0] < now - SALES_WINDOW_SECONDS:
+            _sale_times.popleft()
+    except IndexError:
+        pass
+
+def set_stock(quantities):
+    for item, quantity in quantities.items():
+        STOCK.set(quantity, item=item)
+
+def set_stock_thresholds(thresholds):
+    for item, threshold in thresholds.items():
+        STOCK_THRESHOLD.set(threshold, item=item)
+
+def watch_database(path):
+    """Report the size of this database file and its WAL"""
+    _databases.add(os.path.abspath(path))
+
+def timed(histogram, **labels):
+    """Decorator observing each call's duration in histogram"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, **labels)
+        return wrapper
+    return decorator
+
+@METRICS.collector
+def collect_sales_rate():
+    cutoff = time.monotonic() - SALES_WINDOW_SECONDS
+    recent = sum(1 for moment in list(_sale_times) if moment >= cutoff)
+    return [
+        "# HELP printshop_sales_per_minute Sales committed in the last 60 seconds",
+        "# TYPE printshop_sales_per_minute gauge",
+        f"printshop_sales_per_minute {recent}"
+    ]
+
+@METRICS.collector
+def collect_stock_status():
+    lines = [
+        "# HELP printshop_stock_below_threshold 1 if an item is under its low-stock threshold",
+        "# TYPE printshop_stock_below_threshold gauge"
+    ]
+    for (item,), threshold in STOCK_THRESHOLD.items():
+        quantity = STOCK.get(item=item)
+        if quantity is not None:
+            lines.append(f"printshop_stock_below_threshold{_format_labels(('item',), (item,))} {int(quantity < threshold)}")
+    return lines
+
+@METRICS.collector
+def collect_query_stats():
+    by_statement = {}
+    commit = None
+    for entry in QUERY_STATS.snapshot():
+        if entry['query'] == 'COMMIT':
+            commit = entry
+            continue
+        statement = entry['query'].split(' ', 1)[0].upper()
+        calls, total_ms = by_statement.get(statement, (0, 0.0))
+        by_statement[statement] = (calls + entry['calls'], total_ms + entry['total_ms'])
+
+    lines = [
+        "# HELP printshop_sqlite_queries_total SQL statements run, by statement type",
+        "# TYPE printshop_sqlite_queries_total counter"
+    ]
+    for statement, (calls, _) in sorted(by_statement.items()):
+        lines.append(f"printshop_sqlite_queries_total{_format_labels(('statement',), (statement,))} {calls}")
+    lines += [
+        "# HELP printshop_sqlite_query_seconds_total Time spent in SQL statements, by statement type",
+        "# TYPE printshop_sqlite_query_seconds_total counter"
+    ]
+    for statement, (_, total_ms) in sorted(by_statement.items()):
+        lines.append(f"printshop_sqlite_query_seconds_total{_format_labels(('statement',), (statement,))} {total_ms / 1000!r}")
+
+    lines += [
+        "# HELP printshop_sqlite_commit_duration_seconds Time taken by each COMMIT",
+        "# TYPE printshop_sqlite_commit_duration_seconds histogram"
+    ]
+    if commit:
+        lines += histogram_lines('printshop_sqlite_commit_duration_seconds', (), (), SECONDS_BUCKETS,
+                                 commit['histogram'], commit['total_ms'] / 1000, commit['calls'])
+    return lines
+
+@METRICS.collector
+def collect_database_size():
+    lines = [
+        "# HELP printshop_database_size_bytes Size of the SQLite database and its write-ahead log",
+        "# TYPE printshop_database_size_bytes gauge"
+    ]
+    for path in sorted(_databases):
+        for kind, filename in (('db', path), ('wal', path + '-wal')):
+            try:
+                size = os.path.getsize(filename)
+            except OSError:
+                size = 0
+            lines.append(f"printshop_database_size_bytes{_format_labels(('path', 'file'), (path, kind))} {size}")
+    return lines
+
+def render():
+    return METRICS.render()
+
+def write_textfile(path):
+    """Write the metrics atomically, as node_exporter's textfile collector expects"""
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, 'w') as f:
+        f.write(render())
+    os.replace(temp, path)
+
+class TextfileExporter:
+    """Background thread rewriting a .prom file every interval seconds"""
+
+    def __init__(self, path, interval=15):
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.write()
+
+    def write(self):
+        try:
+            write_textfile(self.path)
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.write()
+            self._stop.wait(self.interval)
+
+class EventLoopLagMonitor:
+    """Schedules a Tk timer every interval_ms and records how late it fires.
+
+    A busy main thread (slow query, long redraw) delays every callback
+    queued behind it, so the lateness is how long the UI was unresponsive.
+    """
+
+    def __init__(self, root, interval_ms=250):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._expected = None
+        self._job = None
+
+    def start(self):
+        self._schedule()
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def _schedule(self):
+        self._expected = time.perf_counter() + self.interval_ms / 1000
+        self._job = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        lag = max(0.0, time.perf_counter() - self._expected)
+        TK_LAG.observe(lag)
+        TK_LAG_LAST.set(lag)
+        self._schedule()
@@ -1,10 +1,25 @@
+import json
+import queue
+import random
 import sqlite3
-from datetime import datetime
+import time
+import uuid
+from contextlib import contextmanager
+
+from clock import SystemClock
+from metrics import STOCK
+from sqlstats import InstrumentedConnection, InstrumentedCursor
+
+class UpdateConflictError(Exception):
+    """Raised when a row changed under an optimistic update too many times"""
 
 class DatabaseManager:
-    def __init__(self, db_name='printshop.db'):
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
+    def __init__(self, db_name='printshop.db', check_same_thread=True, clock=None):
+        self.db_name = db_name
+        self.clock = clock or SystemClock()
+        self.conn = sqlite3.connect(db_name, timeout=30, check_same_thread=check_same_thread,
+                                    factory=InstrumentedConnection)
+        self.cursor = InstrumentedCursor(self.conn.cursor())
         self.init_database()
 
     def init_database(self):
@@ -22,6 +37,18 @@ class DatabaseManager:
             )
         ''')
         
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_date
+            ON transactions (date)
+        ''')
+        
+        self.add_column_if_missing('transactions', 'created_by', 'TEXT')
+        self.add_column_if_missing('transactions', 'sale_id', 'TEXT')
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_sale_id
+            ON transactions (sale_id)
+        ''')
+        
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS inventory (
                 item TEXT PRIMARY KEY,
@@ -30,6 +57,8 @@ class DatabaseManager:
             )
         ''')
         
+        self.add_column_if_missing('inventory', 'version', 'INTEGER NOT NULL DEFAULT 0')
+        
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS daily_records (
                 date TEXT PRIMARY KEY,
@@ -56,6 +85,31 @@ class DatabaseManager:
             )
         ''')
         
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_expenses_date
+            ON expenses (date)
+        ''')
+        
+        self.add_column_if_missing('expenses', 'created_by', 'TEXT')
+        
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id TEXT NOT NULL UNIQUE,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS paper_stock_log (
                 id INTEGER PRIMARY KEY,
@@ -75,27 +129,101 @@ class DatabaseManager:
             ]
             self.cursor.executemany(
                 'INSERT OR IGNORE INTO inventory (item, quantity, last_updated) VALUES (?, ?, ?)',
-                [(item, qty, datetime.now().strftime('%Y-%m-%d %H:%M:%S')) 
+                [(item, qty, self.clock.now().strftime('%Y-%m-%d %H:%M:%S')) 
                  for item, qty in initial_inventory]
             )
         
         self.conn.commit()
 
+    def add_column_if_missing(self, table, column, definition):
+        """Add a column to an existing table created by an older version"""
+        self.cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in self.cursor.fetchall()]:
+            self.cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    def record_event(self, kind, payload, event_id=None):
+        """Append a sale, expense or stock move to the journal
+
+        Called inside the transaction of the change it describes, so the
+        journal never disagrees with the tables. Returns the event id, a
+        globally unique id that identifies the change on every database it
+        is synced to.
+        """
+        event_id = event_id or uuid.uuid4().hex
+        self.cursor.execute('''
+            INSERT INTO journal (event_id, kind, payload, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', (event_id, kind, json.dumps(payload, default=str), self.clock.now().strftime('%Y-%m-%d %H:%M:%S')))
+        return event_id
+
+    def close(self):
+        self.cursor.flush()
+        self.conn.close()
+
+class ConnectionPool:
+    """Fixed-size pool of DatabaseManager connections shared by worker threads.
+
+    The database is switched to WAL mode so readers do not block the
+    single writer, and each connection waits on locks instead of failing.
+    """
+
+    def __init__(self, db_name='printshop.db', size=8, clock=None):
+        self.db_name = db_name
+        self.size = size
+        self._idle = queue.Queue()
+        for i in range(size):
+            db = DatabaseManager(db_name, check_same_thread=False, clock=clock)
+            if i == 0:
+                db.cursor.execute('PRAGMA journal_mode=WAL').fetchone()
+            self._idle.put(db)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with block"""
+        db = self._idle.get()
+        try:
+            yield db
+        finally:
+            if db.conn.in_transaction:
+                db.conn.rollback()
+            self._idle.put(db)
+
+    def close(self):
+        for _ in range(self.size):
+            self._idle.get().close()
+
 class Transaction:
     def __init__(self, db_manager):
         self.db = db_manager
 
-    def add_transaction(self, service, quantity, amount, papers_used=0, created_by=None):
-        today = datetime.now().strftime('%Y-%m-%d')
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    def add_transaction(self, service, quantity, amount, papers_used=0, created_by=None,
+                        sale_id=None, commit=True):
+        today = self.db.clock.now().strftime('%Y-%m-%d')
+        timestamp = self.db.clock.now().strftime('%Y-%m-%d %H:%M:%S')
         
         self.db.cursor.execute('''
             INSERT INTO transactions 
-            (date, service, quantity, amount, papers_used, timestamp, created_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (today, service, quantity, amount, papers_used, timestamp, created_by))
+            (date, service, quantity, amount, papers_used, timestamp, created_by, sale_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (today, service, quantity, amount, papers_used, timestamp, created_by, sale_id))
         
-        self.db.conn.commit()
+        transaction = {
+            'id': self.db.cursor.lastrowid,
+            'date': today,
+            'service': service,
+            'quantity': quantity,
+            'amount': amount,
+            'papers_used': papers_used,
+            'timestamp': timestamp,
+            'created_by': created_by,
+            'sale_id': sale_id
+        }
+        self.db.record_event('sale', transaction)
+        
+        if commit:
+            self.db.conn.commit()
+        
+        return transaction
 
 class Inventory:
     def __init__(self, db_manager):
@@ -103,6 +231,9 @@ class Inventory:
         self.SHEETS_PER_RIM = 500
         self.RIMS_PER_BOX = 5
         self.SHEETS_PER_BOX = self.SHEETS_PER_RIM * self.RIMS_PER_BOX
+        self.MAX_RETRIES = 20
+        self.RETRY_BACKOFF = 0.002
+        self.MAX_BACKOFF = 0.1
     
     def add_stock(self, item_type, quantity, unit_type=None):
         """
@@ -111,9 +242,6 @@ class Inventory:
         unit_type: box, rim (for paper only)
         """
         try:
-            current_sheets = self.get_stock(item_type)
-            print(f"Current sheets: {current_sheets}")
-            
             if item_type == 'paper':
                 if unit_type == 'box':
                     sheets_to_add = quantity * (self.SHEETS_PER_RIM * self.RIMS_PER_BOX) 
@@ -125,24 +253,11 @@ class Inventory:
                     sheets_to_add = quantity
                     print(f"Adding {quantity} direct sheets")
                 
-         
-                new_total_sheets = current_sheets + sheets_to_add
+                new_total_sheets = self.change_quantity(item_type, sheets_to_add)
                 print(f"New total sheets: {new_total_sheets}")
-                
-                self.db.cursor.execute('''
-                    UPDATE inventory 
-                    SET quantity = ?, last_updated = ?
-                    WHERE item = ?
-                ''', (new_total_sheets, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), item_type))
             else:
-                new_quantity = current_sheets + quantity
-                self.db.cursor.execute('''
-                    UPDATE inventory 
-                    SET quantity = ?, last_updated = ?
-                    WHERE item = ?
-                ''', (new_quantity, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), item_type))
+                self.change_quantity(item_type, quantity)
             
-            self.db.conn.commit()
             return True
             
         except Exception as e:
@@ -178,35 +293,86 @@ class Inventory:
                     
             return stock
 
-    def update_stock(self, item_type, quantity_change):
-        """Update stock quantity"""
+    def get_quantities(self):
+        """Return raw quantities for every inventory item"""
+        self.db.cursor.execute('SELECT item, quantity FROM inventory')
+        return dict(self.db.cursor.fetchall())
+
+    def update_stock(self, item_type, quantity_change, commit=True):
+        """Update stock quantity
+
+        With commit=False the change joins the caller's open transaction.
+        """
         try:
-            current_stock = self.get_stock(item_type)
-            new_quantity = current_stock + quantity_change
-            
-            self.db.cursor.execute('''
-                UPDATE inventory 
-                SET quantity = ?, last_updated = ?
-                WHERE item = ?
-            ''', (new_quantity, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), item_type))
-            
-            self.db.conn.commit()
+            self.change_quantity(item_type, quantity_change, commit)
             return True
         except Exception as e:
             print(f"Error updating stock: {e}")
             return False
+
+    def change_quantity(self, item_type, quantity_change, commit=True, event_id=None):
+        """Apply a relative change to an item's quantity and return the new total
+
+        The write only succeeds if the row's version is still the one that
+        was read, so two terminals changing the same item can never overwrite
+        each other. A write that loses the race is rolled back and retried
+        after a randomized, growing backoff. Inside a caller's transaction
+        (commit=False) there is nothing to retry, so a conflict is raised.
+        """
+        for attempt in range(self.MAX_RETRIES):
+            self.db.cursor.execute('SELECT quantity, version FROM inventory WHERE item = ?', (item_type,))
+            row = self.db.cursor.fetchone()
+            if row is None:
+                raise ValueError(f"Unknown inventory item: {item_type}")
+            
+            quantity, version = row
+            new_quantity = quantity + quantity_change
+            self.db.cursor.execute('''
+                UPDATE inventory 
+                SET quantity = ?, version = version + 1, last_updated = ?
+                WHERE item = ? AND version = ?
+            ''', (new_quantity, self.db.clock.now().strftime('%Y-%m-%d %H:%M:%S'), item_type, version))
+            
+            if self.db.cursor.rowcount == 1:
+                self.db.record_event('stock', {
+                    'item': item_type,
+                    'change': quantity_change,
+                    'quantity': new_quantity
+                }, event_id)
+                if commit:
+                    self.db.conn.commit()
+                    STOCK.set(new_quantity, item=item_type)
+                return new_quantity
+            
+            if not commit:
+                break
+            self.db.conn.rollback()
+            time.sleep(random.uniform(0, min(self.MAX_BACKOFF, self.RETRY_BACKOFF * 2 ** attempt)))
+        
+        raise UpdateConflictError(f"{item_type} stock was changed concurrently, update not applied")
+
 class Expense:
     def __init__(self, db_manager):
         self.db = db_manager
 
-    def add_expense(self, category, amount, description):
-        today = datetime.now().strftime('%Y-%m-%d')
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    def add_expense(self, category, amount, description, created_by=None):
+        today = self.db.clock.now().strftime('%Y-%m-%d')
+        timestamp = self.db.clock.now().strftime('%Y-%m-%d %H:%M:%S')
         
         self.db.cursor.execute('''
             INSERT INTO expenses 
-            (date, category, amount, description, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (today, category, amount, description, timestamp))
+            (date, category, amount, description, timestamp, created_by)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (today, category, amount, description, timestamp, created_by))
+        
+        self.db.record_event('expense', {
+            'id': self.db.cursor.lastrowid,
+            'date': today,
+            'category': category,
+            'amount': amount,
+            'description': description,
+            'timestamp': timestamp,
+            'created_by': created_by
+        })
         
         self.db.conn.commit()
\ No newline at end of file
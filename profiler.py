@@ -0,0 +1,186 @@
+"""Time-boxed profile captures of the running app.
+
+A capture records two things into the diagnostics folder:
+
+- profile_<label>_<time>.prof: cProfile statistics for the thread that
+  started the capture (the Tk main thread, or the main thread under
+  main.py --profile) merged with every API request handled meanwhile.
+  Open with `python -m pstats` or snakeviz.
+- profile_<label>_<time>.collapsed: stack samples of every thread, one
+  "thread;outer;...;inner count" line per distinct stack, the input
+  format of flamegraph.pl and speedscope.
+
+From the command line, `python profiler.py [--seconds N] script.py args`
+profiles any of the repo's scripts (replay.py, benchmark.py, ...),
+interrupting the script after N seconds if given.
+"""
+import _thread
+import argparse
+import cProfile
+import os
+import pstats
+import runpy
+import sys
+import threading
+import time
+from collections import Counter
+
+DIAGNOSTICS_DIR = 'diagnostics'
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class Profiler:
+    """One capture at a time: cProfile on chosen threads plus an all-thread stack sampler"""
+
+    def __init__(self, directory=DIAGNOSTICS_DIR, sample_ms=10):
+        self.directory = directory
+        self.sample_interval = sample_ms / 1000
+        self.active = False
+        self.label = None
+        self.deadline = None
+        self.last_files = None
+        self._profile = None
+        self._profiles = []
+        self._samples = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self, seconds=None, label='app', profile_thread=True):
+        """Start a capture that stops sampling after seconds (None: until stop()).
+
+        profile_thread: also run cProfile on the calling thread; stop() must
+        then be called from that same thread.
+        """
+        with self._lock:
+            if self.active:
+                raise RuntimeError("A profile is already being recorded")
+            self.active = True
+        self.label = label
+        self.deadline = time.perf_counter() + seconds if seconds else None
+        self._profiles = []
+        self._samples = Counter()
+        self._stop.clear()
+        self._profile = None
+        if profile_thread:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._sampler = threading.Thread(target=self._sample, name='profiler-sampler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """End the capture and write its files; returns (prof_path, collapsed_path)"""
+        with self._lock:
+            if not self.active:
+                return None
+            self.active = False
+        if self._profile is not None:
+            self._profile.disable()
+            self._profiles.append(self._profile)
+            self._profile = None
+        self._stop.set()
+        self._sampler.join(timeout=5)
+        self.last_files = self.save()
+        return self.last_files
+
+    def expired(self):
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def profile_call(self, func, *args, **kwargs):
+        """Run func under its own cProfile if a capture is running, merging it into the capture"""
+        if not self.active or self.expired():
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            with self._lock:
+                if self.active:
+                    self._profiles.append(profile)
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.sample_interval):
+            if self.expired():
+                return
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._samples[';'.join(reversed(stack))] += 1
+            del frame
+
+    def save(self):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        base = os.path.join(self.directory, f"profile_{self.label}_{time.strftime('%Y%m%d_%H%M%S')}")
+
+        prof_path = None
+        profiles = [profile for profile in self._profiles if profile.getstats()]
+        if profiles:
+            prof_path = base + '.prof'
+            pstats.Stats(*profiles).dump_stats(prof_path)
+
+        collapsed_path = base + '.collapsed'
+        with open(collapsed_path, 'w') as f:
+            for stack, count in sorted(self._samples.items()):
+                f.write(f"{stack} {count}\n")
+        return prof_path, collapsed_path
+
+    def summary(self, limit=15):
+        """Top functions by cumulative time in the last capture"""
+        prof_path = self.last_files[0] if self.last_files else None
+        if not prof_path:
+            return []
+        stats = pstats.Stats(prof_path)
+        rows = []
+        for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({
+                'function': f"{name} ({os.path.basename(filename)}:{line})",
+                'calls': calls,
+                'total_s': total,
+                'cumulative_s': cumulative
+            })
+        rows.sort(key=lambda row: row['cumulative_s'], reverse=True)
+        return rows[:limit]
+
+PROFILER = Profiler()
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile a script and save .prof and collapsed-stack files")
+    parser.add_argument('--seconds', type=float, help="interrupt the script after this many seconds")
+    parser.add_argument('--directory', default=DIAGNOSTICS_DIR)
+    parser.add_argument('--sample-ms', type=float, default=10)
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    profiler = Profiler(args.directory, args.sample_ms)
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    label = os.path.splitext(os.path.basename(args.script))[0]
+    timer = None
+    if args.seconds:
+        timer = threading.Timer(args.seconds, _thread.interrupt_main)
+        timer.daemon = True
+        timer.start()
+    profiler.start(args.seconds, label)
+    try:
+        runpy.run_path(args.script, run_name='__main__')
+    except (SystemExit, KeyboardInterrupt):
+        pass
+    finally:
+        if timer:
+            timer.cancel()
+        prof_path, collapsed_path = profiler.stop()
+        print(f"Profile: {prof_path}\nCollapsed stacks: {collapsed_path}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Replay recorded business days against a fresh database.
+
+Reads the sales, expenses and end-of-day closings of a recorded log, from
+a PrintShop database or a transactions CSV written by export_data, and
+re-executes them through PrintShopService on a new database. A
+ManualClock is set to each event's recorded time before it runs, so the
+replayed rows carry the original dates and timestamps. Events are paced in
+real time, at N times speed, or as fast as possible, and the per-day
+totals of the result are checked against the recording.
+
+    python replay.py --from-db printshop.db --date 2024-03-15 --speed 60
+    python replay.py --from-csv exports/transactions_20240315_180000.csv --speed 0
+"""
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from auth import User
+from branches import connect_readonly
+from clock import ManualClock
+from models import DatabaseManager
+from services import PrintShopService
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+CLOSING_DELAY = timedelta(minutes=1)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def in_range(date, start, end):
+    return (start is None or date >= start) and (end is None or date <= end)
+
+def sale_events(rows):
+    """Group (timestamp, service, quantity, amount, papers_used, created_by, sale_id) rows into sales
+
+    Lines sharing a sale id become one multi-line sale; rows without one
+    are sales of their own. Each sale keeps the unit prices it was charged,
+    since the price list may have changed since it was recorded.
+    """
+    sales = {}
+    for i, (timestamp, service, quantity, amount, papers_used, created_by, sale_id) in enumerate(rows):
+        key = sale_id or f"row-{i}"
+        sale = sales.get(key)
+        if sale is None:
+            sale = sales[key] = {
+                'time': datetime.strptime(timestamp, TIMESTAMP_FORMAT),
+                'kind': 'sale',
+                'user': created_by,
+                'lines': [],
+                'prices': {},
+                'amount': 0.0,
+                'papers_used': 0
+            }
+        quantity = int(quantity)
+        papers_used = int(papers_used or 0)
+        sale['lines'].append((service, quantity, papers_used // quantity if quantity else 0))
+        if quantity:
+            sale['prices'][service] = float(amount) / quantity
+        sale['amount'] += float(amount)
+        sale['papers_used'] += papers_used
+    return list(sales.values())
+
+def closing_events(events, dates):
+    """End-of-day events for dates, one minute after that day's last recorded event"""
+    last = {}
+    for event in events:
+        date = event['time'].strftime('%Y-%m-%d')
+        last[date] = max(last.get(date, event['time']), event['time'])
+    return [
+        {'time': last[date] + CLOSING_DELAY, 'kind': 'end_of_day', 'date': date}
+        for date in sorted(dates) if date in last
+    ]
+
+def load_events_from_db(db_path, start=None, end=None, end_days=True):
+    """Return the recorded events of a PrintShop database, oldest first"""
+    conn = connect_readonly(db_path)
+    try:
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(transactions)')]
+        sale_id = 'sale_id' if 'sale_id' in columns else 'NULL'
+        created_by = 'created_by' if 'created_by' in columns else 'NULL'
+        rows = conn.execute(f'''
+            SELECT timestamp, service, quantity, amount, papers_used, {created_by}, {sale_id}
+            FROM transactions
+            WHERE date BETWEEN ? AND ?
+            ORDER BY timestamp, id
+        ''', (start or '0000-00-00', end or '9999-99-99')).fetchall()
+        events = sale_events(rows)
+
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(expenses)')]
+        created_by = 'created_by' if 'created_by' in columns else 'NULL AS created_by'
+        for timestamp, category, amount, description, user in conn.execute(f'''
+            SELECT timestamp, category, amount, description, {created_by}
+            FROM expenses
+            WHERE date BETWEEN ? AND ?
+            ORDER BY timestamp, id
+        ''', (start or '0000-00-00', end or '9999-99-99')):
+            events.append({
+                'time': datetime.strptime(timestamp, TIMESTAMP_FORMAT),
+                'kind': 'expense',
+                'user': user,
+                'category': category,
+                'amount': amount,
+                'description': description or ''
+            })
+
+        if end_days:
+            dates = [
+                date for (date,) in conn.execute('SELECT date FROM daily_records')
+                if in_range(date, start, end)
+            ]
+            events.extend(closing_events(events, dates))
+    finally:
+        conn.close()
+
+    events.sort(key=lambda event: event['time'])
+    return events
+
+def load_events_from_csv(csv_path, start=None, end=None, end_days=True):
+    """Return the sales recorded in a transactions CSV from export_data, oldest first
+
+    Exports carry no cashier or expenses, so only sales (and, optionally, a
+    closing after each day) are replayed.
+    """
+    with open(csv_path, newline='') as f:
+        rows = [
+            (row['Timestamp'], row['Service'], row['Quantity'], row['Amount'],
+             row['Papers Used'], None, row.get('Sale ID') or None)
+            for row in csv.DictReader(f)
+            if in_range(row['Date'], start, end)
+        ]
+    rows.sort(key=lambda row: row[0])
+    events = sale_events(rows)
+    if end_days:
+        events.extend(closing_events(events, {event['time'].strftime('%Y-%m-%d') for event in events}))
+    events.sort(key=lambda event: event['time'])
+    return events
+
+class ReplayEngine:
+    """Re-executes recorded events through a PrintShopService on a ManualClock.
+
+    speed is how many recorded seconds pass per real second; 0 replays as
+    fast as possible. Gaps between events longer than max_gap recorded
+    seconds (nights, quiet afternoons) are shortened to max_gap.
+    """
+
+    def __init__(self, service, clock, speed=1.0, max_gap=None):
+        self.service = service
+        self.clock = clock
+        self.speed = speed
+        self.max_gap = max_gap
+
+    def offsets(self, events):
+        """Return the recorded-time offset of each event from the first, with long gaps shortened"""
+        offsets = []
+        offset = 0.0
+        for previous, event in zip([None] + events, events):
+            if previous is not None:
+                gap = (event['time'] - previous['time']).total_seconds()
+                offset += gap if self.max_gap is None else min(gap, self.max_gap)
+            offsets.append(offset)
+        return offsets
+
+    def apply(self, event):
+        if event['kind'] == 'sale':
+            current = dict(self.service.prices)
+            self.service.prices.update(event['prices'])
+            try:
+                self.service.process_sale(event['lines'])
+            finally:
+                self.service.prices = current
+        elif event['kind'] == 'expense':
+            self.service.record_expense(event['category'], event['amount'], event['description'])
+        elif event['kind'] == 'end_of_day':
+            self.service.end_day()
+
+    def run(self, events, progress=None):
+        """Replay events in order and return timing and failure statistics"""
+        latencies = {}
+        failures = []
+        max_lag = 0.0
+        started = time.monotonic()
+
+        for i, (event, offset) in enumerate(zip(events, self.offsets(events))):
+            if self.speed:
+                wait = started + offset / self.speed - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                else:
+                    max_lag = max(max_lag, -wait)
+
+            self.clock.set(event['time'])
+            user = event.get('user')
+            self.service.set_current_user(User(user, 'user', user) if user else None)
+
+            event_started = time.perf_counter()
+            try:
+                self.apply(event)
+            except Exception as e:
+                failures.append((event, str(e)))
+                continue
+            latencies.setdefault(event['kind'], []).append(time.perf_counter() - event_started)
+
+            if progress and (i + 1) % progress == 0:
+                print(f"  {i + 1}/{len(events)} events, recorded time {event['time']}", flush=True)
+
+        return {
+            'events': len(events),
+            'elapsed': time.monotonic() - started,
+            'latencies': latencies,
+            'failures': failures,
+            'max_lag': max_lag
+        }
+
+def expected_totals(events):
+    """Per-day (sales, revenue, papers, expenses) implied by the recorded events"""
+    totals = {}
+    for event in events:
+        day = totals.setdefault(event['time'].strftime('%Y-%m-%d'), [0, 0.0, 0, 0.0])
+        if event['kind'] == 'sale':
+            day[0] += len(event['lines'])
+            day[1] += event['amount']
+            day[2] += event['papers_used']
+        elif event['kind'] == 'expense':
+            day[3] += event['amount']
+    return totals
+
+def replayed_totals(db):
+    totals = {}
+    db.cursor.execute('''
+        SELECT date, COUNT(*), IFNULL(SUM(amount), 0), IFNULL(SUM(papers_used), 0)
+        FROM transactions
+        GROUP BY date
+    ''')
+    for date, count, revenue, papers in db.cursor.fetchall():
+        totals[date] = [count, revenue, papers, 0.0]
+    db.cursor.execute('SELECT date, SUM(amount) FROM expenses GROUP BY date')
+    for date, amount in db.cursor.fetchall():
+        totals.setdefault(date, [0, 0.0, 0, 0.0])[3] = amount
+    return totals
+
+def compare_totals(expected, actual):
+    """Return [(date, expected, actual)] for days whose totals differ"""
+    mismatches = []
+    for date in sorted(set(expected) | set(actual)):
+        want = expected.get(date, [0, 0.0, 0, 0.0])
+        got = actual.get(date, [0, 0.0, 0, 0.0])
+        if want[0] != got[0] or want[2] != got[2] or abs(want[1] - got[1]) > 0.005 or abs(want[3] - got[3]) > 0.005:
+            mismatches.append((date, want, got))
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded PrintShop days against a fresh database")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--from-db', help="recorded PrintShop database")
+    source.add_argument('--from-csv', help="transactions CSV written by export_data")
+    parser.add_argument('--date', help="replay only this day (YYYY-MM-DD)")
+    parser.add_argument('--start', help="first day to replay")
+    parser.add_argument('--end', help="last day to replay")
+    parser.add_argument('--speed', type=float, default=1.0, help="times real time; 0 for as fast as possible")
+    parser.add_argument('--max-gap', type=float, help="shorten idle gaps to this many recorded seconds")
+    parser.add_argument('--no-end-days', action='store_true', help="do not replay end-of-day closings")
+    parser.add_argument('--initial-stock', type=int, default=100000000, help="starting quantity of every item")
+    parser.add_argument('--target', help="write the replay to this new database instead of a temporary one")
+    parser.add_argument('--progress', type=int, default=0, help="print progress every N events")
+    args = parser.parse_args()
+
+    start = args.date or args.start
+    end = args.date or args.end
+    if args.from_db:
+        events = load_events_from_db(args.from_db, start, end, not args.no_end_days)
+    else:
+        events = load_events_from_csv(args.from_csv, start, end, not args.no_end_days)
+    if not events:
+        print("Nothing to replay")
+        return
+
+    if args.target and os.path.exists(args.target):
+        parser.error(f"{args.target} already exists; the replay needs a fresh database")
+
+    workdir = tempfile.mkdtemp(prefix='printshop_replay_')
+    target = os.path.abspath(args.target) if args.target else os.path.join(workdir, 'replay.db')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        clock = ManualClock(events[0]['time'])
+        db = DatabaseManager(target, clock=clock)
+        db.cursor.execute('UPDATE inventory SET quantity = ?', (args.initial_stock,))
+        db.conn.commit()
+        service = PrintShopService(db)
+
+        span = (events[-1]['time'] - events[0]['time']).total_seconds()
+        print(f"Replaying {len(events)} events from {events[0]['time']} to {events[-1]['time']} "
+              f"at {'full speed' if not args.speed else f'{args.speed:g}x'}")
+        stats = ReplayEngine(service, clock, args.speed, args.max_gap).run(events, args.progress)
+        mismatches = compare_totals(expected_totals(events), replayed_totals(db))
+        db.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Replayed:     {stats['events'] - len(stats['failures'])} of {stats['events']} events "
+          f"in {stats['elapsed']:.1f} s ({span / max(stats['elapsed'], 1e-9):.0f}x recorded time)")
+    if args.speed:
+        print(f"Max lag:      {stats['max_lag'] * 1000:.1f} ms behind schedule")
+    for kind, samples in sorted(stats['latencies'].items()):
+        print(f"{kind:<13} {len(samples):6d}  p50 {percentile(samples, 50) * 1000:.1f} ms  "
+              f"p95 {percentile(samples, 95) * 1000:.1f} ms  p99 {percentile(samples, 99) * 1000:.1f} ms")
+    for event, error in stats['failures'][:5]:
+        print(f"Failed {event['kind']} at {event['time']}: {error}")
+    for date, want, got in mismatches[:10]:
+        print(f"{date}: recorded {want[0]} sales M{want[1]:.2f} {want[2]} papers M{want[3]:.2f} expenses, "
+              f"replayed {got[0]} sales M{got[1]:.2f} {got[2]} papers M{got[3]:.2f} expenses")
+
+    ok = not stats['failures'] and not mismatches
+    print("PASS" if ok else "FAIL")
+    if args.target:
+        print(f"Replayed database: {target}")
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import os
+
+from metrics import REPORT_SECONDS, timed
+from tracing import traced
+
+class ReportWriter:
+    """Writes the period reports offered in the admin Reports tab.
+
+    Each method writes one text report for a date range into report_dir
+    and returns the file name. Kept free of any UI code so the reports can
+    also be produced from scripts and benchmarks.
+    """
+
+    def __init__(self, service, auth_manager, report_dir="reports"):
+        self.service = service
+        self.auth_manager = auth_manager
+        self.report_dir = report_dir
+
+    def report_path(self, name):
+        if not os.path.exists(self.report_dir):
+            os.makedirs(self.report_dir)
+        return os.path.join(self.report_dir, name)
+
+    @traced('report.user', 'service')
+    @timed(REPORT_SECONDS, report='user')
+    def user_report(self, start, end):
+        """Generate user activity report"""
+        filename = self.report_path(f"user_activity_{start}_{end}.txt")
+
+        with open(filename, 'w') as f:
+            f.write(f"User Activity Report ({start} to {end})\n")
+            f.write("="*50 + "\n\n")
+
+            users = self.auth_manager.get_all_users()
+
+            for user in users:
+                username = user[0]
+                f.write(f"\nUser: {username}\n")
+                f.write("-"*20 + "\n")
+
+                self.service.db.cursor.execute('''
+                    SELECT COUNT(*), SUM(amount)
+                    FROM transactions
+                    WHERE date BETWEEN ? AND ?
+                    AND created_by = ?
+                ''', (start, end, username))
+
+                count, total = self.service.db.cursor.fetchone()
+                count = count or 0
+                total = total or 0
+
+                f.write(f"Total Transactions: {count}\n")
+                f.write(f"Total Amount: M{total:.2f}\n")
+
+                self.service.db.cursor.execute('''
+                    SELECT service, COUNT(*)
+                    FROM transactions
+                    WHERE date BETWEEN ? AND ?
+                    AND created_by = ?
+                    GROUP BY service
+                ''', (start, end, username))
+
+                f.write("\nService Breakdown:\n")
+                for service, service_count in self.service.db.cursor.fetchall():
+                    f.write(f"{service}: {service_count}\n")
+
+        return filename
+
+    @traced('report.jobs', 'service')
+    @timed(REPORT_SECONDS, report='jobs')
+    def jobs_report(self, start, end):
+        """Generate print jobs report"""
+        filename = self.report_path(f"print_jobs_{start}_{end}.txt")
+
+        with open(filename, 'w') as f:
+            f.write(f"Print Jobs Report ({start} to {end})\n")
+            f.write("="*50 + "\n\n")
+
+            self.service.db.cursor.execute('''
+                SELECT COUNT(*), SUM(amount), SUM(papers_used)
+                FROM transactions
+                WHERE date BETWEEN ? AND ?
+            ''', (start, end))
+
+            count, total, papers = self.service.db.cursor.fetchone()
+            count = count or 0
+            total = total or 0
+            papers = papers or 0
+
+            f.write("Overall Summary:\n")
+            f.write(f"Total Jobs: {count}\n")
+            f.write(f"Total Revenue: M{total:.2f}\n")
+            f.write(f"Total Papers Used: {papers}\n\n")
+
+            f.write("Service Breakdown:\n")
+            f.write("-"*20 + "\n")
+
+            self.service.db.cursor.execute('''
+                SELECT service,
+                       COUNT(*) as job_count,
+                       SUM(amount) as total_amount,
+                       SUM(papers_used) as total_papers
+                FROM transactions
+                WHERE date BETWEEN ? AND ?
+                GROUP BY service
+            ''', (start, end))
+
+            for service, job_count, service_total, service_papers in self.service.db.cursor.fetchall():
+                f.write(f"\nService: {service}\n")
+                f.write(f"Number of Jobs: {job_count}\n")
+                f.write(f"Total Revenue: M{service_total:.2f}\n")
+                f.write(f"Papers Used: {service_papers or 0}\n")
+
+        return filename
+
+    @traced('report.stock', 'service')
+    @timed(REPORT_SECONDS, report='stock')
+    def stock_report(self, start, end):
+        """Generate stock usage report"""
+        filename = self.report_path(f"stock_usage_{start}_{end}.txt")
+
+        with open(filename, 'w') as f:
+            f.write(f"Stock Usage Report ({start} to {end})\n")
+            f.write("="*50 + "\n\n")
+
+            current_stock = self.service.inventory_model.get_stock()
+
+            f.write("Current Stock Levels:\n")
+            f.write("-"*20 + "\n")
+
+            if 'paper' in current_stock:
+                paper = current_stock['paper']
+                f.write(f"Paper: {paper['boxes']} boxes, {paper['rims']} rims, {paper['sheets']} sheets\n")
+                f.write(f"Total Sheets: {paper['total_sheets']}\n")
+
+            for item in ['file', 'envelope']:
+                if item in current_stock:
+                    f.write(f"{item.capitalize()}: {current_stock[item]['quantity']} units\n")
+
+            f.write("\nUsage Statistics:\n")
+            f.write("-"*20 + "\n")
+
+            self.service.db.cursor.execute('''
+                SELECT SUM(papers_used)
+                FROM transactions
+                WHERE date BETWEEN ? AND ?
+            ''', (start, end))
+
+            total_papers = self.service.db.cursor.fetchone()[0] or 0
+            f.write(f"\nTotal Papers Used: {total_papers} sheets\n")
+
+            for item in ['File', 'Envelope']:
+                self.service.db.cursor.execute('''
+                    SELECT COUNT(*)
+                    FROM transactions
+                    WHERE date BETWEEN ? AND ?
+                    AND service = ?
+                ''', (start, end, item))
+
+                count = self.service.db.cursor.fetchone()[0] or 0
+                f.write(f"{item}s Used: {count} units\n")
+
+            f.write("\nStock Additions:\n")
+            f.write("-"*20 + "\n")
+
+            self.service.db.cursor.execute('''
+                SELECT date, quantity_added
+                FROM paper_stock_log
+                WHERE date BETWEEN ? AND ?
+                ORDER BY date
+            ''', (start, end))
+
+            for date, quantity in self.service.db.cursor.fetchall():
+                f.write(f"{date}: Added {quantity} sheets\n")
+
+        return filename
+
+    @traced('report.performance', 'service')
+    @timed(REPORT_SECONDS, report='performance')
+    def performance_report(self, start, end):
+        """Generate system performance report"""
+        filename = self.report_path(f"performance_{start}_{end}.txt")
+
+        with open(filename, 'w') as f:
+            f.write(f"System Performance Report ({start} to {end})\n")
+            f.write("="*50 + "\n\n")
+
+            f.write("Daily Transaction Statistics:\n")
+            f.write("-"*20 + "\n")
+
+            self.service.db.cursor.execute('''
+                SELECT date,
+                    COUNT(*) as transaction_count,
+                    SUM(amount) as daily_revenue,
+                    COUNT(DISTINCT created_by) as active_users
+                FROM transactions
+                WHERE date BETWEEN ? AND ?
+                GROUP BY date
+                ORDER BY date
+            ''', (start, end))
+
+            total_days = 0
+            total_transactions = 0
+            total_revenue = 0
+
+            for date, count, revenue, users in self.service.db.cursor.fetchall():
+                f.write(f"\nDate: {date}\n")
+                f.write(f"Transactions: {count}\n")
+                f.write(f"Revenue: M{revenue:.2f}\n")
+
+                total_days += 1
+                total_transactions += count
+                total_revenue += revenue
+
+            if total_days > 0:
+                f.write("\nAverages:\n")
+                f.write(f"Daily Transactions: {total_transactions/total_days:.1f}\n")
+                f.write(f"Daily Revenue: M{total_revenue/total_days:.2f}\n")
+
+            f.write("\nPeak Usage Hours:\n")
+            f.write("-"*20 + "\n")
+
+            self.service.db.cursor.execute('''
+                SELECT strftime('%H', timestamp) as hour,
+                    COUNT(*) as transaction_count
+                FROM transactions
+                WHERE date BETWEEN ? AND ?
+                GROUP BY hour
+                ORDER BY transaction_count DESC
+                LIMIT 5
+            ''', (start, end))
+
+            for hour, count in self.service.db.cursor.fetchall():
+                f.write(f"{hour}:00 - {count} transactions\n")
+
+            f.write("\nService Popularity:\n")
+            f.write("-"*20 + "\n")
+
+            self.service.db.cursor.execute('''
+                SELECT service,
+                    COUNT(*) as usage_count,
+                    SUM(amount) as total_revenue
+                FROM transactions
+                WHERE date BETWEEN ? AND ?
+                GROUP BY service
+                ORDER BY usage_count DESC
+            ''', (start, end))
+
+            for service, count, revenue in self.service.db.cursor.fetchall():
+                f.write(f"{service}:\n")
+                f.write(f"Usage Count: {count}\n")
+                f.write(f"Revenue: M{revenue:.2f}\n")
+
+            f.write("\nSystem Health:\n")
+            f.write("-"*20 + "\n")
+
+            db_size = os.path.getsize(self.service.db.db_name) / (1024 * 1024)
+            f.write(f"Database Size: {db_size:.2f} MB\n")
+
+            try:
+                if hasattr(os, 'statvfs'):
+                    stat = os.statvfs('/')
+                    free = (stat.f_bavail * stat.f_frsize) / (1024 * 1024 * 1024)
+                    total = (stat.f_blocks * stat.f_frsize) / (1024 * 1024 * 1024)
+                    used_percent = ((total - free) / total) * 100
+                else:
+                    import ctypes
+                    free_bytes = ctypes.c_ulonglong(0)
+                    total_bytes = ctypes.c_ulonglong(0)
+                    ctypes.windll.kernel32.GetDiskFreeSpaceExW(
+                        ctypes.c_wchar_p('.'), None, ctypes.pointer(total_bytes),
+                        ctypes.pointer(free_bytes)
+                    )
+                    total = total_bytes.value / (1024 * 1024 * 1024)
+                    free = free_bytes.value / (1024 * 1024 * 1024)
+                    used_percent = ((total - free) / total) * 100
+
+                f.write(f"Disk Space Used: {used_percent:.1f}%\n")
+                f.write(f"Free Space: {free:.1f} GB\n")
+            except Exception as disk_error:
+                f.write(f"Disk Space Check Error: {str(disk_error)}\n")
+
+            low_stock_items = []
+            stock = self.service.inventory_model.get_stock()
+
+            if 'paper' in stock and stock['paper']['total_sheets'] < self.service.stock_thresholds['paper']:
+                low_stock_items.append('Paper')
+            if 'file' in stock and stock['file']['quantity'] < self.service.stock_thresholds['file']:
+                low_stock_items.append('Files')
+            if 'envelope' in stock and stock['envelope']['quantity'] < self.service.stock_thresholds['envelope']:
+                low_stock_items.append('Envelopes')
+
+            if low_stock_items:
+                f.write("\nLow Stock Warnings:\n")
+                for item in low_stock_items:
+                    f.write(f"- {item}\n")
+
+        return filename
+
+    @traced('report.branches', 'service')
+    @timed(REPORT_SECONDS, report='branches')
+    def branches_report(self, branch_hub, start, end):
+        """Generate a report combining every branch registered with branch_hub"""
+        filename = self.report_path(f"branches_{start}_{end}.txt")
+        combined = branch_hub.combined_summary(start, end)
+
+        with open(filename, 'w') as f:
+            f.write(f"Combined Branches Report ({start} to {end})\n")
+            f.write("="*50 + "\n\n")
+
+            f.write("All Branches:\n")
+            f.write(f"Total Jobs: {combined['transactions']}\n")
+            f.write(f"Total Revenue: M{combined['revenue']:.2f}\n")
+            f.write(f"Total Papers Used: {combined['papers_used']}\n")
+            f.write(f"Total Expenses: M{combined['total_expenses']:.2f}\n")
+            f.write(f"Balance: M{combined['balance']:.2f}\n\n")
+
+            f.write("Per Branch:\n")
+            f.write("-"*20 + "\n")
+            for name, summary in combined['branches'].items():
+                if 'error' in summary:
+                    f.write(f"{name}: unavailable ({summary['error']})\n")
+                    continue
+                f.write(f"{name}: {summary['transactions']} jobs, M{summary['revenue']:.2f} revenue, "
+                        f"M{summary['total_expenses']:.2f} expenses\n")
+
+            f.write("\nService Breakdown:\n")
+            f.write("-"*20 + "\n")
+            for service, (count, revenue, papers) in sorted(combined['services'].items()):
+                f.write(f"{service}: {count} jobs, M{revenue:.2f}, {papers} papers\n")
+
+            f.write("\nUser Activity:\n")
+            f.write("-"*20 + "\n")
+            for user, (count, revenue) in sorted(combined['users'].items(), key=lambda item: -item[1][1]):
+                f.write(f"{user}: {count} transactions, M{revenue:.2f}\n")
+
+            f.write("\nPeak Usage Hours:\n")
+            f.write("-"*20 + "\n")
+            for hour, count in sorted(combined['hours'].items(), key=lambda item: -item[1])[:5]:
+                f.write(f"{hour}:00 - {count} transactions\n")
+
+            f.write("\nExpenses:\n")
+            f.write("-"*20 + "\n")
+            for category, amount in sorted(combined['expenses'].items()):
+                f.write(f"{category}: M{amount:.2f}\n")
+
+            f.write("\nCurrent Stock (all branches):\n")
+            f.write("-"*20 + "\n")
+            for item, quantity in sorted(combined['stock'].items()):
+                f.write(f"{item.capitalize()}: {quantity}\n")
+
+        return filename
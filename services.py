@@ -1,15 +1,41 @@
 import csv
+import json
 import os
-from datetime import datetime
+import sqlite3
+import time
+import uuid
 
+from activity import RecentActivity
+from changefeed import ChangeFeed
+from history import HistoryQuery
+from metrics import (EXPENSES, REPORT_SECONDS, SALE_FAILURES, observe_sale, set_stock,
+                     set_stock_thresholds, timed, watch_database)
 from models import Expense, Inventory, Transaction
+from tracing import traced
+
+class StockError(Exception):
+    """Raised when a sale needs more stock than is available"""
+    def __init__(self, item):
+        self.item = item
+        names = {'paper': 'paper', 'file': 'files', 'envelope': 'envelopes'}
+        super().__init__(f"Not enough {names.get(item, item)} in stock!")
+
 class PrintShopService:
-    def __init__(self, db_manager, current_user=None):
+    def __init__(self, db_manager, current_user=None, recent_activity=None):
         self.db = db_manager
         self.transaction_model = Transaction(db_manager)
         self.inventory_model = Inventory(db_manager)
         self.expense_model = Expense(db_manager)
+        self.history = HistoryQuery(db_manager)
         self.current_user = current_user
+        self.clock = db_manager.clock
+        self.sync_worker = None
+        self.event_bus = None
+        
+        if recent_activity is None:
+            recent_activity = RecentActivity(clock=db_manager.clock)
+            recent_activity.seed(db_manager)
+        self.recent_activity = recent_activity
         
         self.prices = {
             "Photocopy": 2.00,
@@ -20,36 +46,218 @@ class PrintShopService:
             "Envelope": 3.00
         }
         
+        self.stock_items = {
+            "File": "file",
+            "Envelope": "envelope"
+        }
+        
+        self.expense_categories = ['Mottakase', 'Pampiri', 'INK/Cardrige', 'Drawings']
+        
         self.stock_thresholds = {
             "paper": 50,
             "file": 20,
             "envelope": 20
         }
+        
+        set_stock_thresholds(self.stock_thresholds)
+        set_stock(self.inventory_model.get_quantities())
+        watch_database(db_manager.db_name)
 
     def set_current_user(self, user):
         """Set the current user for the service"""
         self.current_user = user
 
+    @traced('service.process_transaction', 'service')
     def process_transaction(self, service, quantity, papers_per_item=0):
         """Process a new transaction"""
-        amount = quantity * self.prices[service]
-        total_papers = quantity * papers_per_item if papers_per_item > 0 else 0
+        result = self.process_sale([(service, quantity, papers_per_item)])
+        result['sale'] = result['lines'][0]
+        return result
+
+    def stock_needed(self, lines):
+        """Return the stock each item would lose if lines were sold"""
+        needed = {}
+        for service, quantity, papers_per_item in lines:
+            item = self.stock_items.get(service)
+            if item:
+                needed[item] = needed.get(item, 0) + quantity
+            if papers_per_item > 0:
+                needed['paper'] = needed.get('paper', 0) + quantity * papers_per_item
+        return needed
+
+    @traced('service.process_sale', 'service')
+    def process_sale(self, lines, request_key=None):
+        """Process a multi-line sale as one atomic transaction
+
+        lines: [(service, quantity, papers_per_item), ...]
+        The write lock is taken before stock is validated, so concurrent
+        sales from other connections cannot interleave; every transaction row
+        and stock change is committed together under one shared sale id, or
+        not at all.
+        request_key: optional idempotency key; retrying a sale with the same
+        key returns the original result instead of selling twice.
+        """
+        started = time.perf_counter()
+        if request_key:
+            stored = self.get_stored_sale(request_key)
+            if stored:
+                return stored
+        
+        lines = [(line[0], line[1], line[2] if len(line) > 2 else 0) for line in lines]
+        if not lines:
+            raise ValueError("A sale needs at least one line")
+        for service, quantity, papers_per_item in lines:
+            if service not in self.prices:
+                raise ValueError(f"Unknown service: {service}")
+            if quantity <= 0 or papers_per_item < 0:
+                raise ValueError("Please enter valid positive numbers")
         
-        if service == "File":
-            self.inventory_model.update_stock('file', -quantity)
-        elif service == "Envelope":
-            self.inventory_model.update_stock('envelope', -quantity)
+        needed = self.stock_needed(lines)
+        sale_id = uuid.uuid4().hex
+        username = self.current_user.username if self.current_user else None
+        rows = []
         
-        if total_papers > 0:
-            self.inventory_model.update_stock('paper', -total_papers)
+        if not self.db.conn.in_transaction:
+            self.db.cursor.execute('BEGIN IMMEDIATE')
+        try:
+            stock = self.inventory_model.get_quantities()
+            for item, quantity in needed.items():
+                if quantity > stock.get(item, 0):
+                    raise StockError(item)
+            
+            for item, quantity in needed.items():
+                if not self.inventory_model.update_stock(item, -quantity, commit=False):
+                    raise sqlite3.Error(f"Failed to update {item} stock")
+            
+            for service, quantity, papers_per_item in lines:
+                amount = quantity * self.prices[service]
+                total_papers = quantity * papers_per_item if papers_per_item > 0 else 0
+                rows.append(self.transaction_model.add_transaction(
+                    service, quantity, amount, total_papers,
+                    created_by=username, sale_id=sale_id, commit=False
+                ))
+            
+            result = {
+                'sale_id': sale_id,
+                'lines': rows,
+                'amount': sum(row['amount'] for row in rows),
+                'papers_used': sum(row['papers_used'] for row in rows),
+                'stock': self.inventory_model.get_quantities()
+            }
+            
+            if request_key:
+                self.db.cursor.execute('''
+                    INSERT INTO idempotency_keys (key, response, created_at)
+                    VALUES (?, ?, ?)
+                ''', (request_key, json.dumps(result), self.db.clock.now().strftime('%Y-%m-%d %H:%M:%S')))
+            
+            self.db.conn.commit()
+        except sqlite3.IntegrityError:
+            self.db.conn.rollback()
+            stored = self.get_stored_sale(request_key) if request_key else None
+            if stored:
+                return stored
+            SALE_FAILURES.inc(reason='integrity')
+            raise
+        except Exception as e:
+            self.db.conn.rollback()
+            SALE_FAILURES.inc(reason='stock' if isinstance(e, StockError) else 'error')
+            raise
+        
+        observe_sale(result, time.perf_counter() - started)
+        for row in rows:
+            self.recent_activity.record_sale(row)
+        if self.sync_worker:
+            self.sync_worker.notify()
+        
+        return result
+
+    def get_stored_sale(self, request_key):
+        """Return the result recorded for an idempotency key, if any"""
+        self.db.cursor.execute(
+            'SELECT response FROM idempotency_keys WHERE key = ?', (request_key,)
+        )
+        row = self.db.cursor.fetchone()
+        return json.loads(row[0]) if row else None
+
+    @traced('service.record_expense', 'service')
+    def record_expense(self, category, amount, description):
+        """Record an expense for the current user"""
+        if category not in self.expense_categories:
+            raise ValueError(f"Unknown expense category: {category}")
+        if amount <= 0:
+            raise ValueError("Amount must be positive")
         
         username = self.current_user.username if self.current_user else None
-        self.transaction_model.add_transaction(service, quantity, amount, total_papers, created_by=username)
+        self.expense_model.add_expense(category, amount, description, created_by=username)
+        EXPENSES.inc()
+        if self.sync_worker:
+            self.sync_worker.notify()
+
+    @traced('service.get_daily_records', 'service')
+    def get_daily_records(self, limit=30):
+        """Get the most recent end-of-day records"""
+        self.db.cursor.execute('''
+            SELECT * FROM daily_records 
+            ORDER BY date DESC 
+            LIMIT ?
+        ''', (limit,))
+        return self.db.cursor.fetchall()
+
+    @traced('service.get_period_summary', 'service')
+    def get_period_summary(self, start, end):
+        """Get totals and a per-service breakdown for a date range"""
+        self.db.cursor.execute('''
+            SELECT service, COUNT(*), SUM(amount), SUM(papers_used)
+            FROM transactions
+            WHERE date BETWEEN ? AND ?
+            GROUP BY service
+        ''', (start, end))
+        
+        services = {}
+        for service, count, amount, papers in self.db.cursor.fetchall():
+            services[service] = {
+                'count': count,
+                'amount': amount or 0,
+                'papers_used': papers or 0
+            }
         
-        return amount, total_papers
+        self.db.cursor.execute('''
+            SELECT category, SUM(amount)
+            FROM expenses
+            WHERE date BETWEEN ? AND ?
+            GROUP BY category
+        ''', (start, end))
+        expenses = dict(self.db.cursor.fetchall())
+        
+        revenue = sum(data['amount'] for data in services.values())
+        total_expenses = sum(expenses.values())
+        return {
+            'start': start,
+            'end': end,
+            'transactions': sum(data['count'] for data in services.values()),
+            'revenue': revenue,
+            'papers_used': sum(data['papers_used'] for data in services.values()),
+            'services': services,
+            'expenses': expenses,
+            'total_expenses': total_expenses,
+            'balance': revenue - total_expenses
+        }
+
+    @traced('service.fetch_history_page', 'service')
+    def fetch_history_page(self, source, filters=None, after=None, before=None, limit=None, offset=None):
+        """Get one keyset page of history rows, see HistoryQuery.fetch_page"""
+        return self.history.fetch_page(source, filters, after, before, limit, offset)
+
+    @traced('service.count_history', 'service')
+    def count_history(self, source, filters=None):
+        """Count the history rows matching filters, to size the history scrollbar"""
+        return self.history.count(source, filters)
+
+    @traced('service.get_daily_summary', 'service')
     def get_daily_summary(self):
             """Get summary of today's transactions"""
-            today = datetime.now().strftime('%Y-%m-%d')
+            today = self.db.clock.now().strftime('%Y-%m-%d')
             
             self.db.cursor.execute('''
                 SELECT SUM(amount), SUM(papers_used)
@@ -61,29 +269,32 @@ class PrintShopService:
             total_amount, total_papers = result if result else (0, 0)
             return total_amount or 0, total_papers or 0
 
+    @traced('service.get_service_summary', 'service')
     def get_service_summary(self):
         """Get summary of services for today"""
-        today = datetime.now().strftime('%Y-%m-%d')
-        summary = {}
+        today = self.db.clock.now().strftime('%Y-%m-%d')
+        summary = {service: {'count': 0, 'amount': 0} for service in self.prices.keys()}
         
-        for service in self.prices.keys():
-            self.db.cursor.execute('''
-                SELECT COUNT(*), SUM(amount) 
-                FROM transactions 
-                WHERE date = ? AND service = ?
-            ''', (today, service))
-            
-            count, total = self.db.cursor.fetchone()
-            summary[service] = {
-                'count': count or 0,
-                'amount': total or 0
-            }
+        self.db.cursor.execute('''
+            SELECT service, COUNT(*), SUM(amount) 
+            FROM transactions 
+            WHERE date = ?
+            GROUP BY service
+        ''', (today,))
+        
+        for service, count, total in self.db.cursor.fetchall():
+            if service in summary:
+                summary[service] = {
+                    'count': count or 0,
+                    'amount': total or 0
+                }
         
         return summary
 
+    @traced('service.end_day', 'service')
     def end_day(self):
         """Process end of day operations"""
-        today = datetime.now().strftime('%Y-%m-%d')
+        today = self.db.clock.now().strftime('%Y-%m-%d')
         
         self.db.cursor.execute('''
             SELECT category, SUM(amount) 
@@ -111,10 +322,22 @@ class PrintShopService:
               total_expenses, balance,
               papers_used))
         
+        self.db.record_event('end_of_day', {
+            'date': today,
+            'daily_income': daily_income,
+            'expenses': expenses_dict,
+            'total_expenses': total_expenses,
+            'balance': balance,
+            'papers_used': papers_used
+        })
+        
         self.db.conn.commit()
+        ChangeFeed(self.db).prune()
         
         self.generate_daily_report(today)
 
+    @traced('service.generate_daily_report', 'service')
+    @timed(REPORT_SECONDS, report='daily')
     def generate_daily_report(self, date):
         """Generate detailed end of day report"""
         report_dir = "reports"
@@ -150,20 +373,22 @@ class PrintShopService:
             for category, amount, description in self.db.cursor.fetchall():
                 f.write(f"{category}: M{amount:.2f} - {description}\n")
 
+    @traced('service.export_data', 'service')
+    @timed(REPORT_SECONDS, report='export')
     def export_data(self):
         """Export data to CSV files"""
         export_dir = "exports"
         if not os.path.exists(export_dir):
             os.makedirs(export_dir)
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        timestamp = self.db.clock.now().strftime('%Y%m%d_%H%M%S')
         
         with open(os.path.join(export_dir, f'transactions_{timestamp}.csv'), 'w', newline='') as f:
             writer = csv.writer(f)
-            writer.writerow(['Date', 'Service', 'Quantity', 'Amount', 'Papers Used', 'Timestamp'])
+            writer.writerow(['Date', 'Service', 'Quantity', 'Amount', 'Papers Used', 'Timestamp', 'Sale ID'])
             
             self.db.cursor.execute('''
-                SELECT date, service, quantity, amount, papers_used, timestamp 
+                SELECT date, service, quantity, amount, papers_used, timestamp, sale_id 
                 FROM transactions
             ''')
             writer.writerows(self.db.cursor.fetchall())
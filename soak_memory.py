@@ -0,0 +1,178 @@
+"""Memory soak test: thousands of sales and refreshes, memory must stay bounded.
+
+Runs rounds of sales, expenses and the refreshes the cashier and admin
+screens do (daily and service summaries, recent activity, history page,
+dashboard build, activity series, reports, end of day), against a fresh
+database on a ManualClock that moves a few minutes per sale; the shop
+closes at 18:00 with an end of day, so days roll over. A MemoryMonitor
+checks after every round; the check after the warm-up rounds is the
+baseline. The run fails (exit 1) if traced memory
+ends more than --budget-mb above the baseline, if it grew more than
+--slope-mb over the second half of the run, or, with --ui, if the
+cashier window's widget or Toplevel count grew.
+
+    python soak_memory.py --rounds 200 --sales 50
+    python soak_memory.py --ui --rounds 50      # needs a display
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from auth import AuthManager, User
+from clock import ManualClock
+from memmonitor import TRACE_FRAMES, MemoryMonitor
+from models import DatabaseManager
+from reports import ReportWriter
+from services import PrintShopService
+from timeseries import TimeSeriesProvider, downsample_lttb
+from webdash import DashboardCache, dashboard_version
+
+SERVICES = ("Photocopy", "Printing", "Scanning", "Lamination", "File", "Envelope")
+PAPER_SERVICES = ("Photocopy", "Printing")
+REPORTS = ('user', 'jobs', 'stock', 'performance')
+ACTIVITY_CHART_MAX_POINTS = 120
+OPENING_HOUR = 8
+CLOSING_HOUR = 18
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check memory stays bounded over many sales and refreshes")
+    parser.add_argument('--rounds', type=int, default=100)
+    parser.add_argument('--sales', type=int, default=50, help="sales per round")
+    parser.add_argument('--warmup', type=int, default=12,
+                        help="rounds before the baseline check, enough to fill the recent-activity buffer")
+    parser.add_argument('--budget-mb', type=float, default=10)
+    parser.add_argument('--slope-mb', type=float, default=2)
+    parser.add_argument('--report-every', type=int, default=10, help="rounds between report runs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ui', action='store_true', help="also drive the cashier window (needs a display)")
+    return parser.parse_args()
+
+def build_ui(service, auth):
+    import tkinter as tk
+    from ui import PrintShopUI
+
+    root = tk.Tk()
+    root.withdraw()
+    return root, PrintShopUI(root, service, auth)
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='soak_')
+    os.chdir(workdir)
+    try:
+        return run(args)
+    finally:
+        os.chdir(os.path.dirname(workdir))
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def run(args):
+    rng = random.Random(args.seed)
+    clock = ManualClock(datetime.now().replace(hour=OPENING_HOUR, minute=0, second=0, microsecond=0))
+    db = DatabaseManager('soak.db', clock=clock)
+    auth = AuthManager(db)
+    user = User('cashier01', 'user', 'Cashier 01')
+    auth.current_user = user
+    service = PrintShopService(db, user)
+    writer = ReportWriter(service, auth)
+    timeseries = TimeSeriesProvider(db)
+    dashboard = SimpleNamespace(db=db, service=service, timeseries=timeseries)
+    dashboard_cache = DashboardCache()
+
+    root = app = None
+    if args.ui:
+        root, app = build_ui(service, auth)
+
+    monitor = MemoryMonitor(root, budget_mb=args.budget_mb)
+    tracemalloc.start(TRACE_FRAMES)
+
+    def restock():
+        for item, quantity in (('paper', 100000), ('file', 2000), ('envelope', 2000)):
+            service.inventory_model.add_stock(item, quantity)
+
+    def close_day_if_late():
+        now = clock.now()
+        if now.hour < CLOSING_HOUR:
+            return
+        clock.set(now.replace(hour=CLOSING_HOUR, minute=30, second=0))
+        service.end_day()
+        clock.set(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()).replace(hour=OPENING_HOUR))
+        restock()
+
+    def refresh():
+        service.get_daily_summary()
+        service.get_service_summary()
+        service.recent_activity.recent(10)
+        service.recent_activity.sales_per_minute()
+        service.fetch_history_page('transactions')
+        dashboard_cache.build(dashboard, dashboard_version(db))
+        for range_key in TimeSeriesProvider.RANGES:
+            series = timeseries.get_range_series(range_key)
+            downsample_lttb([(i, value) for i, (_, value) in enumerate(series)], ACTIVITY_CHART_MAX_POINTS)
+        if app is not None:
+            app.update_displays()
+            root.update()
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    samples = []
+    try:
+        restock()
+        for round_number in range(args.warmup + args.rounds):
+            for _ in range(args.sales):
+                close_day_if_late()
+                name = rng.choice(SERVICES)
+                result = service.process_transaction(name, rng.randint(1, 5), 1 if name in PAPER_SERVICES else 0)
+                if app is not None:
+                    app.apply_sale(result)
+                    root.update()
+                if rng.random() < 0.02:
+                    service.record_expense(rng.choice(service.expense_categories), rng.randint(5, 50), 'soak')
+                clock.advance(minutes=rng.randint(1, 5))
+            refresh()
+            if round_number % args.report_every == 0:
+                today = str(clock.now().date())
+                for report in REPORTS:
+                    getattr(writer, f"{report}_report")(today, today)
+            if round_number >= args.warmup - 1:
+                samples.append(monitor.check())
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"{'round':>6} {'traced MB':>10} {'growth MB':>10} {'widgets':>8} {'toplevels':>9} {'rows':>6}")
+    step = max(1, len(samples) // 20)
+    for index, sample in list(enumerate(samples))[::step] + [(len(samples) - 1, samples[-1])]:
+        print(f"{index:6d} {sample['traced'] / 1048576:10.2f} {sample['growth'] / 1048576:10.2f} "
+              f"{sample['widgets']:8d} {sample['toplevels']:9d} {sample['treeview_rows']:6d}")
+
+    baseline, middle, final = samples[0], samples[len(samples) // 2], samples[-1]
+    failures = []
+    if final['growth'] > args.budget_mb * 1048576:
+        failures.append(f"traced memory grew {final['growth'] / 1048576:.2f} MB, budget {args.budget_mb} MB")
+    if final['traced'] - middle['traced'] > args.slope_mb * 1048576:
+        failures.append(f"traced memory grew {(final['traced'] - middle['traced']) / 1048576:.2f} MB "
+                        f"over the second half, limit {args.slope_mb} MB")
+    if args.ui:
+        for key in ('widgets', 'toplevels'):
+            if final[key] > baseline[key]:
+                failures.append(f"{key} grew from {baseline[key]} to {final[key]}")
+
+    total_sales = (args.warmup + args.rounds) * args.sales
+    print(f"\n{total_sales} sales, {args.warmup + args.rounds} refresh rounds")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        print("Top allocation sites since baseline:")
+        for size_diff, count_diff, site in monitor.top_sites():
+            print(f"  {size_diff / 1024:+10.1f} KiB {count_diff:+8d} blocks  {site}")
+        return 1
+    print("OK: memory stayed within budget")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
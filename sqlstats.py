@@ -0,0 +1,269 @@
+"""Per-query timing for every statement run through a DatabaseManager.
+
+DatabaseManager wraps its cursor in an InstrumentedCursor, which files
+each statement under a normalized fingerprint (literals and IN lists
+replaced by ?), so the same query with different values is counted
+together. For each fingerprint QUERY_STATS keeps the call count, rows
+returned or changed, total and maximum time and a latency histogram. The
+time includes fetching the rows, not just the execute call, and commits
+(including those made by `with conn:`) are timed too, under the
+fingerprint COMMIT. Statements slower than a
+threshold can also be appended to a slow-query log file.
+"""
+import bisect
+import re
+import sqlite3
+import threading
+import time
+
+from tracing import TRACER
+
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+FINGERPRINT_CACHE_SIZE = 4096
+
+_COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+def fingerprint(sql):
+    """Normalize a statement so the same query with different values compares equal"""
+    sql = _COMMENT.sub(' ', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    return _IN_LIST.sub('(...)', sql)
+
+class QueryStats:
+    """Thread-safe per-fingerprint counters shared by every connection in the process"""
+
+    def __init__(self):
+        self.slow_log_path = None
+        self.slow_threshold_ms = 250.0
+        self._queries = {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def set_slow_log(self, path, threshold_ms=None):
+        """Append statements slower than threshold_ms to path; path None turns the log off"""
+        self.slow_log_path = path
+        if threshold_ms is not None:
+            self.slow_threshold_ms = threshold_ms
+
+    def fingerprint(self, sql):
+        result = self._fingerprints.get(sql)
+        if result is None:
+            result = fingerprint(sql)
+            if len(self._fingerprints) >= FINGERPRINT_CACHE_SIZE:
+                self._fingerprints.clear()
+            self._fingerprints[sql] = result
+        return result
+
+    def record(self, query, seconds, rows):
+        elapsed_ms = seconds * 1000
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+
+        with self._lock:
+            entry = self._queries.get(query)
+            if entry is None:
+                entry = self._queries[query] = {
+                    'calls': 0,
+                    'rows': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'histogram': [0] * len(LATENCY_BUCKETS_MS)
+                }
+            entry['calls'] += 1
+            entry['rows'] += rows
+            entry['total_ms'] += elapsed_ms
+            if elapsed_ms > entry['max_ms']:
+                entry['max_ms'] = elapsed_ms
+            entry['histogram'][bucket] += 1
+
+        if self.slow_log_path and elapsed_ms >= self.slow_threshold_ms:
+            self.log_slow(query, elapsed_ms, rows)
+
+    def extend(self, query, before, seconds, rows_before, rows):
+        """Move the last recorded call of query from (before, rows_before) to (seconds, rows)
+
+        Used when rows are fetched after the statement was recorded: the
+        call count stays the same while its time, rows and histogram
+        bucket are brought up to date.
+        """
+        before_ms = before * 1000
+        elapsed_ms = seconds * 1000
+        old_bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, before_ms)
+        new_bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+
+        with self._lock:
+            entry = self._queries.get(query)
+            if entry is None:
+                return
+            entry['rows'] += rows - rows_before
+            entry['total_ms'] += elapsed_ms - before_ms
+            if elapsed_ms > entry['max_ms']:
+                entry['max_ms'] = elapsed_ms
+            if old_bucket != new_bucket and entry['histogram'][old_bucket]:
+                entry['histogram'][old_bucket] -= 1
+                entry['histogram'][new_bucket] += 1
+
+        if self.slow_log_path and before_ms < self.slow_threshold_ms <= elapsed_ms:
+            self.log_slow(query, elapsed_ms, rows)
+
+    def log_slow(self, query, elapsed_ms, rows):
+        line = f"{time.strftime('%Y-%m-%d %H:%M:%S')} | {elapsed_ms:9.1f} ms | {rows:8d} rows | {query}\n"
+        try:
+            with self._log_lock, open(self.slow_log_path, 'a') as f:
+                f.write(line)
+        except OSError:
+            pass
+
+    def snapshot(self):
+        """Return one dict per fingerprint with its counters and estimated percentiles"""
+        with self._lock:
+            queries = [(query, dict(entry, histogram=list(entry['histogram']))) for query, entry in self._queries.items()]
+
+        result = []
+        for query, entry in queries:
+            entry['query'] = query
+            entry['mean_ms'] = entry['total_ms'] / entry['calls']
+            entry['p50_ms'] = self.histogram_percentile(entry, 50)
+            entry['p95_ms'] = self.histogram_percentile(entry, 95)
+            result.append(entry)
+        return result
+
+    def histogram_percentile(self, entry, pct):
+        """Upper bound of the histogram bucket holding the pct-th percentile, capped at the max"""
+        target = entry['calls'] * pct / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, entry['histogram']):
+            seen += count
+            if seen >= target:
+                return min(bound, entry['max_ms'])
+        return entry['max_ms']
+
+    def top(self, limit=10, key='total_ms'):
+        """Return the worst offenders by key: total_ms, max_ms, mean_ms, p95_ms, calls or rows"""
+        return sorted(self.snapshot(), key=lambda entry: entry[key], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+
+QUERY_STATS = QueryStats()
+
+class InstrumentedCursor:
+    """sqlite3 cursor wrapper that times each statement, including its fetches.
+
+    A statement is recorded as soon as execute() returns; each fetch that
+    follows adds its time and rows to that same call. Everything else is
+    passed through to the wrapped cursor.
+    """
+
+    def __init__(self, cursor, stats=None):
+        self._cursor = cursor
+        self._stats = stats or QUERY_STATS
+        self._current = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def flush(self):
+        """Stop adding fetches to the last statement"""
+        self._current = None
+
+    def _run(self, method, sql, *args):
+        self._current = None
+        started = time.perf_counter()
+        try:
+            method(sql, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            rowcount = self._cursor.rowcount
+            rows = rowcount if rowcount > 0 else 0
+            query = self._stats.fingerprint(sql)
+            self._stats.record(query, elapsed, rows)
+            event = None
+            if TRACER.enabled:
+                event = TRACER.add(query[:60], 'sql', started, elapsed, {'sql': query, 'rows': rows})
+            self._current = [query, elapsed, rows, event]
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._run(self._cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(self._cursor.executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql):
+        return self._run(self._cursor.executescript, sql)
+
+    def _fetched(self, started, rows):
+        if self._current is None:
+            return
+        query, before, rows_before, event = self._current
+        seconds = before + time.perf_counter() - started
+        rows += rows_before
+        self._stats.extend(query, before, seconds, rows_before, rows)
+        if event is not None:
+            event['dur'] = seconds * 1e6
+            event['args']['rows'] = rows
+        self._current = [query, seconds, rows, event]
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size if size is not None else self._cursor.arraysize)
+        self._fetched(started, len(rows))
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self.flush()
+        self._cursor.close()
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection whose commits are timed like statements (use as connect factory)
+
+    The built-in context manager commits without going through commit(),
+    so __exit__ is overridden to commit through it.
+    """
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            seconds = time.perf_counter() - started
+            QUERY_STATS.record('COMMIT', seconds, 0)
+            if TRACER.enabled:
+                TRACER.add('COMMIT', 'sql', started, seconds)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            return super().__exit__(exc_type, exc, tb)
+        try:
+            self.commit()
+        except sqlite3.Error:
+            self.rollback()
+            raise
+        return False
@@ -0,0 +1,129 @@
+"""Stress test for the admin dashboard charts: many refreshes, nothing may grow.
+
+Embeds an ActivityChart and a StockLevelsChart in a hidden Tk window and
+refreshes them --refreshes times with changing data (series lengths of
+the 7d/30d/1y ranges, stock levels going up and down, the odd change of
+stock categories), letting each redraw run before the next refresh.
+Figure count, Tk widget count, traced memory and the time per redraw are
+compared between the start (after --warmup refreshes) and the end of the
+run. Afterwards both charts are destroyed and must leave no widgets or
+figures behind. Exit status 1 if anything kept growing.
+
+    python stress_charts.py --refreshes 1000    # needs a display
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+import tkinter as tk
+
+from charts import ActivityChart, StockLevelsChart
+from memmonitor import TRACE_FRAMES, count_figures, count_widgets
+
+SERIES_LENGTHS = (7, 30, 120)
+STOCK_CATEGORIES = ['Paper (sheets)', 'File', 'Envelope']
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Refresh the dashboard charts many times and check nothing grows")
+    parser.add_argument('--refreshes', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=50, help="refreshes before the baseline is taken")
+    parser.add_argument('--budget-mb', type=float, default=5, help="allowed traced memory growth after warm-up")
+    parser.add_argument('--slowdown', type=float, default=1.5,
+                        help="fail if the median redraw at the end is this many times the one at the start")
+    parser.add_argument('--window', type=int, default=100, help="redraws in each median")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else 0.0
+
+def sample(root):
+    gc.collect()
+    counts, _ = count_widgets(root)
+    return {
+        'traced': tracemalloc.get_traced_memory()[0],
+        'widgets': sum(counts.values()),
+        'figures': count_figures()
+    }
+
+def refresh(rng, round_number, activity, stock):
+    length = SERIES_LENGTHS[round_number % len(SERIES_LENGTHS)]
+    values = [rng.randint(0, 200) for _ in range(length)]
+    activity.set_labels(f'Transaction Activity ({length} days)', 'Number of Transactions')
+    activity.update([f'day {i}' for i in range(length)], values)
+
+    categories = STOCK_CATEGORIES if round_number % 97 else STOCK_CATEGORIES[:2]
+    stock.update(categories, [rng.randint(0, 5000) for _ in categories])
+
+def run(args):
+    rng = random.Random(args.seed)
+    root = tk.Tk()
+    root.withdraw()
+    frame = tk.Frame(root)
+    frame.pack()
+    activity = ActivityChart(frame)
+    stock = StockLevelsChart(frame)
+    activity.pack()
+    stock.pack()
+    for chart in (activity, stock):
+        chart.MIN_REDRAW_INTERVAL = 0
+
+    tracemalloc.start(TRACE_FRAMES)
+    timings = []
+    baseline = None
+    for round_number in range(args.warmup + args.refreshes):
+        started = time.perf_counter()
+        refresh(rng, round_number, activity, stock)
+        root.update()
+        timings.append(time.perf_counter() - started)
+        if round_number == args.warmup - 1:
+            baseline = sample(root)
+    final = sample(root)
+    redraws = activity.redraw_count + stock.redraw_count
+
+    activity.destroy()
+    stock.destroy()
+    del activity, stock
+    root.update()
+    leftover = sample(root)
+    root.destroy()
+    tracemalloc.stop()
+
+    timings = timings[args.warmup:]
+    first = median(timings[:args.window])
+    last = median(timings[-args.window:])
+    print(f"{args.refreshes} refreshes, {redraws} redraws")
+    print(f"{'':>10} {'traced MB':>10} {'widgets':>8} {'figures':>8}")
+    for name, entry in (('baseline', baseline), ('final', final), ('destroyed', leftover)):
+        print(f"{name:>10} {entry['traced'] / 1048576:10.2f} {entry['widgets']:8d} {entry['figures']:8d}")
+    print(f"median redraw: first {args.window} {first * 1000:.1f} ms, last {args.window} {last * 1000:.1f} ms")
+
+    failures = []
+    for key in ('widgets', 'figures'):
+        if final[key] > baseline[key]:
+            failures.append(f"{key} grew from {baseline[key]} to {final[key]}")
+    growth = final['traced'] - baseline['traced']
+    if growth > args.budget_mb * 1048576:
+        failures.append(f"traced memory grew {growth / 1048576:.2f} MB, budget {args.budget_mb} MB")
+    if last > first * args.slowdown:
+        failures.append(f"median redraw went from {first * 1000:.1f} ms to {last * 1000:.1f} ms")
+    if leftover['widgets'] > 1:
+        failures.append(f"{leftover['widgets'] - 1} widget(s) left after destroying the charts")
+    if leftover['figures']:
+        failures.append(f"{leftover['figures']} figure(s) left after destroying the charts")
+
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        return 1
+    print("OK: charts stayed bounded")
+    return 0
+
+def main():
+    return run(parse_args())
+
+if __name__ == "__main__":
+    sys.exit(main())
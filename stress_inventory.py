@@ -0,0 +1,124 @@
+"""Multi-process stress test for concurrent inventory updates.
+
+Several worker processes hammer the same inventory rows with a mix of
+sales (update_stock) and deliveries (add_stock), each through its own
+connection, like separate terminals sharing one database. Every worker
+counts the changes that were reported as applied; at the end the stock in
+the database must equal the starting stock plus the sum of those changes.
+
+    python stress_inventory.py --workers 8 --ops 500
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from models import DatabaseManager, Inventory
+
+ITEMS = ('paper', 'file', 'envelope')
+START_QUANTITY = 1000000
+
+def prepare_database(path, wal):
+    db = DatabaseManager(path)
+    if wal:
+        db.cursor.execute('PRAGMA journal_mode=WAL').fetchone()
+    db.cursor.execute('UPDATE inventory SET quantity = ?, version = 0', (START_QUANTITY,))
+    db.conn.commit()
+    db.close()
+
+def worker(path, ops, seed, start_event, results):
+    random.seed(seed)
+    db = DatabaseManager(path)
+    inventory = Inventory(db)
+    applied = dict.fromkeys(ITEMS, 0)
+    failed = 0
+    latencies = []
+
+    start_event.wait()
+    for _ in range(ops):
+        item = random.choice(ITEMS)
+        started = time.perf_counter()
+        if random.random() < 0.8:
+            change = -random.randint(1, 5)
+            ok = inventory.update_stock(item, change)
+        else:
+            change = random.randint(10, 50)
+            ok = inventory.add_stock(item, change)
+        latencies.append(time.perf_counter() - started)
+        if ok:
+            applied[item] += change
+        else:
+            failed += 1
+
+    db.close()
+    results.put((applied, failed, latencies))
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def run(args):
+    temp_dir = tempfile.mkdtemp(prefix='printshop_stress_')
+    path = os.path.join(temp_dir, 'stress.db')
+    prepare_database(path, not args.no_wal)
+
+    start_event = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, args.ops, i, start_event, results))
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    started = time.perf_counter()
+    start_event.set()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    applied = dict.fromkeys(ITEMS, 0)
+    failed = 0
+    latencies = []
+    for worker_applied, worker_failed, worker_latencies in outcomes:
+        for item, change in worker_applied.items():
+            applied[item] += change
+        failed += worker_failed
+        latencies.extend(worker_latencies)
+
+    db = DatabaseManager(path)
+    final = Inventory(db).get_quantities()
+    db.close()
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+    total_ops = args.workers * args.ops
+    print(f"Workers:      {args.workers} processes x {args.ops} updates")
+    print(f"Throughput:   {total_ops / elapsed:.0f} updates/s")
+    print(f"Latency p50:  {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"Latency p99:  {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"Failed:       {failed}")
+
+    ok = failed == 0
+    for item in ITEMS:
+        lost = START_QUANTITY + applied[item] - final[item]
+        print(f"{item:<9} expected {START_QUANTITY + applied[item]}, found {final[item]}, lost {lost}")
+        ok = ok and lost == 0
+    print("PASS" if ok else "FAIL")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent inventory updates from several processes")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=500, help="updates per worker")
+    parser.add_argument('--no-wal', action='store_true', help="use the default rollback journal")
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import json
+import threading
+import uuid
+import zlib
+
+from changefeed import ChangeFeed
+from models import DatabaseManager, Inventory
+
+def init_sync_tables(db):
+    """Create the tables used by terminals and hubs to track sync progress"""
+    db.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+
+    db.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_events (
+            event_id TEXT PRIMARY KEY,
+            terminal_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            received_at TEXT NOT NULL
+        )
+    ''')
+    db.conn.commit()
+
+def encode_batch(terminal_id, events):
+    """Serialize and compress a batch of journal events for the hub"""
+    return zlib.compress(json.dumps({'terminal_id': terminal_id, 'events': events}).encode('utf-8'))
+
+def decode_batch(data):
+    batch = json.loads(zlib.decompress(data))
+    return batch['terminal_id'], batch['events']
+
+class SyncHub:
+    """Applies journal batches pushed by terminals to the hub database.
+
+    Every event is applied at most once, keyed by its event id, so batches
+    can be re-sent after a lost reply. Sales and expenses are appended as
+    they happened on the terminal. Stock moves are relative changes, which
+    add up to the same total whatever order terminals sync in; the hub's
+    quantities are authoritative and are returned with every push.
+    """
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self.inventory_model = Inventory(db_manager)
+        init_sync_tables(db_manager)
+
+    def apply(self, terminal_id, events):
+        """Apply a batch and return the last acknowledged seq and the hub stock"""
+        self.db.cursor.execute('BEGIN IMMEDIATE')
+        try:
+            received_at = self.db.clock.now().strftime('%Y-%m-%d %H:%M:%S')
+            for event in events:
+                self.db.cursor.execute('''
+                    INSERT OR IGNORE INTO sync_events (event_id, terminal_id, seq, received_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (event['event_id'], terminal_id, event['seq'], received_at))
+                if self.db.cursor.rowcount:
+                    self.apply_event(event)
+
+            stock = self.inventory_model.get_quantities()
+            self.db.conn.commit()
+        except Exception:
+            self.db.conn.rollback()
+            raise
+
+        return {
+            'acked': events[-1]['seq'] if events else None,
+            'stock': stock
+        }
+
+    def apply_event(self, event):
+        payload = event['payload']
+        if event['kind'] == 'sale':
+            self.db.cursor.execute('''
+                INSERT INTO transactions
+                (date, service, quantity, amount, papers_used, timestamp, created_by, sale_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (payload['date'], payload['service'], payload['quantity'], payload['amount'],
+                  payload['papers_used'], payload['timestamp'], payload['created_by'], payload['sale_id']))
+            self.db.record_event('sale', payload, event['event_id'])
+        elif event['kind'] == 'expense':
+            self.db.cursor.execute('''
+                INSERT INTO expenses
+                (date, category, amount, description, timestamp, created_by)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (payload['date'], payload['category'], payload['amount'], payload['description'],
+                  payload['timestamp'], payload['created_by']))
+            self.db.record_event('expense', payload, event['event_id'])
+        elif event['kind'] == 'stock':
+            self.inventory_model.change_quantity(
+                payload['item'], payload['change'], commit=False, event_id=event['event_id']
+            )
+
+class FileHub:
+    """Hub that is another SQLite database file, for single-machine setups and testing"""
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self._hub = None
+
+    def push(self, data):
+        if self._hub is None:
+            self._hub = SyncHub(DatabaseManager(self.db_name, check_same_thread=False))
+        return self._hub.apply(*decode_batch(data))
+
+    def close(self):
+        if self._hub is not None:
+            self._hub.db.close()
+            self._hub = None
+
+class HttpHub:
+    """Hub reached through the API server's /api/sync/push route"""
+
+    def __init__(self, base_url, username, password):
+        from api_client import ApiClient
+        self.client = ApiClient(base_url)
+        self.username = username
+        self.password = password
+
+    def push(self, data):
+        from api_server import ApiError
+        for attempt in range(2):
+            if self.client.token is None:
+                self.client.token = self.client.post(
+                    '/api/login', {'username': self.username, 'password': self.password}
+                )['token']
+            try:
+                return self.client.request(
+                    'POST', '/api/sync/push', data=data,
+                    headers={'Content-Type': 'application/json', 'Content-Encoding': 'deflate'}
+                )
+            except ApiError as e:
+                if e.status != 401 or attempt:
+                    raise
+                self.client.token = None
+
+    def close(self):
+        self.client.close()
+
+class SyncWorker:
+    """Background thread that pushes the local journal to a hub.
+
+    Sales, expenses and stock moves are always written to the local
+    database first, so the terminal keeps working while the hub is
+    unreachable. The worker reads new journal events in batches, pushes
+    them compressed, and on success re-bases local stock on the hub's
+    quantities plus any local moves the hub has not seen yet. It uses its
+    own connection and never holds a lock while talking to the hub.
+    """
+    INTERVAL = 2.0
+    MAX_BACKOFF = 60.0
+    BATCH_SIZE = 500
+    CONSUMER = 'hub-sync'
+
+    def __init__(self, db_name, hub, interval=None, batch_size=None):
+        self.db_name = db_name
+        self.hub = hub
+        self.interval = interval or self.INTERVAL
+        self.batch_size = batch_size or self.BATCH_SIZE
+
+        self.terminal_id = None
+        self.pending = 0
+        self.last_sync = None
+        self.last_error = None
+        self.stock_revision = 0
+
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='sync-worker', daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Ask the worker to sync now instead of at its next interval"""
+        self._wake.set()
+
+    def stop(self, timeout=5):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        return {
+            'terminal_id': self.terminal_id,
+            'online': self.last_error is None and self.last_sync is not None,
+            'pending': self.pending,
+            'last_sync': self.last_sync,
+            'last_error': self.last_error
+        }
+
+    def run(self):
+        db = DatabaseManager(self.db_name, check_same_thread=False)
+        try:
+            db.cursor.execute('PRAGMA journal_mode=WAL').fetchone()
+            init_sync_tables(db)
+            feed = ChangeFeed(db)
+            feed.register(self.CONSUMER)
+            self.terminal_id = self.get_state(db, 'terminal_id', uuid.uuid4().hex)
+
+            failures = 0
+            while not self._stopping:
+                try:
+                    while self.sync_once(db, feed) and not self._stopping:
+                        pass
+                    failures = 0
+                    self.last_error = None
+                    delay = self.interval
+                except Exception as e:
+                    if db.conn.in_transaction:
+                        db.conn.rollback()
+                    failures += 1
+                    self.last_error = str(e) or e.__class__.__name__
+                    delay = min(self.MAX_BACKOFF, self.interval * 2 ** failures)
+
+                self._wake.wait(delay)
+                self._wake.clear()
+        finally:
+            db.close()
+            self.hub.close()
+
+    def sync_once(self, db, feed):
+        """Push one batch and apply the hub's stock; returns True if more is pending"""
+        pushed_seq = feed.get_offset(self.CONSUMER)
+        self.pending = feed.count_after(pushed_seq)
+        events = feed.fetch(pushed_seq, self.batch_size)
+
+        result = self.hub.push(encode_batch(self.terminal_id, events))
+        acked = result['acked'] if result['acked'] is not None else pushed_seq
+        self.apply_hub_stock(db, feed, result['stock'], acked)
+
+        self.pending = feed.count_after(acked)
+        self.last_sync = db.clock.now()
+        return len(events) == self.batch_size
+
+    def apply_hub_stock(self, db, feed, stock, acked):
+        """Set local stock to the hub's quantities plus local moves not yet pushed"""
+        db.cursor.execute('BEGIN IMMEDIATE')
+        db.cursor.execute('''
+            SELECT json_extract(payload, '$.item'), SUM(json_extract(payload, '$.change'))
+            FROM journal
+            WHERE kind = 'stock' AND seq > ?
+            GROUP BY 1
+        ''', (acked,))
+        unpushed = dict(db.cursor.fetchall())
+
+        changed = 0
+        now = db.clock.now().strftime('%Y-%m-%d %H:%M:%S')
+        for item, quantity in stock.items():
+            db.cursor.execute('''
+                UPDATE inventory
+                SET quantity = ?, version = version + 1, last_updated = ?
+                WHERE item = ? AND quantity != ?
+            ''', (quantity + unpushed.get(item, 0), now, item, quantity + unpushed.get(item, 0)))
+            changed += db.cursor.rowcount
+
+        feed.commit_offset(self.CONSUMER, acked, commit=False)
+        db.conn.commit()
+        if changed:
+            self.stock_revision += 1
+
+    def get_state(self, db, key, default):
+        db.cursor.execute('INSERT OR IGNORE INTO sync_state (key, value) VALUES (?, ?)', (key, str(default)))
+        db.cursor.execute('SELECT value FROM sync_state WHERE key = ?', (key,))
+        value = db.cursor.fetchone()[0]
+        db.conn.commit()
+        return value
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+class TimeSeriesProvider:
+    """Daily transaction series for charts and reports.
+
+    Every range is loaded with a single grouped query over the indexed
+    `date` column; days without transactions are filled with zeros.
+    """
+    RANGES = {
+        '7d': 7,
+        '30d': 30,
+        '1y': 365,
+        'all': None
+    }
+    METRICS = ('count', 'revenue')
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def get_daily_series(self, start, end, metric='count'):
+        """Return [(date, value), ...] for every day from start to end inclusive"""
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+
+        self.db.cursor.execute('''
+            SELECT date, COUNT(*), SUM(amount)
+            FROM transactions
+            WHERE date BETWEEN ? AND ?
+            GROUP BY date
+        ''', (start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')))
+
+        column = 1 if metric == 'count' else 2
+        values = {row[0]: row[column] or 0 for row in self.db.cursor.fetchall()}
+
+        series = []
+        day = start
+        while day <= end:
+            series.append((day, values.get(day.strftime('%Y-%m-%d'), 0)))
+            day += timedelta(days=1)
+        return series
+
+    def get_range_series(self, range_key, metric='count', end=None):
+        """Return the daily series for one of the named RANGES ending today"""
+        end = end or self.db.clock.now()
+        end = datetime(end.year, end.month, end.day)
+        days = self.RANGES[range_key]
+
+        if days is None:
+            self.db.cursor.execute('SELECT MIN(date) FROM transactions')
+            first = self.db.cursor.fetchone()[0]
+            start = datetime.strptime(first, '%Y-%m-%d') if first else end
+            start = min(start, end)
+        else:
+            start = end - timedelta(days=days - 1)
+
+        return self.get_daily_series(start, end, metric)
+
+def downsample_lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of [(x, y), ...] points.
+
+    Keeps the first and last point and, for every bucket in between, the
+    point forming the largest triangle with its neighbours, which preserves
+    the visual shape of peaks and troughs.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_bucket = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = points[a]
+
+        best_area = -1
+        best_index = start
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best_index = j
+
+        sampled.append(points[best_index])
+        a = best_index
+
+    sampled.append(points[-1])
+    return sampled
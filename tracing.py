@@ -0,0 +1,122 @@
+"""Span tracing from UI action to SQL to render, saved as Chrome trace JSON.
+
+Spans are recorded only while TRACER is enabled (main.py --trace, or
+Ctrl+Shift+T in the cashier window). When it is off, span() returns a
+shared do-nothing context manager and @traced functions make one
+attribute check before calling straight through, so the hooks can stay
+in hot paths. Saved files open in chrome://tracing or ui.perfetto.dev,
+where nested spans on each thread show where an action spent its time.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+MAX_EVENTS = 200000
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=f"{exc_type.__name__}: {exc}")
+        self.tracer.add(self.name, self.category, self.started, time.perf_counter() - self.started, self.args)
+        return False
+
+class Tracer:
+    """Collects complete spans in a bounded in-memory buffer"""
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.enabled = False
+        self._events = deque(maxlen=max_events)
+        self._threads = {}
+        self._origin = time.perf_counter()
+
+    def start(self):
+        self._events.clear()
+        self._threads.clear()
+        self._origin = time.perf_counter()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def span(self, name, category='app', **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category, args or None)
+
+    def add(self, name, category, started, duration, args=None):
+        """Record a finished span that began at perf_counter() value started, and return its event"""
+        thread = threading.current_thread()
+        self._threads.setdefault(thread.ident, thread.name)
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (started - self._origin) * 1e6,
+            'dur': duration * 1e6,
+            'pid': os.getpid(),
+            'tid': thread.ident
+        }
+        if args:
+            event['args'] = args
+        self._events.append(event)
+        return event
+
+    def export(self, path):
+        """Write the collected spans as a Chrome trace file"""
+        pid = os.getpid()
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': ident, 'args': {'name': name}}
+            for ident, name in list(self._threads.items())
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': metadata + list(self._events), 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    def save(self, directory='traces'):
+        """Stop tracing and write traces/trace_<time>.json; returns the file name"""
+        self.stop()
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        return self.export(os.path.join(directory, f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+
+TRACER = Tracer()
+
+def span(name, category='app', **args):
+    """Context manager timing a block as one span, e.g. with span('ui.sale', 'action'):"""
+    if not TRACER.enabled:
+        return NULL_SPAN
+    return Span(TRACER, name, category, args or None)
+
+def traced(name, category='app'):
+    """Decorator recording every call of a function as a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            with Span(TRACER, name, category, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,9 +1,19 @@
 import csv
 import tkinter as tk
 from tkinter import ttk, messagebox
-from datetime import datetime
 from tkinter import filedialog
 from PIL import Image, ImageTk
+from history import HistoryBrowser
+from services import StockError
+from tracing import TRACER, span, traced
+from widgets import Sparkline, Toast, TreeviewBinding
+
+SALES_RATE_MINUTES = 30
+SALES_RATE_REFRESH_MS = 15000
+RECONCILE_INTERVAL_MS = 300000
+SYNC_STATUS_REFRESH_MS = 3000
+LIVE_UPDATE_POLL_MS = 250
+QUICK_ENTRY_SERVICES = ["Photocopy", "Printing", "Scanning", "Lamination", "File", "Envelope"]
 
 class PrintShopUI:
     def __init__(self, root, service, auth_manager):
@@ -22,11 +32,34 @@ class PrintShopUI:
         self.total_revenue = tk.DoubleVar()
         self.papers_used = tk.IntVar()
         
+        self.service_totals = {}
+        
         self.load_initial_data()
         self.create_ui()
         self.update_displays()
+        self.schedule_reconcile()
+
+        self.live_updates = None
+        if getattr(self.service, 'event_bus', None):
+            self.live_updates = self.service.event_bus.subscribe(kinds=('stock', 'end_of_day'))
+            self.poll_live_updates()
 
         self.export_button = None
+        self.root.bind('<Control-T>', self.toggle_trace)
+
+    def toggle_trace(self, event=None):
+        """Ctrl+Shift+T: start tracing, or stop and save the trace file"""
+        if TRACER.enabled:
+            self.toast.show(f"Trace saved: {TRACER.save()}")
+        else:
+            TRACER.start()
+            self.toast.show("Tracing started, press Ctrl+Shift+T again to save")
+
+    def flush_render(self):
+        """While tracing, draw pending widget changes now so their cost shows in the trace"""
+        if TRACER.enabled:
+            with span('render.idletasks', 'render'):
+                self.root.update_idletasks()
 
     def create_main_container(self):
         """Create main scrollable container"""
@@ -64,18 +97,21 @@ class PrintShopUI:
 
     def update_stock_variables(self):
         """Update stock variables from inventory"""
-        self.paper_stock.set(self.service.inventory_model.get_stock('paper'))
-        self.file_stock.set(self.service.inventory_model.get_stock('file'))
-        self.envelope_stock.set(self.service.inventory_model.get_stock('envelope'))
+        stock = self.service.inventory_model.get_quantities()
+        self.paper_stock.set(stock.get('paper', 0))
+        self.file_stock.set(stock.get('file', 0))
+        self.envelope_stock.set(stock.get('envelope', 0))
 
     def create_ui(self):
         """Create main UI components"""
         self.create_main_container()
         self.create_header()
         self.configure_styles()
+        self.toast = Toast(self.root)
         self.setup_main_grid()
         self.create_daily_summary()
         self.create_quick_actions()
+        self.create_quick_entry()
         self.create_service_summary()
         self.create_transactions()
         self.create_daily_records()
@@ -111,6 +147,16 @@ class PrintShopUI:
             )
             user_label.pack(side='left')
 
+        if getattr(self.service, 'sync_worker', None):
+            self.sync_label = ttk.Label(
+                left_section,
+                font=('Leelawadee', 10),
+                foreground='#6b7280'
+            )
+            self.sync_label.pack(side='top', anchor='w', pady=(4, 0))
+            self.stock_revision = self.service.sync_worker.stock_revision
+            self.root.after(SYNC_STATUS_REFRESH_MS, self.update_sync_status)
+
         center_section = ttk.Frame(header_frame)
         center_section.pack(side='left', fill='both', expand=True, padx=40)
 
@@ -177,6 +223,7 @@ class PrintShopUI:
         button_configs = [
             ("Refresh", "🔄", self.refresh_page),
             ("Record Expense", "💰", self.show_expense_dialog),
+            ("History", "📜", self.show_history_window),
             ("End Day", "🔚", self.end_day),
             ("Logout", "🚪", self.logout)
         ]
@@ -266,6 +313,246 @@ class PrintShopUI:
             )
             btn.pack(fill='both', expand=True, padx=5, pady=5)
 
+        self.create_cart(actions_frame)
+
+    def create_cart(self, parent):
+        """Create the cart used to sell several services as one sale"""
+        self.cart = []
+        
+        cart_frame = ttk.LabelFrame(parent, text="Cart", padding="10")
+        cart_frame.pack(fill='x', pady=(15, 0))
+        
+        self.cart_mode = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            cart_frame,
+            text="Cart mode (add services to one sale)",
+            variable=self.cart_mode
+        ).pack(anchor='w')
+        
+        columns = ('Service', 'Quantity', 'Papers', 'Amount')
+        self.cart_tree = ttk.Treeview(cart_frame, columns=columns, show='headings', height=4)
+        for col in columns:
+            self.cart_tree.heading(col, text=col)
+            self.cart_tree.column(col, width=100)
+        self.cart_tree.pack(fill='x', pady=5)
+        self.cart_rows = TreeviewBinding(self.cart_tree)
+        
+        bottom = ttk.Frame(cart_frame)
+        bottom.pack(fill='x')
+        
+        self.cart_total_label = ttk.Label(bottom, text="Total: M0.00", font=('Leelawadee', 11, 'bold'))
+        self.cart_total_label.pack(side='left')
+        
+        ttk.Button(bottom, text="Checkout", command=self.checkout_cart).pack(side='right', padx=2)
+        ttk.Button(bottom, text="Clear", command=self.clear_cart).pack(side='right', padx=2)
+        ttk.Button(bottom, text="Remove", command=self.remove_cart_line).pack(side='right', padx=2)
+
+    def update_cart_display(self):
+        """Show the cart lines and total"""
+        rows = []
+        total = 0
+        for i, (service, qty, papers) in enumerate(self.cart):
+            amount = qty * self.service.prices[service]
+            total += amount
+            rows.append((i, (service, qty, qty * papers, f"M{amount:.2f}")))
+        self.cart_rows.update(rows)
+        self.cart_total_label.config(text=f"Total: M{total:.2f}")
+
+    def add_to_cart(self, service, qty, papers):
+        """Add a line to the cart if the stock covers the whole cart"""
+        needed = self.service.stock_needed(self.cart + [(service, qty, papers)])
+        available = {
+            'paper': self.paper_stock.get(),
+            'file': self.file_stock.get(),
+            'envelope': self.envelope_stock.get()
+        }
+        for item, quantity in needed.items():
+            if quantity > available.get(item, 0):
+                messagebox.showerror("Error", str(StockError(item)))
+                return False
+        
+        self.cart.append((service, qty, papers))
+        self.update_cart_display()
+        return True
+
+    def remove_cart_line(self):
+        """Remove the selected cart lines"""
+        selected = {int(iid) for iid in self.cart_tree.selection()}
+        self.cart = [line for i, line in enumerate(self.cart) if i not in selected]
+        self.update_cart_display()
+
+    def clear_cart(self):
+        """Empty the cart"""
+        self.cart = []
+        self.update_cart_display()
+
+    @traced('ui.checkout', 'action')
+    def checkout_cart(self):
+        """Commit every cart line as one sale"""
+        if not self.cart:
+            messagebox.showwarning("Warning", "The cart is empty")
+            return
+        
+        try:
+            result = self.service.process_sale(self.cart)
+        except (StockError, ValueError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        self.clear_cart()
+        self.apply_sale(result)
+        self.toast.show(f"Sale processed: {len(result['lines'])} items, total M{result['amount']:.2f}")
+
+    def create_quick_entry(self):
+        """Create the always-visible keyboard entry panel
+
+        F1-F6 pick a service, the keypad enters the quantity and Enter sells
+        (or adds to the cart in cart mode). Errors are shown inline and
+        confirmations as a toast, so no window is opened per sale.
+        """
+        entry_frame = ttk.LabelFrame(
+            self.main_container,
+            text="Quick Entry",
+            padding="15"
+        )
+        entry_frame.grid(row=1, column=0, columnspan=2, sticky='ew', pady=(15, 0))
+        
+        self.quick_service = tk.StringVar(value=QUICK_ENTRY_SERVICES[0])
+        self.quick_qty = tk.StringVar(value="1")
+        self.quick_papers = tk.StringVar(value="1")
+        
+        keys_frame = ttk.Frame(entry_frame)
+        keys_frame.pack(fill='x')
+        for i, service in enumerate(QUICK_ENTRY_SERVICES):
+            ttk.Radiobutton(
+                keys_frame,
+                text=f"F{i + 1} {service}",
+                value=service,
+                variable=self.quick_service,
+                command=self.on_quick_service_change
+            ).pack(side='left', padx=8)
+            self.root.bind(f'<F{i + 1}>', lambda e, s=service: self.select_quick_service(s))
+        
+        form = ttk.Frame(entry_frame)
+        form.pack(fill='x', pady=(10, 0))
+        
+        ttk.Label(form, text="Quantity:").pack(side='left')
+        self.quick_qty_entry = ttk.Entry(form, textvariable=self.quick_qty, width=8, font=('Leelawadee', 14))
+        self.quick_qty_entry.pack(side='left', padx=(5, 15))
+        
+        ttk.Label(form, text="Papers per item:").pack(side='left')
+        self.quick_papers_entry = ttk.Entry(form, textvariable=self.quick_papers, width=6, font=('Leelawadee', 14))
+        self.quick_papers_entry.pack(side='left', padx=(5, 15))
+        
+        self.quick_total_label = ttk.Label(form, text="Total: M0.00", font=('Leelawadee', 14, 'bold'))
+        self.quick_total_label.pack(side='left', padx=15)
+        
+        ttk.Button(form, text="Sell (Enter)", command=self.submit_quick_entry).pack(side='right')
+        
+        self.quick_message = ttk.Label(entry_frame, text="", foreground='#991b1b')
+        self.quick_message.pack(anchor='w', pady=(5, 0))
+        
+        for entry in (self.quick_qty_entry, self.quick_papers_entry):
+            entry.bind('<Return>', lambda e: self.submit_quick_entry())
+            entry.bind('<KP_Enter>', lambda e: self.submit_quick_entry())
+            entry.bind('<Escape>', lambda e: self.reset_quick_entry())
+        
+        self.quick_qty.trace('w', self.validate_quick_entry)
+        self.quick_papers.trace('w', self.validate_quick_entry)
+        self.on_quick_service_change()
+
+    def select_quick_service(self, service):
+        """Hotkey handler: choose a service and focus the quantity"""
+        self.quick_service.set(service)
+        self.on_quick_service_change()
+        return 'break'
+
+    def on_quick_service_change(self):
+        service = self.quick_service.get()
+        uses_paper = service in ["Photocopy", "Printing"]
+        self.quick_papers_entry.configure(state='normal' if uses_paper else 'disabled')
+        self.validate_quick_entry()
+        self.quick_qty_entry.focus_set()
+        self.quick_qty_entry.select_range(0, 'end')
+
+    def read_quick_entry(self):
+        """Return (service, qty, papers) or raise ValueError with a message"""
+        service = self.quick_service.get()
+        try:
+            qty = int(self.quick_qty.get())
+            papers = int(self.quick_papers.get()) if service in ["Photocopy", "Printing"] else 0
+        except ValueError:
+            raise ValueError("Please enter valid numbers")
+        
+        if qty <= 0 or papers < 0:
+            raise ValueError("Please enter valid positive numbers")
+        
+        lines = (self.cart if self.cart_mode.get() else []) + [(service, qty, papers)]
+        available = {
+            'paper': self.paper_stock.get(),
+            'file': self.file_stock.get(),
+            'envelope': self.envelope_stock.get()
+        }
+        for item, quantity in self.service.stock_needed(lines).items():
+            if quantity > available.get(item, 0):
+                raise ValueError(str(StockError(item)))
+        return service, qty, papers
+
+    def validate_quick_entry(self, *args):
+        """Show the running total and any validation error inline"""
+        try:
+            service, qty, papers = self.read_quick_entry()
+        except ValueError as e:
+            self.quick_total_label.config(text="Total: M0.00")
+            self.quick_message.config(text=str(e))
+            return False
+        
+        self.quick_total_label.config(text=f"Total: M{qty * self.service.prices[service]:.2f}")
+        self.quick_message.config(text="")
+        return True
+
+    @traced('ui.quick_sale', 'action')
+    def submit_quick_entry(self):
+        """Sell the entered service, or add it to the cart in cart mode"""
+        try:
+            service, qty, papers = self.read_quick_entry()
+        except ValueError as e:
+            self.quick_message.config(text=str(e))
+            return 'break'
+        
+        if self.cart_mode.get():
+            self.cart.append((service, qty, papers))
+            self.update_cart_display()
+            self.toast.show(f"Added {qty} x {service} to cart")
+        else:
+            try:
+                result = self.service.process_transaction(service, qty, papers)
+            except (StockError, ValueError) as e:
+                self.quick_message.config(text=str(e))
+                return 'break'
+            self.apply_sale(result)
+            self.toast.show(self.sale_message(result))
+        
+        self.reset_quick_entry()
+        return 'break'
+
+    def reset_quick_entry(self):
+        self.quick_qty.set("1")
+        self.quick_qty_entry.focus_set()
+        self.quick_qty_entry.select_range(0, 'end')
+
+    def sale_message(self, result):
+        """Describe a processed single-line sale for a confirmation"""
+        sale = result['sale']
+        message = f"{sale['service']} x{sale['quantity']}: M{sale['amount']:.2f}"
+        if sale['papers_used'] > 0:
+            message += f" - {self.paper_stock.get()} sheets left"
+        elif sale['service'] == "File":
+            message += f" - {self.file_stock.get()} files left"
+        elif sale['service'] == "Envelope":
+            message += f" - {self.envelope_stock.get()} envelopes left"
+        return message
+
     def create_daily_summary(self):
         """Create daily summary panel on the right"""
         summary_frame = ttk.LabelFrame(
@@ -313,6 +600,41 @@ class PrintShopUI:
         )
         self.papers_used_label.pack(pady=(5, 10))
 
+        rate_card = ttk.Frame(summary_frame, style='Card.TFrame')
+        rate_card.grid(row=2, column=0, pady=(10, 0), sticky='ew')
+        
+        ttk.Label(
+            rate_card,
+            text="Sales per Minute (last 30 min)",
+            font=('Leelawadee', 12),
+            style='CardTitle.TLabel'
+        ).pack(pady=(5, 0))
+        
+        self.sales_rate_label = ttk.Label(
+            rate_card,
+            text="0",
+            font=('Leelawadee', 14, 'bold'),
+            style='CardValue.TLabel'
+        )
+        self.sales_rate_label.pack()
+        
+        self.sales_sparkline = Sparkline(rate_card, width=240, height=40, background='#ffffff')
+        self.sales_sparkline.pack(pady=(0, 10))
+        
+        self.schedule_sales_rate_update()
+
+    @traced('render.sales_rate', 'render')
+    def update_sales_rate(self):
+        """Redraw the sales-per-minute sparkline from the sales buffer"""
+        counts = self.service.recent_activity.sales_per_minute(SALES_RATE_MINUTES)
+        self.sales_rate_label.config(text=f"{counts[-1]} this minute, {sum(counts)} total")
+        self.sales_sparkline.update_values(counts)
+
+    def schedule_sales_rate_update(self):
+        """Keep the sparkline moving even when no sales come in"""
+        self.update_sales_rate()
+        self.root.after(SALES_RATE_REFRESH_MS, self.schedule_sales_rate_update)
+
     def configure_styles(self):
         """Configure custom styles for the UI components"""
         style = ttk.Style()
@@ -409,6 +731,7 @@ class PrintShopUI:
             command=self.transaction_tree.yview
         )
         self.transaction_tree.configure(yscrollcommand=v_scrollbar.set)
+        self.transaction_rows = TreeviewBinding(self.transaction_tree)
         
         self.transaction_tree.pack(side='left', fill='x', expand=True)
         v_scrollbar.pack(side='right', fill='y')
@@ -487,6 +810,7 @@ class PrintShopUI:
             yscrollcommand=v_scrollbar.set,
             xscrollcommand=h_scrollbar.set
         )
+        self.records_rows = TreeviewBinding(self.records_tree)
         
         self.records_tree.pack(side='left', fill='both', expand=True)
         v_scrollbar.pack(side='right', fill='y')
@@ -540,6 +864,7 @@ class PrintShopUI:
         if papers_label:
             papers_var.trace('w', update_total)
         
+        @traced('ui.sale', 'action')
         def process():
             try:
                 qty = int(qty_var.get())
@@ -558,29 +883,30 @@ class PrintShopUI:
                 elif papers > 0 and (qty * papers) > self.paper_stock.get():
                     messagebox.showerror("Error", "Not enough paper in stock!")
                     return
-                self.service.process_transaction(service, qty, papers)
                 
-                self.update_stock_variables()
+                if self.cart_mode.get():
+                    if self.add_to_cart(service, qty, papers):
+                        dialog.destroy()
+                    return
                 
-                dialog.destroy()
-                self.update_displays()
+                try:
+                    result = self.service.process_transaction(service, qty, papers)
+                except StockError as e:
+                    messagebox.showerror("Error", str(e))
+                    return
                 
-                if papers > 0:
-                    messagebox.showinfo("Success", 
-                        f"Transaction processed!\nRemaining paper stock: {self.paper_stock.get()} sheets")
-                elif service == "File":
-                    messagebox.showinfo("Success", 
-                        f"Transaction processed!\nRemaining files: {self.file_stock.get()}")
-                elif service == "Envelope":
-                    messagebox.showinfo("Success", 
-                        f"Transaction processed!\nRemaining envelopes: {self.envelope_stock.get()}")
-                else:
-                    messagebox.showinfo("Success", "Transaction processed successfully!")
+                dialog.destroy()
+                self.apply_sale(result)
+                self.toast.show(self.sale_message(result))
                 
             except ValueError:
                 messagebox.showerror("Error", "Please enter valid numbers")
         
-        ttk.Button(content_frame, text="Process", command=process).pack(pady=10)
+        ttk.Button(
+            content_frame,
+            text="Add to Cart" if self.cart_mode.get() else "Process",
+            command=process
+        ).pack(pady=10)
 
     def show_expense_dialog(self):
         """Show dialog for recording expense"""
@@ -594,7 +920,7 @@ class PrintShopUI:
         content_frame.pack(fill='both', expand=True)
         
         ttk.Label(content_frame, text="Category:").pack(pady=5)
-        categories = ['Mottakase', 'Pampiri', 'INK/Cardrige', 'Drawings']
+        categories = self.service.expense_categories
         category_var = tk.StringVar(value=categories[0])
         category_menu = ttk.Combobox(content_frame,
                                    textvariable=category_var,
@@ -611,6 +937,7 @@ class PrintShopUI:
         description_text = tk.Text(content_frame, height=4, width=40)
         description_text.pack(pady=5)
         
+        @traced('ui.expense', 'action')
         def save():
             try:
                 amount = float(amount_var.get())
@@ -619,7 +946,7 @@ class PrintShopUI:
                     return
                 
                 description = description_text.get("1.0", "end-1c")
-                self.service.expense_model.add_expense(
+                self.service.record_expense(
                     category_var.get(),
                     amount,
                     description
@@ -627,13 +954,15 @@ class PrintShopUI:
                 
                 dialog.destroy()
                 self.update_displays()
-                messagebox.showinfo("Success", f"Expense recorded: M{amount:.2f}")
+                with span('ui.messagebox', 'render'):
+                    messagebox.showinfo("Success", f"Expense recorded: M{amount:.2f}")
                 
             except ValueError:
                 messagebox.showerror("Error", "Please enter a valid amount")
         
         ttk.Button(content_frame, text="Save", command=save).pack(pady=10)
     
+    @traced('ui.end_day', 'action')
     def end_day(self):
         """Process end of day operations"""
         if not messagebox.askyesno("End Day",
@@ -642,8 +971,7 @@ class PrintShopUI:
         
         self.service.end_day()
         
-        for item in self.transaction_tree.get_children():
-            self.transaction_tree.delete(item)
+        self.transaction_rows.clear()
         
         self.total_revenue.set(0)
         self.papers_used.set(0)
@@ -661,8 +989,102 @@ class PrintShopUI:
             self.export_button.pack(expand=True, fill='both')
         
         self.update_displays()
-        messagebox.showinfo("Success", "Day ended successfully!\nDaily report has been generated.")
+        with span('ui.messagebox', 'render'):
+            messagebox.showinfo("Success", "Day ended successfully!\nDaily report has been generated.")
+    @traced('render.update_displays', 'render')
     def update_displays(self):
+        """Reload every summary from the database and redraw all panels"""
+        self.update_stock_labels()
+        
+        try:
+            daily_total, papers = self.service.get_daily_summary()
+            self.total_revenue.set(daily_total)
+            self.papers_used.set(papers)
+            self.update_summary_labels()
+        except:
+            self.revenue_label.config(text="No revenue data")
+            self.papers_used_label.config(text="No usage data")
+        
+        self.service_totals = self.service.get_service_summary()
+        for service in self.service_totals:
+            self.update_service_label(service)
+        
+        self.update_transactions_tree()
+        self.update_records_tree()
+        self.update_sales_rate()
+        self.flush_render()
+
+    @traced('render.apply_sale', 'render')
+    def apply_sale(self, result):
+        """Update only the panels affected by a processed sale"""
+        stock = result['stock']
+        self.paper_stock.set(stock.get('paper', 0))
+        self.file_stock.set(stock.get('file', 0))
+        self.envelope_stock.set(stock.get('envelope', 0))
+        self.update_stock_labels()
+        
+        self.total_revenue.set(self.total_revenue.get() + result['amount'])
+        self.papers_used.set(self.papers_used.get() + result['papers_used'])
+        self.update_summary_labels()
+        
+        for sale in result['lines']:
+            totals = self.service_totals.setdefault(sale['service'], {'count': 0, 'amount': 0})
+            totals['count'] += 1
+            totals['amount'] += sale['amount']
+            self.update_service_label(sale['service'])
+        
+        self.update_transactions_tree()
+        self.update_sales_rate()
+        self.flush_render()
+
+    def update_sync_status(self):
+        """Show the hub sync state and pick up stock corrections from the hub"""
+        worker = self.service.sync_worker
+        status = worker.status()
+        if status['online']:
+            text = f"Synced {status['last_sync']:%H:%M:%S}"
+            color = '#16a34a'
+        else:
+            text = "Offline, selling locally"
+            color = '#b45309'
+        if status['pending']:
+            text += f" · {status['pending']} changes pending"
+        self.sync_label.config(text=text, foreground=color)
+
+        if worker.stock_revision != self.stock_revision:
+            self.stock_revision = worker.stock_revision
+            self.update_stock_variables()
+            self.update_stock_labels()
+        self.root.after(SYNC_STATUS_REFRESH_MS, self.update_sync_status)
+
+    def poll_live_updates(self):
+        """Apply stock moves and day closes committed by other terminals or the admin"""
+        update = self.live_updates.poll()
+        if update:
+            if update['stock']:
+                for item, quantity in update['stock'].items():
+                    variable = getattr(self, f"{item}_stock", None)
+                    if variable is not None:
+                        variable.set(quantity)
+                self.update_stock_labels()
+            if update['end_of_day']:
+                self.update_records_tree()
+        self.root.after(LIVE_UPDATE_POLL_MS, self.poll_live_updates)
+
+    def schedule_reconcile(self):
+        """Periodically reload everything to pick up changes made elsewhere"""
+        self.root.after(RECONCILE_INTERVAL_MS, self._reconcile)
+
+    def _reconcile(self):
+        try:
+            self.update_stock_variables()
+            self.update_displays()
+        finally:
+            self.schedule_reconcile()
+
+    @traced('render.stock_labels', 'render')
+    def update_stock_labels(self):
+        """Show the current stock variables in the header"""
         for item in ['paper', 'file', 'envelope']:
             stock_value = self.get_stock_value(item)
             if stock_value is None or stock_value == 0:
@@ -681,64 +1103,49 @@ class PrintShopUI:
                         text=str(stock_value),
                         foreground='#16a34a' if item == 'file' else '#8b5cf6'
                     )
-        
-        try:
-            daily_total, papers = self.service.get_daily_summary()
-            self.revenue_label.config(text=f"M{daily_total:.2f}" if daily_total > 0 else "No revenue today")
-            self.papers_used_label.config(text=str(papers) if papers > 0 else "No papers used")
-        except:
-            self.revenue_label.config(text="No revenue data")
-            self.papers_used_label.config(text="No usage data")
-        
-        service_summary = self.service.get_service_summary()
-        for service, data in service_summary.items():
-            if data['count'] == 0 and data['amount'] == 0:
-                self.service_labels[service]['count'].config(text="No transactions")
-                self.service_labels[service]['amount'].config(text="---")
-            else:
-                self.service_labels[service]['count'].config(text=f"Count: {data['count']}")
-                self.service_labels[service]['amount'].config(text=f"M{data['amount']:.2f}")
-        
-        self.update_transactions_tree()
-        self.update_records_tree()
+
+    @traced('render.summary_labels', 'render')
+    def update_summary_labels(self):
+        """Show today's revenue and paper usage"""
+        daily_total = self.total_revenue.get()
+        papers = self.papers_used.get()
+        self.revenue_label.config(text=f"M{daily_total:.2f}" if daily_total > 0 else "No revenue today")
+        self.papers_used_label.config(text=str(papers) if papers > 0 else "No papers used")
+
+    def update_service_label(self, service):
+        """Show today's count and amount for one service"""
+        if service not in self.service_labels:
+            return
+        data = self.service_totals[service]
+        if data['count'] == 0 and data['amount'] == 0:
+            self.service_labels[service]['count'].config(text="No transactions")
+            self.service_labels[service]['amount'].config(text="---")
+        else:
+            self.service_labels[service]['count'].config(text=f"Count: {data['count']}")
+            self.service_labels[service]['amount'].config(text=f"M{data['amount']:.2f}")
+
+    @traced('render.transactions_tree', 'render')
     def update_transactions_tree(self):
-        """Update recent transactions display"""
-        for item in self.transaction_tree.get_children():
-            self.transaction_tree.delete(item)
-        
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        self.service.db.cursor.execute('''
-            SELECT timestamp, service, quantity, papers_used, amount 
-            FROM transactions 
-            WHERE date = ? 
-            ORDER BY timestamp DESC 
-            LIMIT 10
-        ''', (today,))
-        
-        for trans in self.service.db.cursor.fetchall():
-            time = datetime.strptime(trans[0], '%Y-%m-%d %H:%M:%S').strftime('%H:%M:%S')
+        """Update recent transactions display from the in-memory sales buffer"""
+        today = self.service.clock.now().strftime('%Y-%m-%d')
+        
+        rows = []
+        for sale in self.service.recent_activity.recent(10, date=today):
             values = (
-                time,
-                trans[1],
-                trans[2],
-                trans[3],
-                f"M{trans[4]:.2f}"
+                sale['time'].strftime('%H:%M:%S'),
+                sale['service'],
+                sale['quantity'],
+                sale['papers_used'],
+                f"M{sale['amount']:.2f}"
             )
-            self.transaction_tree.insert('', 'end', values=values)
+            rows.append((sale['id'], values))
+        self.transaction_rows.update(rows)
 
+    @traced('render.records_tree', 'render')
     def update_records_tree(self):
         """Update daily records display"""
-        for item in self.records_tree.get_children():
-            self.records_tree.delete(item)
-        
-        self.service.db.cursor.execute('''
-            SELECT * FROM daily_records 
-            ORDER BY date DESC 
-            LIMIT 30
-        ''')
-        
-        for record in self.service.db.cursor.fetchall():
+        rows = []
+        for record in self.service.get_daily_records(30):
             values = [
                 record[0],  
                 f"M{record[1]:.2f}",  
@@ -749,8 +1156,10 @@ class PrintShopUI:
                 f"M{record[6]:.2f}", 
                 f"M{record[7]:.2f}" 
             ]
-            self.records_tree.insert('', 'end', values=values)
+            rows.append((record[0], values))
+        self.records_rows.update(rows)
    
+    @traced('ui.refresh', 'action')
     def refresh_page(self):
         """Refresh all data and display elements on the page"""
         try:
@@ -760,28 +1169,25 @@ class PrintShopUI:
             
             self.update_displays()
             
-            self.update_transactions_tree()
-            
-            self.update_records_tree()
-            
-            service_summary = self.service.get_service_summary()
-            for service, data in service_summary.items():
-                if service in self.service_labels:
-                    if data['count'] == 0 and data['amount'] == 0:
-                        self.service_labels[service]['count'].config(text="No transactions")
-                        self.service_labels[service]['amount'].config(text="---")
-                    else:
-                        self.service_labels[service]['count'].config(text=f"Count: {data['count']}")
-                        self.service_labels[service]['amount'].config(text=f"M{data['amount']:.2f}")
-            
-            messagebox.showinfo("Success", "Page refreshed successfully!")
+            with span('ui.messagebox', 'render'):
+                messagebox.showinfo("Success", "Page refreshed successfully!")
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to refresh page: {str(e)}")
     
+    def show_history_window(self):
+        """Show the transaction history browser in its own window"""
+        window = tk.Toplevel(self.root)
+        window.title("Transaction History")
+        window.geometry("900x600")
+        
+        users = [user[0] for user in self.auth_manager.get_all_users()]
+        HistoryBrowser(window, self.service, users, padding="10").pack(fill='both', expand=True)
+
     def logout(self):
         """Handle logout"""
         if messagebox.askyesno("Logout", "Are you sure you want to logout?"):
+            self.root.unbind('<Control-T>')
             self.root.withdraw()
             self.root.quit()
             from login_ui import LoginUI
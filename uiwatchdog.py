@@ -0,0 +1,88 @@
+"""Detects Tk main-loop stalls and records what the main thread was doing.
+
+UIWatchdog keeps a root.after heartbeat going (recording event-loop lag
+like EventLoopLagMonitor) while a background thread watches for the
+next beat. When a beat is more than threshold_ms late, the thread takes
+stack samples of the main thread until the loop runs again, then
+appends the stall to the diagnostics log: how long it lasted and the
+sampled stacks, most frequent first. The innermost frame of the top
+stack is the handler that blocked the UI.
+"""
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+from metrics import METRICS, EventLoopLagMonitor
+
+MAX_SAMPLES = 200
+STACK_DEPTH = 25
+
+UI_STALLS = METRICS.counter('printshop_ui_stalls_total', "Tk main-loop stalls longer than the watchdog threshold")
+
+RECENT_STALLS = deque(maxlen=50)
+
+class UIWatchdog(EventLoopLagMonitor):
+    def __init__(self, root, threshold_ms=500, log_path='diagnostics.log', interval_ms=100, sample_ms=50):
+        super().__init__(root, interval_ms)
+        self.threshold = threshold_ms / 1000
+        self.log_path = log_path
+        self.sample_interval = sample_ms / 1000
+        self.main_thread_id = threading.main_thread().ident
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name='ui-watchdog', daemon=True)
+
+    def start(self):
+        super().start()
+        self._thread.start()
+
+    def stop(self):
+        super().stop()
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+    def _watch(self):
+        while not self._stop.wait(self.sample_interval):
+            expected = self._expected
+            if expected is None or time.perf_counter() - expected < self.threshold:
+                continue
+            started = expected
+            samples = self._sample_until_beat(expected)
+            if self._stop.is_set():
+                return
+            self._report(time.perf_counter() - started, samples)
+
+    def _sample_until_beat(self, expected):
+        """Sample the main thread's stack until the heartbeat moves on"""
+        samples = Counter()
+        while self._expected == expected and not self._stop.is_set():
+            if sum(samples.values()) < MAX_SAMPLES:
+                frame = sys._current_frames().get(self.main_thread_id)
+                if frame is not None:
+                    samples[tuple(traceback.format_stack(frame, limit=STACK_DEPTH))] += 1
+                del frame
+            time.sleep(self.sample_interval)
+        return samples
+
+    def _report(self, seconds, samples):
+        UI_STALLS.inc()
+        stacks = samples.most_common()
+        stall = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'seconds': seconds,
+            'samples': sum(samples.values()),
+            'blocked_in': stacks[0][0][-1].strip().splitlines()[0] if stacks else 'unknown'
+        }
+        RECENT_STALLS.append(stall)
+
+        lines = [f"=== {stall['time']} UI stalled for {seconds * 1000:.0f} ms "
+                 f"({stall['samples']} stack samples every {self.sample_interval * 1000:.0f} ms)"]
+        for stack, count in stacks:
+            lines.append(f"--- {count} sample(s), {count * 100 // stall['samples']}%")
+            lines.extend(entry.rstrip('\n') for entry in stack)
+        try:
+            with open(self.log_path, 'a') as f:
+                f.write('\n'.join(lines) + '\n\n')
+        except OSError as e:
+            print(f"Error writing diagnostics log: {e}")
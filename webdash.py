@@ -0,0 +1,231 @@
+import hashlib
+import threading
+
+def dashboard_version(db):
+    """Return a value that changes whenever anything shown on the dashboard may change
+
+    Sales, expenses and stock moves all append to the journal, stock
+    corrections bump inventory versions, user edits bump user versions, and
+    the date covers "today" rolling over. Every part is an O(1) lookup.
+    """
+    db.cursor.execute('''
+        SELECT (SELECT IFNULL(MAX(seq), 0) FROM journal),
+               (SELECT IFNULL(SUM(version), 0) FROM inventory),
+               (SELECT COUNT(*) + IFNULL(SUM(version), 0) FROM users)
+    ''')
+    return db.cursor.fetchone() + (db.clock.now().strftime('%Y-%m-%d'),)
+
+def make_etag(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return '"' + hashlib.sha1(content).hexdigest()[:20] + '"'
+
+class DashboardCache:
+    """Dashboard aggregates computed once per data version and shared by all requests.
+
+    Each request only reads the data version; the aggregates are rebuilt
+    by the first request after something changed, while other requests
+    for the same version wait for that result instead of repeating it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entry = (None, None, None)
+
+    def get(self, ctx):
+        """Return (etag, payload) for the current data version"""
+        version = dashboard_version(ctx.db)
+        cached_version, etag, payload = self._entry
+        if version == cached_version:
+            return etag, payload
+
+        with self._lock:
+            cached_version, etag, payload = self._entry
+            if version != cached_version:
+                payload = self.build(ctx, version)
+                etag = make_etag(repr(version))
+                self._entry = (version, etag, payload)
+            return etag, payload
+
+    def build(self, ctx, version):
+        service = ctx.service
+        today = version[-1]
+
+        ctx.db.cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'user'")
+        active_users = ctx.db.cursor.fetchone()[0]
+
+        ctx.db.cursor.execute('''
+            SELECT COUNT(*), IFNULL(SUM(amount), 0), IFNULL(SUM(papers_used), 0)
+            FROM transactions
+            WHERE date = ?
+        ''', (today,))
+        transactions_today, revenue_today, papers_today = ctx.db.cursor.fetchone()
+
+        ctx.db.cursor.execute('SELECT IFNULL(SUM(amount), 0) FROM expenses WHERE date = ?', (today,))
+        expenses_today = ctx.db.cursor.fetchone()[0]
+
+        quantities = service.inventory_model.get_quantities()
+        thresholds = service.stock_thresholds
+        low_stock = [item for item, quantity in quantities.items() if quantity < thresholds.get(item, 0)]
+
+        counts = ctx.timeseries.get_range_series('7d', 'count')
+        revenue = ctx.timeseries.get_range_series('7d', 'revenue')
+
+        return {
+            'generated_at': ctx.db.clock.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'overview': {
+                'active_users': active_users,
+                'transactions_today': transactions_today,
+                'revenue_today': revenue_today,
+                'papers_today': papers_today,
+                'expenses_today': expenses_today,
+                'balance_today': revenue_today - expenses_today,
+                'low_stock': low_stock
+            },
+            'weekly': [
+                {'date': day.strftime('%Y-%m-%d'), 'transactions': count, 'revenue': amount}
+                for (day, count), (_, amount) in zip(counts, revenue)
+            ],
+            'stock': [
+                {'item': item, 'quantity': quantity, 'threshold': thresholds.get(item, 0)}
+                for item, quantity in quantities.items()
+            ]
+        }
+
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>AlphaPrinting Dashboard</title>
+<style>
+  body { font-family: system-ui, sans-serif; margin: 0; background: #f3f4f6; color: #1f2937; }
+  header { background: #1e40af; color: #fff; padding: 12px 16px; display: flex; justify-content: space-between; align-items: center; }
+  header h1 { font-size: 18px; margin: 0; }
+  main { padding: 12px; max-width: 720px; margin: 0 auto; }
+  .cards { display: grid; grid-template-columns: repeat(2, 1fr); gap: 10px; }
+  .card { background: #fff; border-radius: 8px; padding: 12px; box-shadow: 0 1px 2px rgba(0,0,0,.08); }
+  .card .label { font-size: 12px; color: #6b7280; }
+  .card .value { font-size: 22px; font-weight: bold; margin-top: 4px; }
+  section { background: #fff; border-radius: 8px; padding: 12px; margin-top: 12px; }
+  section h2 { font-size: 14px; margin: 0 0 10px; }
+  .row { display: flex; align-items: center; gap: 8px; font-size: 13px; margin: 6px 0; }
+  .row .name { width: 80px; }
+  .row .bar { flex: 1; background: #e5e7eb; border-radius: 4px; height: 14px; }
+  .row .bar div { background: #3b82f6; height: 100%; border-radius: 4px; }
+  .row .bar div.low { background: #dc2626; }
+  .row .num { width: 90px; text-align: right; }
+  form { background: #fff; border-radius: 8px; padding: 16px; margin-top: 24px; }
+  input, button { display: block; width: 100%; box-sizing: border-box; padding: 10px; margin-top: 8px; font-size: 15px; }
+  button { background: #1e40af; color: #fff; border: 0; border-radius: 6px; }
+  #status { font-size: 12px; color: #6b7280; margin-top: 10px; text-align: center; }
+  #logout { width: auto; margin: 0; padding: 6px 10px; background: #3b82f6; }
+</style>
+</head>
+<body>
+<header><h1>AlphaPrinting</h1><button id="logout" hidden>Log out</button></header>
+<main>
+  <form id="login" hidden>
+    <input id="username" placeholder="Username" autocomplete="username">
+    <input id="password" type="password" placeholder="Password" autocomplete="current-password">
+    <button type="submit">Log in</button>
+  </form>
+  <div id="dashboard" hidden>
+    <div class="cards">
+      <div class="card"><div class="label">Today's Revenue</div><div class="value" id="revenue_today"></div></div>
+      <div class="card"><div class="label">Today's Transactions</div><div class="value" id="transactions_today"></div></div>
+      <div class="card"><div class="label">Today's Balance</div><div class="value" id="balance_today"></div></div>
+      <div class="card"><div class="label">Low Stock Items</div><div class="value" id="low_stock"></div></div>
+    </div>
+    <section><h2>Last 7 Days</h2><div id="weekly"></div></section>
+    <section><h2>Stock Levels</h2><div id="stock"></div></section>
+  </div>
+  <div id="status"></div>
+</main>
+<script>
+const REFRESH_MS = 15000;
+let etag = null;
+let timer = null;
+
+function money(value) { return 'M' + Number(value).toFixed(2); }
+
+function bars(container, rows) {
+  const peak = Math.max(1, ...rows.map(r => r.value));
+  container.innerHTML = rows.map(r =>
+    `<div class="row"><span class="name">${r.name}</span>` +
+    `<span class="bar"><div class="${r.low ? 'low' : ''}" style="width:${100 * r.value / peak}%"></div></span>` +
+    `<span class="num">${r.label}</span></div>`).join('');
+}
+
+function render(data) {
+  const o = data.overview;
+  document.getElementById('revenue_today').textContent = money(o.revenue_today);
+  document.getElementById('transactions_today').textContent = o.transactions_today;
+  document.getElementById('balance_today').textContent = money(o.balance_today);
+  document.getElementById('low_stock').textContent = o.low_stock.length;
+  bars(document.getElementById('weekly'), data.weekly.map(d => ({
+    name: d.date.slice(5), value: d.revenue, label: `${d.transactions} / ${money(d.revenue)}`
+  })));
+  bars(document.getElementById('stock'), data.stock.map(s => ({
+    name: s.item, value: s.quantity, label: s.quantity, low: s.quantity < s.threshold
+  })));
+  document.getElementById('status').textContent = 'Updated ' + data.generated_at;
+}
+
+function showLogin() {
+  clearTimeout(timer);
+  localStorage.removeItem('token');
+  etag = null;
+  document.getElementById('dashboard').hidden = true;
+  document.getElementById('logout').hidden = true;
+  document.getElementById('login').hidden = false;
+}
+
+async function refresh() {
+  const headers = {'Authorization': 'Bearer ' + localStorage.getItem('token')};
+  if (etag) headers['If-None-Match'] = etag;
+  try {
+    const response = await fetch('/api/dashboard', {headers, cache: 'no-store'});
+    if (response.status === 401 || response.status === 403) return showLogin();
+    if (response.status === 200) {
+      etag = response.headers.get('ETag');
+      render(await response.json());
+    }
+    document.getElementById('dashboard').hidden = false;
+    document.getElementById('logout').hidden = false;
+  } catch (e) {
+    document.getElementById('status').textContent = 'Offline, retrying';
+  }
+  timer = setTimeout(refresh, REFRESH_MS);
+}
+
+document.getElementById('login').addEventListener('submit', async event => {
+  event.preventDefault();
+  const response = await fetch('/api/login', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({
+      username: document.getElementById('username').value,
+      password: document.getElementById('password').value
+    })
+  });
+  const result = await response.json();
+  if (!response.ok) {
+    document.getElementById('status').textContent = result.error;
+    return;
+  }
+  localStorage.setItem('token', result.token);
+  document.getElementById('login').hidden = true;
+  refresh();
+});
+
+document.getElementById('logout').addEventListener('click', async () => {
+  await fetch('/api/logout', {method: 'POST', headers: {'Authorization': 'Bearer ' + localStorage.getItem('token')}});
+  showLogin();
+});
+
+if (localStorage.getItem('token')) refresh(); else showLogin();
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,111 @@
+import tkinter as tk
+
+class TreeviewBinding:
+    """Keep a ttk.Treeview in sync with a keyed list of rows.
+
+    Rows are identified by their primary key, which is used as the Treeview
+    item id. Each update only deletes, inserts, edits or moves the items that
+    differ from what is displayed, so the selection and the scroll position
+    survive refreshes.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self._values = {}
+
+    def update(self, rows):
+        """Display rows, an iterable of (key, values) pairs in display order"""
+        rows = [(str(key), tuple(values)) for key, values in rows]
+        wanted = {iid for iid, _ in rows}
+        top = self.tree.yview()[0]
+
+        removed = [iid for iid in self._values if iid not in wanted]
+        if removed:
+            self.tree.delete(*removed)
+            for iid in removed:
+                del self._values[iid]
+
+        # Rows before index are already in place; the rest of the Treeview is
+        # current[position:] in its old order, minus the items moved up.
+        current = self.tree.get_children()
+        placed = set()
+        position = 0
+        for index, (iid, values) in enumerate(rows):
+            while position < len(current) and current[position] in placed:
+                position += 1
+
+            if iid not in self._values:
+                self.tree.insert('', index, iid=iid, values=values)
+                self._values[iid] = values
+                continue
+
+            if self._values[iid] != values:
+                self.tree.item(iid, values=values)
+                self._values[iid] = values
+
+            if position < len(current) and current[position] == iid:
+                position += 1
+            else:
+                self.tree.move(iid, '', index)
+                placed.add(iid)
+
+        self.tree.yview_moveto(top)
+
+    def clear(self):
+        """Remove every row"""
+        self.update([])
+
+class Sparkline(tk.Canvas):
+    """Small line chart drawn with a single reusable canvas item"""
+
+    def __init__(self, parent, width=200, height=40, color='#1e40af', **kwargs):
+        super().__init__(parent, width=width, height=height, highlightthickness=0, **kwargs)
+        self.width = width
+        self.height = height
+        self.line = self.create_line(0, height, width, height, fill=color, width=2)
+
+    def update_values(self, values):
+        """Redraw the line for values, scaled to the canvas height"""
+        if len(values) < 2:
+            self.coords(self.line, 0, self.height - 1, self.width, self.height - 1)
+            return
+
+        peak = max(values) or 1
+        step = self.width / (len(values) - 1)
+        coords = []
+        for i, value in enumerate(values):
+            coords.append(i * step)
+            coords.append(self.height - 2 - (self.height - 4) * value / peak)
+        self.coords(self.line, *coords)
+
+class Toast:
+    """Non-blocking notification shown at the bottom of a window.
+
+    A single label is created up front and re-used, so showing a message
+    never creates or destroys widgets.
+    """
+    COLORS = {
+        'info': ('#166534', '#dcfce7'),
+        'error': ('#991b1b', '#fee2e2')
+    }
+
+    def __init__(self, root, duration_ms=2500):
+        self.root = root
+        self.duration_ms = duration_ms
+        self.label = tk.Label(root, font=('Leelawadee', 11, 'bold'), padx=16, pady=8, relief='solid', borderwidth=1)
+        self._hide_job = None
+
+    def show(self, message, kind='info'):
+        """Show message for duration_ms, replacing any message on screen"""
+        foreground, background = self.COLORS.get(kind, self.COLORS['info'])
+        self.label.config(text=message, fg=foreground, bg=background)
+        self.label.place(relx=0.5, rely=1.0, y=-30, anchor='s')
+        self.label.lift()
+
+        if self._hide_job is not None:
+            self.root.after_cancel(self._hide_job)
+        self._hide_job = self.root.after(self.duration_ms, self.hide)
+
+    def hide(self):
+        self._hide_job = None
+        self.label.place_forget()